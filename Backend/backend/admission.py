@@ -0,0 +1,62 @@
+import threading
+
+class AdmissionGate:
+    """Bounds how many requests a worker serves at once, with a short queue in front.
+
+    Requests beyond max_in_flight wait up to queue_timeout seconds for a slot, at most
+    max_queued of them at a time. Anything past that is refused so clients back off
+    instead of piling up behind slow requests.
+    """
+
+    def __init__(self, max_in_flight=8, max_queued=16, queue_timeout=1.0):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot, returns False when the request should be turned away"""
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.queued >= self.max_queued:
+                    self.rejected += 1
+                    return False
+                self.queued += 1
+
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+
+            if not acquired:
+                with self._lock:
+                    self.rejected += 1
+                return False
+
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'max_in_flight': self.max_in_flight,
+                'max_queued': self.max_queued
+            }
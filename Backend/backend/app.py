@@ -1,39 +1,411 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, stream_with_context
 from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+import threading
+import datetime
+import json
+import time
+import uuid
+import hmac
+import logging
+import zlib
 import os
+from fake_review_detector import FakeReviewDetector
+from sentiment_analyzer import SentimentAnalyzer
+from review_summarizer import ReviewSummarizer
+from review_pipeline import ReviewPipeline
+from product_index import ProductIndex
+from cache import LRUCache, VerdictCache
+from metrics import LatencyTracker, REGISTRY, SamplingProfiler, stage_timer
+from review_store import ReviewStore
+from admission import AdmissionGate
+from review_index import ReviewIndex
+from trend_index import TrendIndex
+from reviewer_index import ReviewerIndex, ANONYMOUS_REVIEWER, BEHAVIOR_FEATURE_NAMES, DEFAULT_VERIFIED_PURCHASE, HISTORY_COLUMNS
+from duplicate_index import DuplicateIndex
+
+try:
+    import msgpack
+except ImportError:  # msgpack exports are unavailable without it
+    msgpack = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
 
+logger = logging.getLogger(__name__)
+
 # Global variables for data
-df = None
+review_store = None
 products_list = []
+product_index = ProductIndex()
+review_index = ReviewIndex()
+trend_index = TrendIndex()
+reviewer_index = ReviewerIndex()
+duplicate_index = DuplicateIndex()
+sentiment_analyzer = SentimentAnalyzer()
+review_summarizer = ReviewSummarizer()
 
-# Load dataset
-try:
-    dataset_path = 'product_reviews_dataset.csv'
-    if os.path.exists(dataset_path):
-        df = pd.read_csv(dataset_path)
-        products_list = df['product_name'].unique().tolist() if 'product_name' in df.columns else []
-        print(f"✓ Dataset loaded: {len(df)} reviews, {len(products_list)} products")
+# Guards the store, the aggregate index and products_list while reviews are added
+data_lock = threading.RLock()
+last_store_sync = 0.0
+
+# Largest number of reviews accepted by a single batch detection request
+MAX_BATCH_REVIEWS = 10000
+
+# Reviews scored and appended per chunk while ingesting, bounds memory per request
+INGEST_CHUNK_SIZE = 5000
+
+# Seconds between checks for reviews ingested by other worker processes
+STORE_SYNC_INTERVAL = 2.0
+
+# Serialized /api/analyze responses, keyed by product, its index version and the model version
+ANALYSIS_CACHE_ENTRIES = 1024
+ANALYSIS_CACHE_TTL = 300
+ANALYSIS_CACHE_BYTES = 64 * 1024 * 1024
+analysis_cache = LRUCache(ANALYSIS_CACHE_ENTRIES, ttl=ANALYSIS_CACHE_TTL, max_bytes=ANALYSIS_CACHE_BYTES)
+
+# Extractive summaries of each product's genuine reviews, keyed by product and its index version.
+# They are precomputed at startup and only recomputed for products that received new reviews.
+SUMMARY_CACHE_ENTRIES = 4096
+summary_cache = LRUCache(SUMMARY_CACHE_ENTRIES)
+
+# Fake-detection verdicts keyed by review text hash, set VERDICT_CACHE_PATH to persist them
+VERDICT_CACHE_ENTRIES = 100000
+verdict_cache = VerdictCache(VERDICT_CACHE_ENTRIES, path=os.environ.get('VERDICT_CACHE_PATH'))
+
+# Latency budget for single-review detection, compared against the measured percentiles
+DETECT_LATENCY_BUDGET_MS = {'p50': 5.0, 'p99': 25.0}
+detect_latency = LatencyTracker()
+
+# Request latency and outcome per endpoint, served at /metrics with the stage timers of each component.
+# Every worker process keeps and serves its own.
+request_seconds = REGISTRY.histogram('http_request_duration_seconds', 'Request wall time per endpoint', ('endpoint',))
+request_count = REGISTRY.counter('http_requests_total', 'Requests answered per endpoint and status', ('endpoint', 'status'))
+request_errors = REGISTRY.counter('http_request_errors_total', 'Requests that failed with an exception', ('endpoint',))
+
+# Set PROFILE_REQUESTS=1 to sample the stack of requests sent with an X-Profile: 1 header while
+# they run. Their collapsed stacks are kept for /api/admin/profiles/<id>, named by X-Profile-Id.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS') == '1'
+PROFILE_ENTRIES = 32
+profiles = LRUCache(PROFILE_ENTRIES)
+
+# Set MODEL_WATCH_INTERVAL (seconds) to reload the model whenever a new bundle is published
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+
+# Expected in the X-Admin-Token header of admin endpoints, which are disabled while it is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Requests a worker serves at once, and how many more may wait briefly for a slot
+# before being answered with a 429
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 8))
+MAX_QUEUED = int(os.environ.get('MAX_QUEUED', 16))
+QUEUE_TIMEOUT = float(os.environ.get('QUEUE_TIMEOUT', 1.0))
+RETRY_AFTER_SECONDS = 1
+admission = AdmissionGate(MAX_IN_FLIGHT, MAX_QUEUED, QUEUE_TIMEOUT)
+
+# Endpoints that must answer even when the worker is saturated
+ADMISSION_EXEMPT = {'home', 'model_status', 'reload_model', 'prometheus_metrics'}
+
+# Batch scorings a worker runs at once, the rest wait for a thread. This only limits concurrency:
+# the threads share the worker's GIL, so it keeps a burst of large batches from crowding out light
+# requests but scores no faster. CPU parallelism comes from running more worker processes.
+SCORING_THREADS = int(os.environ.get('SCORING_THREADS', 1))
+scoring_pool = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix='scoring')
+
+# Columns the aggregate, trend and reviewer indexes are built from
+INDEX_COLUMNS = ['product_name', 'rating', 'is_fake', 'sentiment', 'review_date', 'reviewer_id', 'verified_purchase']
+
+# Fields of each review returned by GET /api/reviews
+REVIEW_FIELDS = [
+    'review_id', 'product_name', 'category', 'reviewer_id', 'rating', 'review_text', 'sentiment',
+    'is_fake', 'verified_purchase', 'helpful_votes', 'review_date'
+]
+
+# Page size of JSON review listings, streamed exports have no upper limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Reviews decoded and written per chunk while streaming an export
+EXPORT_CHUNK_SIZE = 1000
+
+# The model loads on a background thread once create_app runs, requests get a 503 until it is
+# ready. Reloads swap a whole model snapshot, so one instance is shared by every request thread.
+# Models trained here also learn from reviewer behavior and near-duplicate clusters, read from
+# reviewer_index and duplicate_index when scoring.
+detector = FakeReviewDetector(
+    verdict_cache=verdict_cache, auto_load=False,
+    reviewer_index=reviewer_index, duplicate_index=duplicate_index
+)
+
+# Keeps a record per distinct genuine review, so re-summarizing after an ingest only analyzes new texts
+review_pipeline = ReviewPipeline(sentiment_analyzer, review_summarizer, detector)
+
+# Set once create_app has loaded the data, so importing the module has no side effects
+app_initialized = False
+app_init_lock = threading.Lock()
+
+def load_data(dataset_path='product_reviews_dataset.csv'):
+    """Open the review store and build the aggregate index from it"""
+    global review_store, products_list, product_index, review_index, trend_index, reviewer_index, duplicate_index
+
+    try:
+        try:
+            # Workers memory-map the same columnar copy instead of parsing the CSV each
+            review_store = ReviewStore.open(dataset_path)
+        except FileNotFoundError:
+            print("⚠ Dataset not found. Creating sample data...")
+            # Create sample data
+            review_store = ReviewStore.from_frame(pd.DataFrame({
+                'product_name': ['Electronics - Smartphone', 'Electronics - Laptop', 'Clothing - T-Shirt'] * 100,
+                'rating': np.random.randint(1, 6, 300),
+                'review_text': ['Sample review'] * 300,
+                'is_fake': np.random.choice([0, 1], 300, p=[0.7, 0.3]),
+                'sentiment': ['positive'] * 200 + ['negative'] * 100
+            }))
+            print("✓ Sample data created")
+        frame = review_store.to_frame(INDEX_COLUMNS)
+        product_index = ProductIndex.from_frame(frame)
+        trend_index = TrendIndex.from_frame(frame)
+        reviewer_index = ReviewerIndex.from_frame(frame)
+        products_list = product_index.product_names()
+        review_index = ReviewIndex.from_store(review_store)
+        duplicate_index = DuplicateIndex.from_store(review_store)
+        print(f"✓ Dataset loaded: {len(review_store)} reviews, {len(products_list)} products")
+    except Exception:
+        logger.exception("Error loading data")
+        review_store = ReviewStore()
+        products_list = []
+        product_index = ProductIndex()
+        review_index = ReviewIndex()
+        trend_index = TrendIndex()
+        reviewer_index = ReviewerIndex()
+        duplicate_index = DuplicateIndex()
+    detector.reviewer_index = reviewer_index
+    detector.duplicate_index = duplicate_index
+
+def purge_stale_caches(model_version):
+    """Drop cached verdicts and analyses computed by a model that has been replaced"""
+    verdict_cache.retain_version(model_version)
+    analysis_cache.invalidate(lambda key: key[2] != model_version)
+
+def create_app():
+    """Load the dataset and start loading the model, once per process, and return the app.
+
+    Both the development server below and WSGI servers (see wsgi.py) start through here.
+    """
+    global app_initialized
+
+    with app_init_lock:
+        if not app_initialized:
+            load_data()
+            threading.Thread(target=warm_summaries, name='summary-warmup', daemon=True).start()
+            detector.reload_listeners.append(purge_stale_caches)
+            detector.load_in_background()
+            if MODEL_WATCH_INTERVAL > 0:
+                detector.watch_model_dir(MODEL_WATCH_INTERVAL)
+            app_initialized = True
+
+    return app
+
+def summarize_product(product_name, fake_threshold=None):
+    """Summary, pros and cons of a product's genuine reviews, with aggregates before and after filtering.
+
+    Fakes are the stored verdicts, or with fake_threshold the reviews the model gives at
+    least that fake probability. Only the genuine reviews are analyzed.
+    """
+
+    with stage_timer('summary.load_rows'):
+        blocks = list(review_index.iter_rows(equals={'product_name': product_name}))
+        rows = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int64)
+        reviews = review_store.to_frame(
+            ['review_text', 'is_fake', 'rating', 'sentiment', 'reviewer_id'], rows=rows
+        )
+        texts = reviews['review_text'].tolist()
+
+    if fake_threshold is None:
+        is_fake = review_pipeline.flag_fakes(texts, reviews['is_fake'].to_numpy())
     else:
-        print("⚠ Dataset not found. Creating sample data...")
-        # Create sample data
-        df = pd.DataFrame({
-            'product_name': ['Electronics - Smartphone', 'Electronics - Laptop', 'Clothing - T-Shirt'] * 100,
-            'rating': np.random.randint(1, 6, 300),
-            'review_text': ['Sample review'] * 300,
-            'is_fake': np.random.choice([0, 1], 300, p=[0.7, 0.3]),
-            'sentiment': ['positive'] * 200 + ['negative'] * 100
+        behavior = None
+        if detector.uses_behavior:
+            # As of each review's date, the way the model's training rows were described
+            history = review_store.to_frame(HISTORY_COLUMNS, rows=rows)
+            behavior = reviewer_index.features_as_of(*(history[column].to_numpy() for column in HISTORY_COLUMNS))
+        # Stored reviews are already in the duplicate index, as they were when the model was trained
+        is_fake = scoring_pool.submit(
+            review_pipeline.flag_fakes, texts, fake_threshold=fake_threshold, behavior=behavior,
+            already_indexed=True
+        ).result()
+
+    summary = review_pipeline.summarize(texts, is_fake)
+    with stage_timer('summary.aggregates'):
+        return {
+            'summary': summary,
+            'fake_reviews': int(is_fake.sum()),
+            'unfiltered': review_aggregates(reviews),
+            'filtered': review_aggregates(reviews[~is_fake])
+        }
+
+def review_aggregates(reviews):
+    """Count, rating and stored sentiment aggregates of a frame of reviews"""
+
+    summary = ProductIndex.summarize(ProductIndex.from_frame(reviews.assign(product_name='')).get_totals())
+    return {
+        'total_reviews': summary['total_reviews'],
+        'avg_rating': float(round(summary['avg_rating'], 2)),
+        'positive_count': summary['positive_count'],
+        'negative_count': summary['negative_count'],
+        'neutral_count': summary['neutral_count']
+    }
+
+def product_summary(product_name, version, fake_threshold=None):
+    """Cached summary of a product as of the given index version (and model, with a threshold)"""
+
+    if fake_threshold is None:
+        key = (product_name, version)
+    else:
+        key = (product_name, version, fake_threshold, current_model_version())
+    summary = summary_cache.get(key)
+    if summary is None:
+        summary = summarize_product(product_name, fake_threshold)
+        summary_cache.put(key, summary)
+    return summary
+
+def warm_summaries():
+    """Summarize every product in the background, so /api/analyze starts out on cache hits"""
+    for product_name in list(products_list):
+        entry = product_index.get(product_name)
+        if entry is not None:
+            try:
+                product_summary(product_name, entry['version'])
+            except Exception:
+                logger.exception("Error summarizing %s", product_name)
+
+def model_unavailable():
+    """Response for detection requests that arrive before the model is usable"""
+    if detector.load_finished.is_set():
+        error = detector.load_error or "Fake review model is not available"
+    else:
+        error = "Fake review model is still loading"
+    return jsonify({"success": False, "error": error, "ready": False}), 503
+
+def index_store_rows(ranges):
+    """Fold newly visible store rows into the aggregate, trend, reviewer, duplicate and listing indexes"""
+    global product_index, products_list, review_index, trend_index, reviewer_index, duplicate_index
+
+    with data_lock:
+        if ranges is None:
+            # The store was reopened from scratch, rebuild instead of patching
+            frame = review_store.to_frame(INDEX_COLUMNS)
+            product_index = ProductIndex.from_frame(frame)
+            trend_index = TrendIndex.from_frame(frame)
+            reviewer_index = ReviewerIndex.from_frame(frame)
+            detector.reviewer_index = reviewer_index
+            review_index = ReviewIndex.from_store(review_store)
+            duplicate_index = DuplicateIndex.from_store(review_store)
+            detector.duplicate_index = duplicate_index
+            analysis_cache.clear()
+        else:
+            touched = set()
+            for start, stop in ranges:
+                frame = review_store.to_frame(INDEX_COLUMNS, rows=np.arange(start, stop))
+                touched.update(product_index.add_reviews(frame))
+                trend_index.add_reviews(frame)
+                reviewer_index.add_reviews(frame)
+                review_index.add_rows(review_store, start, stop)
+                duplicate_index.add_rows(review_store, start, stop)
+            analysis_cache.invalidate(lambda key: key[0] in touched)
+        products_list = product_index.product_names()
+
+def current_model_version():
+    """Version of the loaded fake review model, part of every cache key that depends on it"""
+    return detector.model_version
+
+def score_reviews(texts, behavior=None):
+    """Fake-detection verdicts for texts, waiting for a free scoring thread first"""
+    return scoring_pool.submit(detector.predict_batch, texts, behavior=behavior).result()
+
+def request_failed(e):
+    """Log the exception a request failed with and answer with its message"""
+    logger.exception("Error in %s", request.endpoint)
+    request_errors.inc(request.endpoint or 'unmatched')
+    return jsonify({"success": False, "error": str(e)})
+
+def admin_denied():
+    """Response refusing an admin request, None when its X-Admin-Token is valid"""
+    if not ADMIN_TOKEN:
+        return jsonify({"success": False, "error": "Admin endpoints are disabled, set ADMIN_TOKEN"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"success": False, "error": "Invalid admin token"}), 403
+    return None
+
+# Registered before admission control, so requests turned away are timed and counted too
+@app.before_request
+def start_request():
+    g.request_start = time.perf_counter()
+    if PROFILE_REQUESTS and request.headers.get('X-Profile') == '1':
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    start = g.get('request_start')
+    if start is not None:
+        request_seconds.observe(time.perf_counter() - start, endpoint)
+    request_count.inc(endpoint, str(response.status_code))
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex
+        profiles.put(profile_id, {
+            'endpoint': endpoint,
+            'samples': profiler.stop().samples,
+            'interval': profiler.interval,
+            'stacks': profiler.collapsed()
         })
-        products_list = df['product_name'].unique().tolist()
-        print("✓ Sample data created")
-except Exception as e:
-    print(f"Error loading data: {e}")
-    df = pd.DataFrame()
-    products_list = []
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.before_request
+def admit_request():
+    """Turn requests away with a 429 once this worker is saturated"""
+    if request.endpoint is None or request.endpoint in ADMISSION_EXEMPT:
+        return None
+
+    if not admission.acquire():
+        response = jsonify({"success": False, "error": "Server is busy, please retry shortly"})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    if g.pop('admitted', False):
+        admission.release()
+    # Only left behind when the request failed before record_request ran
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+@app.before_request
+def sync_store():
+    """Pick up segments other workers appended to the shared store"""
+    global last_store_sync
+
+    if review_store is None or review_store.store_dir is None:
+        return
+    if time.monotonic() - last_store_sync < STORE_SYNC_INTERVAL:
+        return
+
+    with data_lock:
+        last_store_sync = time.monotonic()
+        ranges = review_store.refresh()
+        if ranges != []:
+            index_store_rows(ranges)
 
 @app.route('/')
 def home():
@@ -46,7 +418,9 @@ def dashboard():
 @app.route('/api/stats')
 def get_stats():
     try:
-        if df is None or df.empty:
+        totals = product_index.get_totals()
+
+        if totals['total_reviews'] == 0:
             return jsonify({
                 "success": True,
                 "stats": {
@@ -58,26 +432,21 @@ def get_stats():
                     "avg_rating": 0
                 }
             })
-        
-        total_reviews = len(df)
-        fake_reviews = int(df['is_fake'].sum()) if 'is_fake' in df.columns else 0
-        genuine_reviews = total_reviews - fake_reviews
-        fake_percentage = round((fake_reviews / total_reviews * 100), 2) if total_reviews > 0 else 0
-        avg_rating = round(df['rating'].mean(), 2) if 'rating' in df.columns else 0
-        
+
+        summary = ProductIndex.summarize(totals)
+
         stats = {
-            "total_reviews": total_reviews,
+            "total_reviews": summary['total_reviews'],
             "total_products": len(products_list),
-            "fake_reviews": fake_reviews,
-            "genuine_reviews": genuine_reviews,
-            "fake_percentage": fake_percentage,
-            "avg_rating": float(avg_rating)
+            "fake_reviews": summary['fake_reviews'],
+            "genuine_reviews": summary['genuine_reviews'],
+            "fake_percentage": summary['fake_percentage'],
+            "avg_rating": float(round(summary['avg_rating'], 2))
         }
-        
+
         return jsonify({"success": True, "stats": stats})
     except Exception as e:
-        print(f"Error in get_stats: {e}")
-        return jsonify({"success": False, "error": str(e)})
+        return request_failed(e)
 
 @app.route('/api/products')
 def get_products():
@@ -88,82 +457,641 @@ def get_products():
             "count": len(products_list)
         })
     except Exception as e:
-        print(f"Error in get_products: {e}")
-        return jsonify({"success": False, "error": str(e)})
+        return request_failed(e)
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_product():
     try:
         data = request.get_json()
         product_name = data.get('product_name')
-        
-        if not product_name or df is None or df.empty:
+
+        if not product_name or len(product_index) == 0:
             return jsonify({"success": False, "error": "Invalid product or no data"})
-        
-        product_reviews = df[df['product_name'] == product_name]
-        
-        if product_reviews.empty:
+
+        entry = product_index.get(product_name)
+
+        if entry is None or entry['total_reviews'] == 0:
             return jsonify({"success": False, "error": "No reviews found for this product"})
-        
-        fake_count = int(product_reviews['is_fake'].sum())
-        genuine_count = len(product_reviews) - fake_count
-        
+
+        # Optional fake probability to filter at instead of the stored verdicts
+        fake_threshold = data.get('fake_threshold')
+        if fake_threshold is not None:
+            try:
+                fake_threshold = float(fake_threshold)
+            except (TypeError, ValueError):
+                fake_threshold = None
+            if fake_threshold is None or not 0.0 <= fake_threshold <= 1.0:
+                return jsonify({"success": False, "error": "fake_threshold must be a number between 0 and 1"})
+            if not detector.is_ready():
+                return model_unavailable()
+
+        cache_key = (product_name, entry['version'], current_model_version(), fake_threshold)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return app.response_class(cached, mimetype='application/json')
+
+        summary = ProductIndex.summarize(entry)
+        filtered = product_summary(product_name, entry['version'], fake_threshold)
+        review_summary = filtered['summary']
+        fake_reviews = filtered['fake_reviews']
+
         response = {
             "success": True,
             "data": {
                 "product_name": product_name,
                 "summary": {
-                    "total_reviews": len(product_reviews),
-                    "avg_rating": float(product_reviews['rating'].mean()),
-                    "pros": ["Good quality", "Fast shipping"],
-                    "cons": ["Price could be better"]
+                    "total_reviews": summary['total_reviews'],
+                    "avg_rating": float(summary['avg_rating']),
+                    "summary_text": review_summary['summary_text'],
+                    "key_points": review_summary['key_points'],
+                    "pros": review_summary['pros'],
+                    "cons": review_summary['cons']
                 },
                 "sentiment": {
-                    "positive_count": int((product_reviews['sentiment'] == 'positive').sum()) if 'sentiment' in product_reviews.columns else 0,
-                    "negative_count": int((product_reviews['sentiment'] == 'negative').sum()) if 'sentiment' in product_reviews.columns else 0
+                    "positive_count": summary['positive_count'],
+                    "negative_count": summary['negative_count']
                 },
                 "fake_stats": {
-                    "total_reviews": len(product_reviews),
-                    "genuine_reviews": genuine_count,
-                    "fake_reviews": fake_count,
-                    "fake_percentage": round((fake_count / len(product_reviews) * 100), 2)
+                    "total_reviews": summary['total_reviews'],
+                    "genuine_reviews": summary['total_reviews'] - fake_reviews,
+                    "fake_reviews": fake_reviews,
+                    "fake_percentage": round(fake_reviews / summary['total_reviews'] * 100, 2),
+                    "fake_threshold": fake_threshold
+                },
+                # Stored ratings and sentiment over every review and over the genuine ones only
+                "aggregates": {
+                    "unfiltered": filtered['unfiltered'],
+                    "filtered": filtered['filtered']
                 }
             }
         }
-        
-        return jsonify(response)
+
+        with stage_timer('analyze.serialize'):
+            result = jsonify(response)
+            body = result.get_data()
+        analysis_cache.put(cache_key, body, size=len(body))
+
+        return result
     except Exception as e:
-        print(f"Error in analyze_product: {e}")
-        return jsonify({"success": False, "error": str(e)})
+        return request_failed(e)
 
 @app.route('/api/detect-fake', methods=['POST'])
 def detect_fake():
     try:
+        start = time.perf_counter()
+
         data = request.get_json()
         review_text = data.get('review_text', '')
-        
-        # Simple fake detection logic
-        exclamation_count = review_text.count('!')
-        capital_ratio = sum(1 for c in review_text if c.isupper()) / max(len(review_text), 1)
-        
-        is_fake = exclamation_count > 3 or capital_ratio > 0.5
-        confidence = 0.85 if is_fake else 0.92
-        
+
+        if not isinstance(review_text, str) or not review_text.strip():
+            return jsonify({"success": False, "error": "review_text is required"})
+
+        if not detector.is_ready():
+            return model_unavailable()
+
+        # Optional reviewer details, described the same way as a review ingested with them
+        try:
+            behavior = reviewer_behavior(reviewer_frame(data))[0]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "reviewer_id and rating must be numbers"})
+
+        # Looked up once, for the response and for models trained with cluster sizes
+        duplicate_size = duplicate_index.cluster_sizes([review_text], adding=True)[0]
+        is_fake, confidence, features = detector.predict_single(
+            review_text, behavior=behavior, duplicate_size=duplicate_size
+        )
+
+        result = {
+            "success": True,
+            "is_fake": bool(is_fake),
+            "confidence": float(confidence),
+            "verdict": "FAKE" if is_fake else "GENUINE",
+            "features": features,
+            "duplicate_cluster_size": int(duplicate_size)
+        }
+        if behavior is not None:
+            result["behavior"] = dict(zip(BEHAVIOR_FEATURE_NAMES, behavior.tolist()))
+            result["behavior_used"] = detector.uses_behavior
+        response = jsonify(result)
+
+        detect_latency.record(time.perf_counter() - start)
+        return response
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/model/status')
+def model_status():
+    try:
+        latency = detect_latency.percentiles()
+        within_budget = all(
+            latency[f'{name}_ms'] is None or latency[f'{name}_ms'] <= budget
+            for name, budget in DETECT_LATENCY_BUDGET_MS.items()
+        )
+
         return jsonify({
             "success": True,
-            "is_fake": is_fake,
-            "confidence": confidence,
-            "verdict": "FAKE" if is_fake else "GENUINE"
+            "ready": detector.is_ready(),
+            "loading": not detector.load_finished.is_set(),
+            "error": detector.load_error,
+            "model_version": detector.model_version,
+            "latency": latency,
+            "latency_budget_ms": DETECT_LATENCY_BUDGET_MS,
+            "within_budget": within_budget,
+            "admission": admission.stats()
+        })
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/detect-fake/batch', methods=['POST'])
+def detect_fake_batch():
+    try:
+        data = request.get_json()
+        reviews = data.get('reviews', [])
+
+        if not isinstance(reviews, list) or not all(isinstance(r, str) for r in reviews):
+            return jsonify({"success": False, "error": "reviews must be a list of strings"})
+
+        if len(reviews) > MAX_BATCH_REVIEWS:
+            return jsonify({"success": False, "error": f"At most {MAX_BATCH_REVIEWS} reviews per request"})
+
+        if not detector.is_ready():
+            return model_unavailable()
+
+        predictions, confidences = score_reviews(reviews)
+
+        results = [
+            {
+                "is_fake": bool(is_fake),
+                "confidence": float(confidence),
+                "verdict": "FAKE" if is_fake else "GENUINE"
+            }
+            for is_fake, confidence in zip(predictions, confidences)
+        ]
+
+        return jsonify({
+            "success": True,
+            "count": len(results),
+            "fake_count": int(predictions.sum()),
+            "results": results
+        })
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    try:
+        return jsonify({
+            "success": True,
+            "cache": {
+                "analysis": analysis_cache.stats(),
+                "verdicts": verdict_cache.stats()
+            }
+        })
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/admin/reload-model', methods=['POST'])
+def reload_model():
+    """Swap in the model bundle CURRENT points at, without restarting the server"""
+    try:
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+
+        previous_version = detector.model_version
+        new_version = detector.reload_model()
+
+        return jsonify({
+            "success": True,
+            "reloaded": new_version is not None,
+            "previous_version": previous_version,
+            "model_version": detector.model_version
+        })
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/admin/profiles/<profile_id>')
+def get_profile(profile_id):
+    """Collapsed stacks sampled while a request sent with X-Profile: 1 ran, for flame graph tools"""
+    try:
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+
+        profile = profiles.get(profile_id)
+        if profile is None:
+            return jsonify({"success": False, "error": "Unknown or expired profile"}), 404
+        return jsonify({"success": True, "profile": profile})
+    except Exception as e:
+        return request_failed(e)
+
+def collect_service_metrics():
+    """Cache, admission and model state, read on every /metrics scrape"""
+
+    caches = {
+        'analysis': analysis_cache.stats(),
+        'summaries': summary_cache.stats(),
+        'verdicts': verdict_cache.stats()
+    }
+    gate = admission.stats()
+
+    def per_cache(field):
+        return [((name,), stats[field]) for name, stats in caches.items()]
+
+    return [
+        ('cache_hits_total', 'counter', 'Lookups answered from each cache', ('cache',), per_cache('hits')),
+        ('cache_misses_total', 'counter', 'Lookups each cache could not answer', ('cache',), per_cache('misses')),
+        ('cache_evictions_total', 'counter', 'Entries evicted from each cache', ('cache',), per_cache('evictions')),
+        ('cache_hit_ratio', 'gauge', 'Share of lookups answered from each cache', ('cache',), per_cache('hit_rate')),
+        ('cache_entries', 'gauge', 'Entries held by each cache', ('cache',), per_cache('entries')),
+        ('admission_in_flight', 'gauge', 'Requests being served', (), [((), gate['in_flight'])]),
+        ('admission_queued', 'gauge', 'Requests waiting for a slot', (), [((), gate['queued'])]),
+        ('admission_admitted_total', 'counter', 'Requests given a slot', (), [((), gate['admitted'])]),
+        ('admission_rejected_total', 'counter', 'Requests turned away with a 429', (), [((), gate['rejected'])]),
+        ('model_ready', 'gauge', 'Whether a fake review model is loaded', (), [((), int(detector.is_ready()))]),
+        ('reviews_stored', 'gauge', 'Reviews in the review store', (),
+         [((), len(review_store) if review_store is not None else 0)])
+    ]
+
+REGISTRY.add_collector(collect_service_metrics)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request, stage, cache and admission metrics of this worker in the Prometheus text format"""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def parse_day(value):
+    """Day number for a YYYY-MM-DD query parameter, None when it is absent"""
+    return int(np.datetime64(value, 'D').astype(np.int64)) if value else None
+
+@app.route('/api/trends')
+def get_trends():
+    """Daily or weekly review counts, fake rate, rating and sentiment over a date range"""
+    try:
+        product_name = request.args.get('product') or None
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in TrendIndex.GRANULARITIES:
+            return jsonify({"success": False, "error": "granularity must be day or week"})
+
+        index = trend_index
+        if product_name is not None and product_name not in index:
+            return jsonify({"success": False, "error": "No reviews found for this product"})
+
+        series = index.get_series(
+            product_name, granularity,
+            parse_day(request.args.get('start')), parse_day(request.args.get('end'))
+        )
+
+        return jsonify({
+            "success": True,
+            "product_name": product_name,
+            "granularity": granularity,
+            "series": series
+        })
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"})
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/trends/bursts')
+def get_fake_bursts():
+    """Product days or weeks with the most fake reviews, for spotting review campaigns"""
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in TrendIndex.GRANULARITIES:
+            return jsonify({"success": False, "error": "granularity must be day or week"})
+
+        bursts = trend_index.find_bursts(
+            granularity,
+            parse_day(request.args.get('start')),
+            parse_day(request.args.get('end')),
+            min_reviews=int(request.args.get('min_reviews', 5)),
+            min_fake_rate=float(request.args.get('min_fake_rate', 0.5)),
+            limit=min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE)
+        )
+
+        return jsonify({"success": True, "granularity": granularity, "bursts": bursts})
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"})
+    except Exception as e:
+        return request_failed(e)
+
+def duplicate_cluster_records(clusters):
+    """Near-duplicate cluster summaries, with their sample rows read from the store at once"""
+
+    samples = review_records(np.array([row for cluster in clusters for row in cluster['sample_rows']], dtype=np.int64))
+    bounds = np.cumsum([0] + [len(cluster['sample_rows']) for cluster in clusters]).tolist()
+    return [
+        {
+            "size": cluster['size'],
+            "fake_reviews": cluster['fake_reviews'],
+            "products": cluster['products'],
+            "reviewers": cluster['reviewers'],
+            "sample": samples[start:stop]
+        }
+        for cluster, start, stop in zip(clusters, bounds, bounds[1:])
+    ]
+
+@app.route('/api/duplicates', methods=['GET', 'POST'])
+def get_duplicates():
+    """Largest near-duplicate clusters (GET), or the clusters a posted review_text belongs to (POST)"""
+    try:
+        sample_size = min(int(request.args.get('sample', 3)), MAX_PAGE_SIZE)
+
+        if request.method == 'POST':
+            review_text = (request.get_json() or {}).get('review_text', '')
+            if not isinstance(review_text, str) or not review_text.strip():
+                return jsonify({"success": False, "error": "review_text is required"})
+            clusters = duplicate_index.cluster_of(review_text, sample_size=sample_size)
+        else:
+            clusters = duplicate_index.largest_clusters(
+                min_size=max(int(request.args.get('min_size', 2)), 2),
+                limit=min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE),
+                sample_size=sample_size
+            )
+
+        return jsonify({
+            "success": True,
+            "clusters": duplicate_cluster_records(clusters),
+            "index": duplicate_index.stats()
+        })
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"})
+    except Exception as e:
+        return request_failed(e)
+
+@app.route('/api/reviewers/<int:reviewer_id>')
+def get_reviewer(reviewer_id):
+    """Behavioral profile of one reviewer, as the fake detector sees it"""
+    try:
+        profile = reviewer_index.get(reviewer_id)
+        if profile is None:
+            return jsonify({"success": False, "error": "Reviewer not found"}), 404
+
+        return jsonify({"success": True, "reviewer_id": reviewer_id, "profile": profile})
+    except Exception as e:
+        return request_failed(e)
+
+def parse_review_filters(args):
+    """Translate listing query parameters into index filters, raises ValueError on bad input"""
+
+    equals = {}
+    ranges = {}
+
+    for param, column in (('product', 'product_name'), ('category', 'category')):
+        if args.get(param):
+            equals[column] = args[param]
+
+    for param in ('is_fake', 'verified_purchase'):
+        value = args.get(param)
+        if value is not None:
+            if value.lower() not in ('0', '1', 'true', 'false'):
+                raise ValueError(f"{param} must be true or false")
+            equals[param] = int(value.lower() in ('1', 'true'))
+
+    if args.get('rating'):
+        equals['rating'] = int(args['rating'])
+
+    min_rating = args.get('min_rating')
+    max_rating = args.get('max_rating')
+    if min_rating or max_rating:
+        ranges['rating'] = (int(min_rating) if min_rating else None, int(max_rating) if max_rating else None)
+
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    if date_from or date_to:
+        ranges['review_date'] = (
+            np.datetime64(date_from, 'D') if date_from else None,
+            np.datetime64(date_to, 'D') if date_to else None
+        )
+
+    return equals, ranges
+
+def review_records(rows):
+    """Review dicts for store rows, in the order given"""
+
+    frame = review_store.to_frame(REVIEW_FIELDS, rows=rows)
+    columns = {}
+    for name in REVIEW_FIELDS:
+        column = frame[name]
+        if name == 'review_date':
+            values = [None if day == 'NaT' else day for day in np.datetime_as_string(column.to_numpy(), unit='D')]
+        elif column.dtype.name == 'category':
+            values = column.astype(object).where(column.notna(), None).tolist()
+        else:
+            values = column.tolist()
+        columns[name] = values
+
+    return [
+        dict(zip(REVIEW_FIELDS, values), row=int(row))
+        for row, *values in zip(rows.tolist(), *(columns[name] for name in REVIEW_FIELDS))
+    ]
+
+def export_reviews(index, equals, ranges, after, limit, encode):
+    """Yield encoded chunks of matching reviews, never holding more than one chunk"""
+
+    remaining = limit
+    for rows in index.iter_rows(equals, ranges, after, block_size=EXPORT_CHUNK_SIZE):
+        if remaining is not None:
+            rows = rows[:remaining]
+            remaining -= len(rows)
+        yield encode(review_records(rows))
+        if remaining == 0:
+            return
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip stream as they are produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@app.route('/api/reviews', methods=['GET'])
+def list_reviews():
+    """Filtered reviews, a cursor-paged JSON page or a streamed NDJSON / msgpack export"""
+    try:
+        equals, ranges = parse_review_filters(request.args)
+        after = int(request.args.get('cursor', -1))
+        output = request.args.get('format', 'json')
+        limit = request.args.get('limit')
+        index = review_index
+
+        if output == 'json':
+            limit = min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+            rows, has_more = index.query(equals, ranges, after, limit)
+            reviews = review_records(rows)
+            return jsonify({
+                "success": True,
+                "count": len(reviews),
+                "reviews": reviews,
+                "next_cursor": str(int(rows[-1])) if has_more else None
+            })
+
+        limit = int(limit) if limit else None
+
+        if output == 'ndjson':
+            def encode(records):
+                return ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+            mimetype = 'application/x-ndjson'
+        elif output == 'msgpack':
+            if msgpack is None:
+                return jsonify({"success": False, "error": "msgpack output needs the msgpack package"})
+            def encode(records):
+                return b''.join(msgpack.packb(record) for record in records)
+            mimetype = 'application/x-msgpack'
+        else:
+            return jsonify({"success": False, "error": "format must be json, ndjson or msgpack"})
+
+        chunks = export_reviews(index, equals, ranges, after, limit, encode)
+        headers = {}
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+
+        return app.response_class(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid parameter: {e}"})
+    except Exception as e:
+        return request_failed(e)
+
+def validate_review(record):
+    """Return an error message for an ingested record, or None if it is usable"""
+
+    if not isinstance(record, dict):
+        return "record must be a JSON object"
+    if not isinstance(record.get('product_name'), str) or not record['product_name'].strip():
+        return "product_name is required"
+    if not isinstance(record.get('review_text'), str):
+        return "review_text is required"
+    rating = record.get('rating')
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5:
+        return "rating must be a number between 1 and 5"
+    return None
+
+def reviewer_frame(data):
+    """One-row frame of the reviewer details in a /api/detect-fake body, absent ones stay missing"""
+    return pd.DataFrame([{
+        'reviewer_id': int(data.get('reviewer_id') or ANONYMOUS_REVIEWER),
+        'rating': float(data.get('rating', 0)),
+        'verified_purchase': 1 if data.get('verified_purchase', DEFAULT_VERIFIED_PURCHASE) else 0,
+        'review_date': data.get('review_date')
+    }])
+
+def reviewer_behavior(frame):
+    """Behavioral features of incoming reviews, as they will be once stored.
+
+    Missing reviewer details are filled into frame with the defaults they are stored with,
+    so scoring describes a review the same way whichever endpoint it arrived through.
+    """
+
+    if 'review_date' not in frame.columns:
+        frame['review_date'] = None
+    frame['review_date'] = frame['review_date'].fillna(datetime.date.today().isoformat())
+
+    for column, default in (('reviewer_id', ANONYMOUS_REVIEWER), ('verified_purchase', DEFAULT_VERIFIED_PURCHASE)):
+        if column not in frame.columns:
+            frame[column] = default
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(default)
+    return reviewer_index.features_with(
+        frame['reviewer_id'].to_numpy(), frame['rating'].to_numpy(),
+        frame['verified_purchase'].to_numpy(), frame['review_date']
+    )
+
+def ingest_chunk(records):
+    """Score a chunk of reviews, append it to the store and update the aggregates"""
+
+    frame = pd.DataFrame.from_records(records)
+    texts = frame['review_text'].tolist()
+    behavior = reviewer_behavior(frame)
+
+    # Verdicts always come from the model, client supplied labels are not trusted
+    with stage_timer('ingest.score'):
+        predictions, _ = score_reviews(texts, behavior)
+    frame['is_fake'] = predictions
+    with stage_timer('ingest.sentiment'):
+        frame['sentiment'] = [sentiment_analyzer.classify_sentiment(text) for text in texts]
+
+    features = detector.extract_features_batch(texts)
+    frame['review_length'] = features[:, 0].astype(int)
+    frame['exclamation_count'] = features[:, 2].astype(int)
+    frame['capital_ratio'] = features[:, 4]
+
+    if 'review_id' not in frame.columns:
+        frame['review_id'] = None
+    missing_ids = frame['review_id'].isna()
+    frame.loc[missing_ids, 'review_id'] = [f"REV_{uuid.uuid4().hex[:12]}" for _ in range(int(missing_ids.sum()))]
+
+    if 'category' not in frame.columns:
+        frame['category'] = None
+    missing_categories = frame['category'].isna()
+    frame.loc[missing_categories, 'category'] = frame.loc[missing_categories, 'product_name'].str.split(' - ').str[0]
+
+    with stage_timer('ingest.append'), data_lock:
+        index_store_rows(review_store.append(frame))
+
+    return int(predictions.sum())
+
+@app.route('/api/reviews', methods=['POST'])
+def ingest_reviews():
+    """Stream NDJSON reviews into the running server, one JSON object per line"""
+    try:
+        if not detector.is_ready():
+            return model_unavailable()
+
+        accepted = 0
+        fake_reviews = 0
+        errors = []
+        rejected = 0
+        chunk = []
+
+        for line_number, line in enumerate(iter(request.stream.readline, b''), start=1):
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+                error = "invalid JSON"
+            else:
+                error = validate_review(record)
+
+            if error:
+                rejected += 1
+                if len(errors) < 100:
+                    errors.append({"line": line_number, "error": error})
+                continue
+
+            chunk.append(record)
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                fake_reviews += ingest_chunk(chunk)
+                accepted += len(chunk)
+                chunk = []
+
+        if chunk:
+            fake_reviews += ingest_chunk(chunk)
+            accepted += len(chunk)
+
+        return jsonify({
+            "success": True,
+            "accepted": accepted,
+            "rejected": rejected,
+            "fake_reviews": fake_reviews,
+            "errors": errors,
+            "total_reviews": len(review_store)
         })
     except Exception as e:
-        print(f"Error in detect_fake: {e}")
-        return jsonify({"success": False, "error": str(e)})
+        return request_failed(e)
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     print("="*70)
     print("Smart Product Review Analyzer with Fake Review Detection")
     print("="*70)
     print("Starting Flask application...")
     print("Access dashboard at: http://localhost:5000/dashboard")
+    print("For production use: gunicorn -c gunicorn.conf.py wsgi:app")
     print("="*70)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
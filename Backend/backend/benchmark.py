@@ -0,0 +1,272 @@
+import numpy as np
+import contextlib
+import datetime
+import platform
+import tempfile
+import json
+import time
+import io
+import os
+from synthetic_reviews import write_reviews_csv, iter_review_chunks
+from fake_review_detector import FakeReviewDetector
+from reviewer_index import HISTORY_COLUMNS
+from sentiment_analyzer import SentimentAnalyzer
+from review_summarizer import ReviewSummarizer
+from metrics import LatencyTracker
+
+DEFAULT_ROWS = 10000
+
+# Training fits gradient boosting in memory, so it runs on at most this many of the generated rows
+DEFAULT_TRAIN_ROWS = 100000
+
+# Calls timed per latency measurement
+DEFAULT_REPEATS = 50
+
+# Reviews per /api/detect-fake/batch and POST /api/reviews request
+REQUEST_BATCH_SIZE = 100
+
+# A stage counts as a regression when it gets this much slower than the baseline
+DEFAULT_TOLERANCE = 0.2
+
+# predict_batch has to rescore a nightly import of a million reviews within this many seconds,
+# on production hardware; --min-batch-rate MIN_BATCH_ROWS_PER_SECOND checks it there
+MILLION_REVIEWS_BUDGET_SECONDS = 60
+MIN_BATCH_ROWS_PER_SECOND = 1000000 / MILLION_REVIEWS_BUDGET_SECONDS
+
+def timed(fn, *args, **kwargs):
+    """fn's result and its wall time in seconds"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def throughput(seconds, rows):
+    return {'seconds': round(seconds, 6), 'rows': rows, 'rows_per_second': round(rows / seconds, 1) if seconds else None}
+
+def latencies(calls):
+    """p50/p99 of each call in milliseconds, calls is an iterable of zero-argument functions"""
+
+    tracker = LatencyTracker()
+    total = 0.0
+    for call in calls:
+        _, seconds = timed(call)
+        tracker.record(seconds)
+        total += seconds
+    result = tracker.percentiles()
+    result['mean_ms'] = round(total / result['count'] * 1000, 3) if result['count'] else None
+    return result
+
+def benchmark_components(store, reviewer_index, duplicate_index, model_dir, train_rows, repeats, rng):
+    """Time training, single and batch scoring, sentiment analysis and key phrase extraction"""
+
+    results = {}
+    texts = store.to_frame(['review_text'])['review_text'].tolist()
+
+    detector = FakeReviewDetector(
+        model_dir=model_dir, auto_load=False, reviewer_index=reviewer_index, duplicate_index=duplicate_index
+    )
+    columns = ['review_text', 'is_fake'] + (HISTORY_COLUMNS if detector.reviewer_index is not None else [])
+    train_frame = store.to_frame(columns, rows=np.arange(min(train_rows, len(store))))
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds = timed(detector.train_model, train_frame)
+    results['train_model'] = throughput(seconds, len(train_frame))
+
+    samples = [texts[i] for i in rng.integers(0, len(texts), repeats)]
+    results['predict_single'] = latencies(lambda text=text: detector.predict_single(text) for text in samples)
+
+    # Rescoring the stored reviews, as the nightly job does, with each reviewer's history as of each review
+    behavior = None
+    if reviewer_index is not None:
+        behavior = reviewer_index.features_as_of(*(store.column(column) for column in HISTORY_COLUMNS))
+    _, seconds = timed(detector.predict_batch, texts, behavior=behavior, already_indexed=True)
+    results['predict_batch'] = throughput(seconds, len(texts))
+
+    # Fresh instances, so per-instance memos start out empty
+    _, seconds = timed(SentimentAnalyzer().analyze_reviews, texts)
+    results['analyze_reviews'] = throughput(seconds, len(texts))
+
+    _, seconds = timed(ReviewSummarizer().extract_key_phrases, texts)
+    results['extract_key_phrases'] = throughput(seconds, len(texts))
+
+    return results
+
+def benchmark_endpoints(app_module, repeats, rng, seed):
+    """Time each API endpoint through the Flask test client, in milliseconds per request"""
+
+    client = app_module.app.test_client()
+    products = list(app_module.products_list)
+    texts = app_module.review_store.to_frame(['review_text'])['review_text'].tolist()
+    reviewer_ids = app_module.review_store.to_frame(['reviewer_id'])['reviewer_id'].to_numpy()
+
+    def sample_text():
+        return texts[int(rng.integers(0, len(texts)))]
+
+    def request(method, path, **kwargs):
+        def call():
+            response = client.open(path, method=method, **kwargs)
+            if response.status_code != 200 or (response.is_json and response.get_json().get('success') is False):
+                raise RuntimeError(f"{method} {path} failed with {response.status_code}: {response.get_data()[:200]!r}")
+        return call
+
+    def ingest_body(i):
+        chunk = next(iter_review_chunks(REQUEST_BATCH_SIZE, seed=seed + 1 + i))
+        chunk = chunk[['product_name', 'rating', 'review_text', 'reviewer_id', 'verified_purchase']]
+        return '\n'.join(json.dumps(record) for record in chunk.to_dict(orient='records'))
+
+    endpoints = {
+        'GET /api/stats': lambda i: request('GET', '/api/stats'),
+        'GET /api/products': lambda i: request('GET', '/api/products'),
+        # Summaries are computed on the first request for each product, then served from cache
+        'POST /api/analyze (cold)': lambda i: request(
+            'POST', '/api/analyze', json={'product_name': products[i % len(products)]}
+        ),
+        'POST /api/analyze': lambda i: request('POST', '/api/analyze', json={'product_name': products[i % len(products)]}),
+        'POST /api/detect-fake': lambda i: request('POST', '/api/detect-fake', json={'review_text': sample_text()}),
+        'POST /api/detect-fake/batch': lambda i: request(
+            'POST', '/api/detect-fake/batch', json={'reviews': [sample_text() for _ in range(REQUEST_BATCH_SIZE)]}
+        ),
+        'GET /api/model/status': lambda i: request('GET', '/api/model/status'),
+        'GET /api/cache/stats': lambda i: request('GET', '/api/cache/stats'),
+        'GET /api/trends': lambda i: request('GET', '/api/trends'),
+        'GET /api/trends/bursts': lambda i: request('GET', '/api/trends/bursts'),
+        'GET /api/duplicates': lambda i: request('GET', '/api/duplicates'),
+        'POST /api/duplicates': lambda i: request('POST', '/api/duplicates', json={'review_text': sample_text()}),
+        'GET /api/reviewers/<id>': lambda i: request(
+            'GET', f"/api/reviewers/{int(reviewer_ids[rng.integers(0, len(reviewer_ids))])}"
+        ),
+        'GET /api/reviews': lambda i: request('GET', '/api/reviews?limit=100'),
+        # Appends to the store, so it runs last
+        'POST /api/reviews': lambda i: request(
+            'POST', '/api/reviews', data=ingest_body(i), content_type='application/x-ndjson'
+        )
+    }
+
+    results = {}
+    for name, make_call in endpoints.items():
+        count = min(repeats, len(products)) if name.endswith('(cold)') else repeats
+        # Requests are built up front, so generating their bodies is not timed
+        results[name] = latencies([make_call(i) for i in range(count)])
+    return results
+
+def run_benchmarks(rows=DEFAULT_ROWS, seed=42, unique_share=0.0, train_rows=DEFAULT_TRAIN_ROWS,
+                   repeats=DEFAULT_REPEATS, workdir=None):
+    """Generate a dataset, run every benchmark against it and return the results as a dict"""
+
+    rng = np.random.default_rng(seed)
+    with contextlib.ExitStack() as stack:
+        if workdir is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix='review-benchmark-'))
+        dataset_path = os.path.join(workdir, 'reviews.csv')
+        model_dir = os.path.join(workdir, 'models')
+
+        results = {}
+        _, seconds = timed(write_reviews_csv, dataset_path, rows, seed, unique_share=unique_share)
+        results['generate_dataset'] = throughput(seconds, rows)
+
+        # The app module holds the serving state, importing it loads nothing
+        import app as app_module
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, seconds = timed(app_module.load_data, dataset_path)
+        results['load_data'] = throughput(seconds, rows)
+
+        results.update(benchmark_components(
+            app_module.review_store, app_module.reviewer_index, app_module.duplicate_index,
+            model_dir, train_rows, repeats, rng
+        ))
+
+        app_module.detector.model_dir = model_dir
+        with contextlib.redirect_stdout(io.StringIO()):
+            app_module.detector.load_model()
+        results.update(benchmark_endpoints(app_module, repeats, rng, seed))
+
+    return {
+        'meta': {
+            'rows': rows,
+            'seed': seed,
+            'unique_share': unique_share,
+            'train_rows': min(train_rows, rows),
+            'repeats': repeats,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine()
+        },
+        'results': results
+    }
+
+def headline(result):
+    """The number a stage is compared on, total seconds for throughput stages and p50 for latencies"""
+    if 'seconds' in result:
+        return result['seconds'] * 1000
+    return result.get('p50_ms')
+
+def batch_throughput_ok(report, min_rows_per_second=MIN_BATCH_ROWS_PER_SECOND):
+    """Whether predict_batch scored fast enough to stay within the million review budget"""
+    return report['results']['predict_batch']['rows_per_second'] >= min_rows_per_second
+
+def find_regressions(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """Stages that got more than tolerance slower than in baseline, as (name, before_ms, after_ms)"""
+
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        before_ms, after_ms = headline(before), headline(result)
+        if before_ms and after_ms is not None and after_ms > before_ms * (1 + tolerance):
+            regressions.append((name, before_ms, after_ms))
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the detector, analyzers and API on synthetic reviews")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--unique-share', type=float, default=0.0,
+                        help="share of reviews with a text no other review has")
+    parser.add_argument('--train-rows', type=int, default=DEFAULT_TRAIN_ROWS)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--workdir', help="keep the generated dataset and model here instead of a temporary directory")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier results to compare against, exits 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--min-batch-rate', type=float, default=0.0,
+                        help="predict_batch rows per second below which the run fails, off by default "
+                             f"(the million review budget is {MIN_BATCH_ROWS_PER_SECOND:.0f})")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        args.rows, args.seed, args.unique_share, args.train_rows, args.repeats, args.workdir
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report['results'].items():
+        if 'seconds' in result:
+            print(f"{name:32} {result['seconds']:10.3f} s    {result['rows_per_second']:>12} rows/s")
+        else:
+            print(f"{name:32} {result['p50_ms']:10.3f} ms p50 {result['p99_ms']:10.3f} ms p99")
+    print(f"✓ Results written to {args.output}")
+
+    failed = False
+    rate = report['results']['predict_batch']['rows_per_second']
+    if batch_throughput_ok(report, args.min_batch_rate):
+        print(f"{'✓ ' if args.min_batch_rate else ''}predict_batch scores 1M reviews in {1000000 / rate:.1f} s")
+    else:
+        print(f"✗ predict_batch at {rate} rows/s is below {args.min_batch_rate:.0f} rows/s")
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(json.load(f), report, args.tolerance)
+        for name, before_ms, after_ms in regressions:
+            print(f"✗ {name} regressed: {before_ms:.3f} ms -> {after_ms:.3f} ms")
+        if regressions:
+            failed = True
+        else:
+            print("✓ No regressions against the baseline")
+
+    if failed:
+        sys.exit(1)
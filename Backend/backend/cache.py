@@ -0,0 +1,262 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+import hashlib
+import sqlite3
+import time
+import os
+
+def content_digest(text):
+    """16-byte hash identifying a review text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional TTL and an approximate byte budget"""
+
+    def __init__(self, max_entries=1024, ttl=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, size = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=0):
+        """Store a value, size is its approximate footprint in bytes"""
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches predicate, returns how many were dropped"""
+
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class VerdictCache:
+    """Fake-detection verdicts keyed by a hash of the review text and the model version.
+
+    Byte-identical reviews (spam campaigns repeat the same text thousands of times) are
+    answered from memory, optionally backed by a local SQLite file that survives restarts.
+    """
+
+    def __init__(self, max_entries=100000, path=None):
+        self.memory = LRUCache(max_entries)
+        self.path = path
+        self._db = None
+        self._db_version = None
+        self._db_lock = threading.Lock()
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "model_version TEXT, digest BLOB, prediction INTEGER, confidence REAL, "
+                "PRIMARY KEY (model_version, digest))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def digest(text):
+        return content_digest(text)
+
+    def get_many(self, model_version, digests):
+        """Cached (prediction, confidence) per digest, None where there is no verdict yet"""
+
+        results = [self.memory.get((model_version, digest)) for digest in digests]
+
+        if self._db is not None:
+            missing = [i for i, result in enumerate(results) if result is None]
+            if missing:
+                found = self._load(model_version, [digests[i] for i in missing])
+                for i in missing:
+                    result = found.get(digests[i])
+                    if result is not None:
+                        results[i] = result
+                        self.memory.put((model_version, digests[i]), result)
+
+        return results
+
+    def put_many(self, model_version, digests, verdicts):
+        for digest, verdict in zip(digests, verdicts):
+            self.memory.put((model_version, digest), verdict)
+
+        if self._db is not None:
+            with self._db_lock:
+                self._drop_stale_versions(model_version)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+                    [(model_version, digest, int(prediction), float(confidence))
+                     for digest, (prediction, confidence) in zip(digests, verdicts)]
+                )
+                self._db.commit()
+
+    def _load(self, model_version, digests):
+        found = {}
+        with self._db_lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                rows = self._db.execute(
+                    "SELECT digest, prediction, confidence FROM verdicts "
+                    f"WHERE model_version = ? AND digest IN ({','.join('?' * len(chunk))})",
+                    [model_version] + chunk
+                ).fetchall()
+                for digest, prediction, confidence in rows:
+                    found[bytes(digest)] = (prediction, confidence)
+        return found
+
+    def _drop_stale_versions(self, model_version):
+        """Verdicts from an older model are never read again, remove them once per version"""
+        if self._db_version != model_version:
+            self._db.execute("DELETE FROM verdicts WHERE model_version != ?", (model_version,))
+            self._db_version = model_version
+
+    def retain_version(self, model_version):
+        """Drop every verdict not produced by model_version, returns how many in-memory entries went"""
+        dropped = self.memory.invalidate(lambda key: key[0] != model_version)
+        if self._db is not None:
+            with self._db_lock:
+                self._drop_stale_versions(model_version)
+                self._db.commit()
+        return dropped
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM verdicts")
+                self._db.commit()
+
+    def stats(self):
+        return self.memory.stats()
+
+class FeatureCache:
+    """Handcrafted feature rows keyed by review text digest, kept in an .npz file between training runs.
+
+    The stored column names are compared on load, so changing the feature set starts a fresh cache.
+    """
+
+    def __init__(self, path, feature_names):
+        self.path = path
+        self.feature_names = list(feature_names)
+        self._positions = {}
+        self._rows = np.empty((0, len(self.feature_names)), dtype=np.float64)
+        self._new_digests = []
+        self._new_rows = []
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path) as data:
+                if data['feature_names'].tolist() != self.feature_names:
+                    return
+                raw = data['digests'].tobytes()
+                self._rows = data['rows']
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return
+        self._positions = {raw[i * 16:(i + 1) * 16]: i for i in range(len(self._rows))}
+
+    def get_many(self, digests):
+        """(rows, missing) where missing lists the positions that still need featurizing"""
+        rows = np.zeros((len(digests), len(self.feature_names)), dtype=np.float64)
+        missing = []
+        for i, digest in enumerate(digests):
+            position = self._positions.get(digest)
+            if position is None:
+                missing.append(i)
+            else:
+                rows[i] = self._rows[position]
+        return rows, missing
+
+    def put_many(self, digests, rows):
+        for digest, row in zip(digests, rows):
+            if digest not in self._positions:
+                self._positions[digest] = len(self._rows) + len(self._new_rows)
+                self._new_digests.append(digest)
+                self._new_rows.append(row)
+
+    def save(self):
+        """Write the cache atomically, a no-op when nothing was added"""
+        if not self._new_rows:
+            return
+
+        self._rows = np.vstack([self._rows, np.asarray(self._new_rows, dtype=np.float64)])
+        self._new_digests, self._new_rows = [], []
+
+        ordered = [None] * len(self._positions)
+        for digest, position in self._positions.items():
+            ordered[position] = digest
+        digests = np.frombuffer(b''.join(ordered), dtype=np.uint8).reshape(-1, 16)
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f'.{os.path.basename(self.path)}.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, digests=digests, rows=self._rows, feature_names=np.asarray(self.feature_names))
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._positions)
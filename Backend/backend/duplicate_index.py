@@ -0,0 +1,372 @@
+import numpy as np
+import itertools
+import threading
+import heapq
+import re
+from reviewer_index import ANONYMOUS_REVIEWER
+
+# Per-review feature derived from the index, in the column order the detector uses
+DUPLICATE_FEATURE_NAMES = ['duplicate_cluster_size']
+
+# MinHash signature length, split into LSH bands of NUM_PERM // LSH_BANDS values each.
+# 16 bands of 4 make texts with Jaccard similarity above ~0.5 likely to share a bucket.
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# Character shingle length and the estimated Jaccard similarity two texts need to be near-duplicates
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.7
+
+# Representatives kept per bucket, members of the same cluster share one
+MAX_BUCKET_REPRESENTATIVES = 8
+
+# Texts whose signatures are computed together, bounds the shingle x permutation matrix
+SIGNATURE_CHUNK_SIZE = 512
+
+# Text/candidate pairs compared together in cluster_sizes, bounds the pairs x num_perm matrix
+SIMILARITY_CHUNK_SIZE = 65536
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+_MERSENNE = np.uint64((1 << 61) - 1)
+
+class _Cluster:
+    """Member rows of a near-duplicate cluster and the counts /api/duplicates reports"""
+
+    __slots__ = ('rows', 'fake_reviews', 'products', 'reviewers')
+
+    def __init__(self, row, product, reviewer, is_fake):
+        self.rows = [row]
+        self.fake_reviews = int(is_fake)
+        self.products = {product} if product >= 0 else set()
+        self.reviewers = {reviewer} if reviewer != ANONYMOUS_REVIEWER else set()
+
+    def merge(self, other):
+        self.rows.extend(other.rows)
+        self.fake_reviews += other.fake_reviews
+        self.products |= other.products
+        self.reviewers |= other.reviewers
+
+    def summary(self, sample_size):
+        return {
+            'size': len(self.rows),
+            'fake_reviews': self.fake_reviews,
+            'products': len(self.products),
+            'reviewers': len(self.reviewers),
+            'sample_rows': heapq.nsmallest(sample_size, self.rows)
+        }
+
+def _shingle_hashes(text):
+    """Rolling hashes of the character shingles of a normalized text"""
+    normalized = _NON_WORD.sub(' ', text.lower()).strip()
+    data = np.frombuffer(normalized.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+    if len(data) == 0:
+        return data
+    if len(data) < SHINGLE_SIZE:
+        data = np.concatenate([data, np.zeros(SHINGLE_SIZE - len(data), dtype=np.uint64)])
+
+    windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+    powers = np.uint64(257) ** np.arange(SHINGLE_SIZE - 1, -1, -1, dtype=np.uint64)
+    return np.unique((windows * powers).sum(axis=1) % _MERSENNE)
+
+def _chunk_shingle_hashes(texts):
+    """Shingle hashes of many texts at once, as one flat array and the number belonging to each text.
+
+    A text's hashes may repeat, which leaves its MinHash signature unchanged.
+    """
+    normalized = [_NON_WORD.sub(' ', text.lower()).strip().encode('utf-8') for text in texts]
+    byte_lengths = np.fromiter(map(len, normalized), dtype=np.int64, count=len(normalized))
+    lengths = np.maximum(byte_lengths - (SHINGLE_SIZE - 1), 0)
+
+    # Texts shorter than one shingle are padded, which the per-text path does
+    short = np.flatnonzero((byte_lengths > 0) & (byte_lengths < SHINGLE_SIZE))
+    lengths[short] = 1
+
+    data = np.frombuffer(b''.join(normalized), dtype=np.uint8).astype(np.uint64)
+    if len(data) >= SHINGLE_SIZE:
+        windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+        powers = np.uint64(257) ** np.arange(SHINGLE_SIZE - 1, -1, -1, dtype=np.uint64)
+        hashes = (windows * powers).sum(axis=1) % _MERSENNE
+    else:
+        hashes = np.zeros(0, dtype=np.uint64)
+
+    # Only windows that start and end inside one text are shingles of it
+    text_starts = np.concatenate([[0], np.cumsum(byte_lengths)[:-1]]).astype(np.int64)
+    output_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    window_starts = np.repeat(text_starts, lengths) + np.arange(lengths.sum()) - np.repeat(output_starts, lengths)
+    window_starts = np.minimum(window_starts, max(len(hashes) - 1, 0))
+    flat = hashes[window_starts] if len(hashes) else np.zeros(lengths.sum(), dtype=np.uint64)
+    for i in short.tolist():
+        flat[output_starts[i]] = _shingle_hashes(texts[i])[0]
+
+    return flat, lengths
+
+class DuplicateIndex:
+    """MinHash/LSH index of review texts that groups near-duplicates into clusters.
+
+    Each review is a row of the review store. A new row is only compared against the
+    representatives of the buckets it hashes into, never against every review, and joins
+    (or merges) the clusters of those it is similar to. Clusters are kept in a union-find,
+    so their sizes are available in constant time. Each cluster also keeps its fake review
+    count and distinct products and reviewers, merged smaller into larger as clusters join.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=LSH_BANDS, threshold=SIMILARITY_THRESHOLD, seed=42):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self._multipliers = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 1 << 63, num_perm // bands, dtype=np.uint64) | np.uint64(1)
+
+        self.n_rows = 0
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._parent = np.zeros(0, dtype=np.int64)
+        self._size = np.zeros(0, dtype=np.int64)
+        # Per-row product code, reviewer and label, what a review adds to a cluster it joins
+        self._product = np.zeros(0, dtype=np.int64)
+        self._reviewer = np.zeros(0, dtype=np.int64)
+        self._fake = np.zeros(0, dtype=np.int8)
+        self._buckets = [{} for _ in range(bands)]
+        # root -> _Cluster, only for clusters with more than one member
+        self._members = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        index.add_rows(store, 0, len(store))
+        return index
+
+    def signatures(self, texts):
+        """MinHash signatures of texts as an (n, num_perm) uint32 array, all zero for empty texts"""
+
+        signatures = np.zeros((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), SIGNATURE_CHUNK_SIZE):
+            flat, lengths = _chunk_shingle_hashes(texts[start:start + SIGNATURE_CHUNK_SIZE])
+            present = np.flatnonzero(lengths)
+            if not len(present):
+                continue
+
+            # Multiply-shift hashing, the products wrap around modulo 2**64 on purpose
+            # One row per permutation, so the per-text minimum runs over contiguous memory
+            with np.errstate(over='ignore'):
+                hashed = (self._multipliers[:, None] * flat + self._offsets[:, None]) >> np.uint64(32)
+            bounds = np.concatenate([[0], np.cumsum(lengths[present])[:-1]])
+            signatures[start + present] = np.minimum.reduceat(hashed, bounds, axis=1).T
+
+        return signatures
+
+    def _band_keys(self, signatures):
+        return self._band_key_array(signatures).tolist()
+
+    def _band_key_array(self, signatures):
+        bands = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.num_perm // self.bands)
+        with np.errstate(over='ignore'):
+            return (bands * self._band_mix).sum(axis=2)
+
+    def _find(self, row):
+        parent = self._parent
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return int(row)
+
+    def _roots(self, rows):
+        """Cluster roots of many rows at once, without compressing their paths"""
+        roots = np.asarray(rows, dtype=np.int64)
+        parents = self._parent[roots]
+        while (parents != roots).any():
+            roots = parents
+            parents = self._parent[roots]
+        return roots
+
+    def _union(self, a, b):
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return a
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+
+        cluster = self._members.get(a) or self._cluster(a)
+        cluster.merge(self._members.pop(b, None) or self._cluster(b))
+        self._members[a] = cluster
+        return a
+
+    def _cluster(self, row):
+        """A single-member cluster for a row no other row has joined yet"""
+        return _Cluster(row, int(self._product[row]), int(self._reviewer[row]), self._fake[row])
+
+    def _similar(self, signature, rows):
+        """The rows whose signature agrees with signature on at least threshold of its values"""
+        if not rows:
+            return set()
+        rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        agreement = (self._signatures[rows] == signature).mean(axis=1)
+        return set(rows[agreement >= self.threshold].tolist())
+
+    def _matches(self, signature, keys):
+        """Representatives similar to signature, from the buckets it hashes into"""
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+        return self._similar(signature, candidates)
+
+    def add_rows(self, store, start, stop):
+        """Index store rows [start, stop), which must directly follow the indexed ones"""
+
+        if start != self.n_rows:
+            raise ValueError(f"Rows must be indexed in order, expected {self.n_rows} got {start}")
+        if stop <= start:
+            return
+
+        rows = np.arange(start, stop)
+        texts = store.to_frame(['review_text'], rows=rows)['review_text'].tolist()
+        signatures = self.signatures(texts)
+        band_keys = self._band_keys(signatures)
+
+        with self._lock:
+            self._grow(stop)
+            self._signatures[start:stop] = signatures
+            self._parent[start:stop] = np.arange(start, stop)
+            self._size[start:stop] = 1
+            self._product[start:stop] = store.column('product_name', rows)
+            self._reviewer[start:stop] = store.column('reviewer_id', rows)
+            self._fake[start:stop] = store.column('is_fake', rows)
+
+            for offset, (signature, keys) in enumerate(zip(signatures, band_keys)):
+                row = start + offset
+                if not signature.any():
+                    continue
+
+                buckets = [self._buckets[band].setdefault(key, []) for band, key in enumerate(keys)]
+                similar = self._similar(signature, {other for bucket in buckets for other in bucket})
+                for other in similar:
+                    self._union(row, other)
+
+                # A bucket that already holds a member of this cluster does not need another
+                for bucket in buckets:
+                    if len(bucket) < MAX_BUCKET_REPRESENTATIVES and similar.isdisjoint(bucket):
+                        bucket.append(row)
+
+            self.n_rows = stop
+
+    def _grow(self, n_rows):
+        """Make room for n_rows, doubling so appends stay amortized O(1)"""
+        if n_rows > len(self._parent):
+            capacity = max(n_rows, 2 * len(self._parent))
+            signatures = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+            signatures[:self.n_rows] = self._signatures[:self.n_rows]
+            self._signatures = signatures
+            self._parent = np.resize(self._parent, capacity)
+            self._size = np.resize(self._size, capacity)
+            self._product = np.resize(self._product, capacity)
+            self._reviewer = np.resize(self._reviewer, capacity)
+            self._fake = np.resize(self._fake, capacity)
+
+    def cluster_size(self, row):
+        """Number of indexed reviews in row's near-duplicate cluster, itself included"""
+        with self._lock:
+            return int(self._size[self._find(row)])
+
+    def cluster_sizes(self, texts, adding=False):
+        """Size of the near-duplicate cluster each text falls in.
+
+        For texts already indexed this is their own cluster, pass adding=False for them.
+        With adding=True it is the size the cluster would have once the text is added,
+        which is what scoring a new review should see.
+        """
+
+        # Repeated texts are hashed and matched once
+        positions = {}
+        inverse = np.fromiter((positions.setdefault(text, len(positions)) for text in texts),
+                              dtype=np.int64, count=len(texts))
+        distinct = list(positions)
+        signatures = self.signatures(distinct)
+        present = np.flatnonzero(signatures.any(axis=1))
+        band_keys = self._band_key_array(signatures[present])
+
+        # Each distinct band key is looked up once. Bucket lists are only appended to, and the
+        # signature array only replaced by _grow, so what is copied under the lock stays valid.
+        band_lookups = []
+        with self._lock:
+            indexed = self._signatures
+            for band in range(self.bands):
+                keys, key_of_text = np.unique(band_keys[:, band], return_inverse=True)
+                buckets = [self._buckets[band].get(key, ()) for key in keys.tolist()]
+                bucket_sizes = np.fromiter(map(len, buckets), dtype=np.int64, count=len(buckets))
+                bucket_rows = np.fromiter(itertools.chain.from_iterable(buckets), dtype=np.int64)
+                band_lookups.append((key_of_text, bucket_sizes, bucket_rows))
+
+        # Every (text, candidate row) pair, once however many bands they share
+        pair_texts, pair_rows = [], []
+        for key_of_text, bucket_sizes, bucket_rows in band_lookups:
+            bucket_starts = np.concatenate([[0], np.cumsum(bucket_sizes)[:-1]])
+            counts = bucket_sizes[key_of_text]
+            texts_repeated = np.repeat(np.arange(len(present)), counts)
+            within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_texts.append(present[texts_repeated])
+            pair_rows.append(bucket_rows[np.repeat(bucket_starts[key_of_text], counts) + within])
+        n_indexed = max(len(indexed), 1)
+        pairs = np.unique(np.concatenate(pair_texts) * n_indexed + np.concatenate(pair_rows))
+        pair_texts, pair_rows = pairs // n_indexed, pairs % n_indexed
+
+        similar = np.zeros(len(pair_rows), dtype=bool)
+        for start in range(0, len(pair_rows), SIMILARITY_CHUNK_SIZE):
+            chunk = slice(start, start + SIMILARITY_CHUNK_SIZE)
+            agreeing = np.count_nonzero(indexed[pair_rows[chunk]] == signatures[pair_texts[chunk]], axis=1)
+            similar[chunk] = agreeing / self.num_perm >= self.threshold
+        pair_texts, pair_rows = pair_texts[similar], pair_rows[similar]
+
+        with self._lock:
+            roots = self._roots(pair_rows)
+            root_sizes = self._size[roots]
+
+        # A text similar to several members of one cluster counts that cluster once
+        _, first = np.unique(pair_texts * max(len(self._parent), 1) + roots, return_index=True)
+        sizes = np.bincount(pair_texts[first], weights=root_sizes[first], minlength=len(distinct))
+        sizes = sizes.astype(np.float64)[inverse]
+
+        return sizes + 1 if adding else np.maximum(sizes, 1)
+
+    def cluster_of(self, text, sample_size=3):
+        """Summaries of the cluster(s) text is a near-duplicate of, largest cluster first.
+
+        Each has the cluster's size, fake review count, distinct products and (non-anonymous)
+        reviewers, and its sample_size lowest rows.
+        """
+
+        signature = self.signatures([text])[0]
+        if not signature.any():
+            return []
+
+        with self._lock:
+            roots = {self._find(row) for row in self._matches(signature, self._band_keys(signature[None, :])[0])}
+            clusters = [(self._members.get(root) or self._cluster(root)).summary(sample_size) for root in roots]
+        return sorted(clusters, key=lambda cluster: cluster['size'], reverse=True)
+
+    def largest_clusters(self, min_size=2, limit=20, sample_size=3):
+        """Summaries of the biggest near-duplicate clusters, largest first, as cluster_of gives them"""
+
+        with self._lock:
+            clusters = [
+                (len(cluster.rows), root) for root, cluster in self._members.items() if len(cluster.rows) >= min_size
+            ]
+            largest = heapq.nsmallest(limit, clusters, key=lambda cluster: (-cluster[0], cluster[1]))
+            return [self._members[root].summary(sample_size) for _, root in largest]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'indexed_reviews': self.n_rows,
+                'duplicate_clusters': len(self._members),
+                'reviews_in_clusters': sum(len(cluster.rows) for cluster in self._members.values())
+            }
+
+    def __len__(self):
+        return self.n_rows
@@ -1,168 +1,606 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+from scipy import sparse
 import re
-import joblib
+import threading
+import logging
 import os
+from collections import Counter, namedtuple
+from review_store import ReviewStore
+from model_bundle import DEFAULT_MODEL_DIR, ModelBundle, model_dir_lock, read_current_version, save_bundle
+from inference_engine import compile_model
+from cache import FeatureCache, content_digest
+from parallel import PARALLEL_CHUNK_SIZE, parallel_map, should_parallelize
+from reviewer_index import BEHAVIOR_FEATURE_NAMES, HISTORY_COLUMNS, ReviewerIndex
+from duplicate_index import DUPLICATE_FEATURE_NAMES
+from metrics import stage_timer
+
+# sklearn and joblib are only needed for training and for reading legacy pickles,
+# they are imported where used so serving workers start without paying for them
+
+logger = logging.getLogger(__name__)
+
+# Order of the handcrafted features, matching the columns the scaler was fitted on
+FEATURE_NAMES = [
+    'review_length', 'char_count', 'exclamation_count', 'question_count',
+    'capital_ratio', 'repetition_ratio', 'generic_word_count', 'all_caps_words'
+]
+
+GENERIC_WORDS = {'best', 'perfect', 'amazing', 'great', 'excellent', 'worst', 'terrible', 'awful'}
+
+# TF-IDF vocabulary size, the sparse pipeline lets this grow well past the original 100
+TFIDF_MAX_FEATURES = 100
+
+# Rows scored per model call in predict_batch, keeps memory bounded on large imports
+PREDICT_BATCH_SIZE = 10000
+
+# Learners train_model can fit, 'hist' bins the features and trains on all cores,
+# which is what retrains over millions of reviews should use
+LEARNERS = ('gradient_boosting', 'hist')
+DEFAULT_LEARNER = os.environ.get('FAKE_DETECTOR_LEARNER', 'gradient_boosting')
+
+# 'hist' cannot take sparse input, training sets whose dense copy would need more float64
+# cells than this (2 GiB) are refused instead of running out of memory
+HIST_MAX_DENSE_CELLS = int(os.environ.get('FAKE_DETECTOR_HIST_MAX_CELLS', 2 ** 28))
+
+# Handcrafted features of every review trained on so far, stored next to the bundles
+FEATURE_CACHE_FILE = 'feature_cache.npz'
+
+# Seconds between checks of the CURRENT pointer when watching the model directory
+MODEL_WATCH_INTERVAL = 5.0
+
+# Everything one prediction needs, replaced as a whole so a request never mixes two models
+ModelState = namedtuple('ModelState', ['model', 'engine', 'vectorizer', 'scaler', 'version', 'feature_names'])
+
+def _extract_features_shard(texts):
+    return FakeReviewDetector.extract_features_batch(texts)
 
 class FakeReviewDetector:
-    def __init__(self):
-        self.model = None
-        self.vectorizer = None
-        self.scaler = None
-        self.is_trained = False
-        self.load_or_train_model()
+    def __init__(self, max_features=TFIDF_MAX_FEATURES, verdict_cache=None, auto_load=True,
+                 model_dir=DEFAULT_MODEL_DIR, learner=DEFAULT_LEARNER, n_jobs=1,
+                 chunk_size=PARALLEL_CHUNK_SIZE, reviewer_index=None, duplicate_index=None):
+        if learner not in LEARNERS:
+            raise ValueError(f"Unknown learner {learner!r}, expected one of {LEARNERS}")
+
+        self.max_features = max_features
+        self.model_dir = model_dir
+        self.learner = learner
+        # n_jobs > 1 (or -1 for all cores) featurizes new training reviews across a process pool
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.verdict_cache = verdict_cache
+        # When set, models are trained with the reviewer's behavioral features and the size of
+        # the review's near-duplicate cluster as extra columns
+        self.reviewer_index = reviewer_index
+        self.duplicate_index = duplicate_index
+        self._state = None
+        self.load_error = None
+        # Set once loading (or training) has finished, whether or not a model came out of it
+        self.load_finished = threading.Event()
+        # Called with the new version after a different model has been swapped in
+        self.reload_listeners = []
+        self._reload_lock = threading.Lock()
+        self._watch_stop = threading.Event()
+        if auto_load:
+            self.load_or_train_model()
+
+    @property
+    def is_trained(self):
+        return self._state is not None
+
+    @property
+    def model(self):
+        return self._state.model if self._state else None
+
+    @property
+    def engine(self):
+        """What predictions run through, the compiled tree engine whenever the model supports it"""
+        return self._state.engine if self._state else None
+
+    @property
+    def vectorizer(self):
+        return self._state.vectorizer if self._state else None
+
+    @property
+    def scaler(self):
+        return self._state.scaler if self._state else None
+
+    @property
+    def model_version(self):
+        return self._state.version if self._state else None
+
+    @property
+    def feature_names(self):
+        return self._state.feature_names if self._state else None
+
+    @property
+    def uses_behavior(self):
+        """Whether the loaded model expects reviewer behavioral features"""
+        return self._uses_behavior(self._state)
+
+    @property
+    def uses_duplicates(self):
+        """Whether the loaded model expects the near-duplicate cluster size"""
+        return self._uses_duplicates(self._state)
+
+    @staticmethod
+    def _uses_behavior(state):
+        return state is not None and BEHAVIOR_FEATURE_NAMES[0] in (state.feature_names or ())
+
+    @staticmethod
+    def _uses_duplicates(state):
+        return state is not None and DUPLICATE_FEATURE_NAMES[0] in (state.feature_names or ())
+
+    def _swap_state(self, state):
+        """Publish a new model, requests already scoring keep the state they started with"""
+        previous = self._state
+        self._state = state
+        if previous is not None and previous.version != state.version:
+            for listener in self.reload_listeners:
+                listener(state.version)
+
+    def load_in_background(self):
+        """Load or train the model on a daemon thread so startup is not blocked"""
+        thread = threading.Thread(target=self.load_or_train_model, name='fake-detector-load', daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self):
+        return self.is_trained
 
     def extract_features(self, review_text):
         """Extract linguistic and behavioral features from review text"""
 
-        features = {}
+        return dict(zip(FEATURE_NAMES, self._feature_row(review_text)))
 
-        features['review_length'] = len(review_text.split())
-        features['char_count'] = len(review_text)
+    @staticmethod
+    def extract_features_batch(texts):
+        """Extract handcrafted features for many reviews as an (n, 8) array"""
 
-        features['exclamation_count'] = review_text.count('!')
-        features['question_count'] = review_text.count('?')
+        X = np.empty((len(texts), len(FEATURE_NAMES)), dtype=np.float64)
+        for i, text in enumerate(texts):
+            X[i] = FakeReviewDetector._feature_row(text)
+        return X
 
-        
-        if len(review_text) > 0:
-            features['capital_ratio'] = sum(1 for c in review_text if c.isupper()) / len(review_text)
-        else:
-            features['capital_ratio'] = 0
+    @staticmethod
+    def _feature_row(review_text):
+        """Compute the handcrafted feature values in FEATURE_NAMES order"""
 
-        
+        raw_words = review_text.split()
         words = review_text.lower().split()
-        if len(words) > 0:
-            word_counts = {}
-            for word in words:
-                word_counts[word] = word_counts.get(word, 0) + 1
-            max_repetition = max(word_counts.values()) if word_counts else 1
-            features['repetition_ratio'] = max_repetition / len(words)
-        else:
-            features['repetition_ratio'] = 0
+        char_count = len(review_text)
 
-        generic_words = ['best', 'perfect', 'amazing', 'great', 'excellent', 'worst', 'terrible', 'awful']
-        features['generic_word_count'] = sum(1 for word in words if word in generic_words)
+        capital_ratio = sum(map(str.isupper, review_text)) / char_count if char_count > 0 else 0
 
-        features['all_caps_words'] = sum(1 for word in review_text.split() if word.isupper() and len(word) > 1)
-
-        return features
+        if words:
+            repetition_ratio = max(Counter(words).values()) / len(words)
+        else:
+            repetition_ratio = 0
+
+        generic_word_count = sum(1 for word in words if word in GENERIC_WORDS)
+        all_caps_words = sum(1 for word in raw_words if word.isupper() and len(word) > 1)
+
+        return (
+            len(raw_words),
+            char_count,
+            review_text.count('!'),
+            review_text.count('?'),
+            capital_ratio,
+            repetition_ratio,
+            generic_word_count,
+            all_caps_words
+        )
 
     def prepare_training_data(self, df):
+        X_scaled, y, feature_names, _, _ = self._fit_training_data(df)
+        return X_scaled, y, feature_names
+
+    def _fit_training_data(self, df):
+        """Fit a fresh vectorizer and scaler, returns them with the scaled training matrix"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.preprocessing import StandardScaler
 
         X_text = df['review_text'].tolist()
 
-        feature_dicts = [self.extract_features(text) for text in X_text]
-        X_features = pd.DataFrame(feature_dicts)
+        X_features = self._training_features(X_text)
 
-        self.vectorizer = TfidfVectorizer(max_features=100, ngram_range=(1, 2))
-        X_tfidf = self.vectorizer.fit_transform(X_text)
-        X_tfidf_df = pd.DataFrame(X_tfidf.toarray(), 
-                                   columns=[f'tfidf_{i}' for i in range(X_tfidf.shape[1])])
+        # Context columns come from the reviewer and duplicate indexes, which already hold these reviews.
+        # Behavior is taken as of each review's date, the index's totals include later reviews.
+        context_blocks = []
+        feature_names = list(FEATURE_NAMES)
+        if self.reviewer_index is not None and 'reviewer_id' in df.columns:
+            context_blocks.append(self.reviewer_index.features_as_of(*(
+                df[column].to_numpy() if column in df.columns else None for column in HISTORY_COLUMNS
+            )))
+            feature_names += BEHAVIOR_FEATURE_NAMES
+        if self.duplicate_index is not None:
+            context_blocks.append(self.duplicate_index.cluster_sizes(X_text)[:, None])
+            feature_names += DUPLICATE_FEATURE_NAMES
+        X_context = np.hstack(context_blocks) if context_blocks else None
 
-        X_combined = pd.concat([X_features.reset_index(drop=True), 
-                               X_tfidf_df.reset_index(drop=True)], axis=1)
+        vectorizer = TfidfVectorizer(max_features=self.max_features, ngram_range=(1, 2))
+        X_tfidf = vectorizer.fit_transform(X_text)
 
-        self.scaler = StandardScaler()
-        X_scaled = self.scaler.fit_transform(X_combined)
+        X_combined = self._combine_features(X_features, X_tfidf, X_context)
+
+        # Scale without centering so the matrix stays sparse
+        scaler = StandardScaler(with_mean=False)
+        X_scaled = scaler.fit_transform(X_combined)
 
         y = df['is_fake'].values
 
-        return X_scaled, y, X_combined.columns.tolist()
+        feature_names += [f'tfidf_{i}' for i in range(X_tfidf.shape[1])]
+
+        return X_scaled, y, feature_names, vectorizer, scaler
+
+    def _training_features(self, texts):
+        """Handcrafted features for training, only reviews no earlier run has seen are featurized"""
+
+        cache = FeatureCache(os.path.join(self.model_dir, FEATURE_CACHE_FILE), FEATURE_NAMES)
+        digests = [content_digest(text) for text in texts]
+        X, missing = cache.get_many(digests)
+
+        if missing:
+            new_texts = [texts[i] for i in missing]
+            if should_parallelize(self.n_jobs, self.chunk_size, len(new_texts)):
+                rows = np.vstack(parallel_map(_extract_features_shard, new_texts, self.n_jobs, self.chunk_size))
+            else:
+                rows = self.extract_features_batch(new_texts)
+            X[missing] = rows
+
+            cache.put_many([digests[i] for i in missing], rows)
+            try:
+                cache.save()
+            except OSError as e:
+                logger.warning("Could not save feature cache: %s", e)
+
+        logger.info("Training features: %d cached, %d extracted", len(texts) - len(missing), len(missing))
+        return X
+
+    def _make_learner(self, learner):
+        if learner == 'hist':
+            from sklearn.ensemble import HistGradientBoostingClassifier
+            return HistGradientBoostingClassifier(
+                max_iter=100,
+                learning_rate=0.1,
+                max_depth=5,
+                random_state=42
+            )
+
+        from sklearn.ensemble import GradientBoostingClassifier
+        return GradientBoostingClassifier(
+            n_estimators=100,
+            learning_rate=0.1,
+            max_depth=5,
+            random_state=42
+        )
 
-    def train_model(self, df):
-        """Train the fake review detection model"""
+    def train_model(self, df, learner=None):
+        """Train the fake review detection model and publish it as a new bundle"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report, accuracy_score
 
-        print("Training fake review detection model...")
+        learner = learner or self.learner
+        if learner not in LEARNERS:
+            raise ValueError(f"Unknown learner {learner!r}, expected one of {LEARNERS}")
 
-        X, y, feature_names = self.prepare_training_data(df)
+        print(f"Training fake review detection model ({learner})...")
+
+        with stage_timer('detector.train.features'):
+            X, y, feature_names, vectorizer, scaler = self._fit_training_data(df)
+
+        if learner == 'hist' and X.shape[0] * X.shape[1] > HIST_MAX_DENSE_CELLS:
+            raise ValueError(
+                f"learner 'hist' needs a dense copy of {X.shape[0]} x {X.shape[1]} features, more than "
+                f"HIST_MAX_DENSE_CELLS={HIST_MAX_DENSE_CELLS}; lower max_features or train with "
+                f"'gradient_boosting', which takes the sparse matrix"
+            )
 
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
         )
 
-        self.model = GradientBoostingClassifier(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            random_state=42
-        )
+        if learner == 'hist':
+            # Histogram boosting only takes dense input, its size was bounded above
+            X_train, X_test = X_train.toarray(), X_test.toarray()
 
-        self.model.fit(X_train, y_train)
+        model = self._make_learner(learner)
+        with stage_timer('detector.train.fit'):
+            model.fit(X_train, y_train)
 
-        y_pred = self.model.predict(X_test)
+        y_pred = model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
 
         print(f"✓ Model trained with accuracy: {accuracy:.4f}")
         print("\nClassification Report:")
         print(classification_report(y_test, y_pred, target_names=['Genuine', 'Fake']))
 
-        self.save_model()
+        version = save_bundle(model, vectorizer, scaler, self.model_dir, feature_names=feature_names)
+        print(f"✓ Model saved to {self.model_dir} as bundle {version}")
 
-        self.is_trained = True
+        # Requests keep using the previous model until the new one is fitted and written
+        self._swap_state(ModelState(model, compile_model(model), vectorizer, scaler, version, feature_names))
 
         return accuracy
 
-    def predict_single(self, review_text):
+    def predict_single(self, review_text, behavior=None, duplicate_size=None):
 
         if not self.is_trained:
             return False, 0.0, {}
 
         features_dict = self.extract_features(review_text)
 
-        tfidf_features = self.vectorizer.transform([review_text]).toarray()
-        tfidf_df = pd.DataFrame(tfidf_features, 
-                                columns=[f'tfidf_{i}' for i in range(tfidf_features.shape[1])])
+        predictions, confidences = self.predict_batch(
+            [review_text], behavior=None if behavior is None else np.asarray(behavior)[None, :],
+            duplicate_sizes=None if duplicate_size is None else [duplicate_size]
+        )
+
+        return predictions[0], confidences[0], features_dict
+
+    def predict_batch(self, texts, batch_size=PREDICT_BATCH_SIZE, behavior=None, already_indexed=False,
+                      duplicate_sizes=None):
+        """Score many reviews at once, returns (predictions, confidences) arrays.
 
-        X_features = pd.DataFrame([features_dict])
-        X_combined = pd.concat([X_features.reset_index(drop=True), 
-                               tfidf_df.reset_index(drop=True)], axis=1)
+        behavior holds one row of reviewer features per text (see ReviewerIndex.features_with),
+        it is only used by models trained with them and defaults to a first review. Models
+        trained with duplicate cluster sizes use duplicate_sizes when given, and otherwise look
+        them up in the duplicate index. Texts are scored as new reviews joining their cluster
+        unless already_indexed is set, which reviews from the store must pass so they see the
+        same cluster sizes as at training time.
+        """
 
-        
-        X_scaled = self.scaler.transform(X_combined)
+        texts = list(texts)
+        predictions = np.zeros(len(texts), dtype=np.int64)
+        confidences = np.zeros(len(texts), dtype=np.float64)
 
-        
-        prediction = self.model.predict(X_scaled)[0]
-        probability = self.model.predict_proba(X_scaled)[0]
-        confidence = probability[prediction]
+        # One snapshot for the whole call, a concurrent reload does not affect it
+        state = self._state
+        if state is None or not texts:
+            return predictions, confidences
 
-        return prediction, confidence, features_dict
+        context = self._context_features(state, texts, behavior, already_indexed, duplicate_sizes)
+
+        if self.verdict_cache is None:
+            self._score_into(state, texts, predictions, confidences, batch_size, context)
+            return predictions, confidences
+
+        if context is None:
+            digests = [self.verdict_cache.digest(text) for text in texts]
+        else:
+            # The verdict depends on the context columns as well as the text
+            digests = [self.verdict_cache.digest(text + '\0' + row.tobytes().hex())
+                       for text, row in zip(texts, context)]
+        cached = self.verdict_cache.get_many(state.version, digests)
+
+        # Score each distinct uncached text once, however often it repeats in the batch
+        pending = {}
+        for i, verdict in enumerate(cached):
+            if verdict is None:
+                pending.setdefault(digests[i], []).append(i)
+            else:
+                predictions[i], confidences[i] = verdict
+
+        if pending:
+            positions = [rows[0] for rows in pending.values()]
+            new_predictions = np.zeros(len(positions), dtype=np.int64)
+            new_confidences = np.zeros(len(positions), dtype=np.float64)
+            self._score_into(state, [texts[i] for i in positions], new_predictions, new_confidences, batch_size,
+                             None if context is None else context[positions])
+
+            for rows, prediction, confidence in zip(pending.values(), new_predictions, new_confidences):
+                predictions[rows] = prediction
+                confidences[rows] = confidence
+
+            self.verdict_cache.put_many(
+                state.version, list(pending.keys()),
+                list(zip(new_predictions.tolist(), new_confidences.tolist()))
+            )
+
+        return predictions, confidences
+
+    def fake_probabilities(self, texts, batch_size=PREDICT_BATCH_SIZE, behavior=None, already_indexed=False):
+        """Probability that each text is fake, for filtering at a threshold other than the model's own"""
+
+        predictions, confidences = self.predict_batch(texts, batch_size, behavior, already_indexed)
+        return np.where(predictions == 1, confidences, 1.0 - confidences)
+
+    def _context_features(self, state, texts, behavior=None, already_indexed=False, duplicate_sizes=None):
+        """Columns the model reads from outside the text itself, None when it was trained without any"""
+
+        blocks = []
+        if self._uses_behavior(state):
+            if behavior is None:
+                behavior = ReviewerIndex.anonymous_features(len(texts))
+            blocks.append(np.asarray(behavior, dtype=np.float64))
+        if self._uses_duplicates(state):
+            if duplicate_sizes is not None:
+                sizes = np.asarray(duplicate_sizes, dtype=np.float64)
+            elif self.duplicate_index is None:
+                sizes = np.ones(len(texts))
+            else:
+                sizes = self.duplicate_index.cluster_sizes(texts, adding=not already_indexed)
+            blocks.append(sizes[:, None])
+
+        return np.hstack(blocks) if blocks else None
+
+    def _score_into(self, state, texts, predictions, confidences, batch_size, context=None):
+        """Run the model over texts in chunks, writing results into the given arrays"""
+
+        for start in range(0, len(texts), batch_size):
+            chunk = texts[start:start + batch_size]
+            chunk_context = None if context is None else context[start:start + batch_size]
+
+            with stage_timer('detector.features'):
+                X_scaled = self._transform(state, chunk, chunk_context)
+            with stage_timer('detector.predict'):
+                probabilities = state.engine.predict_proba(X_scaled)
+            best = np.argmax(probabilities, axis=1)
+
+            predictions[start:start + len(chunk)] = state.engine.classes_.take(best)
+            confidences[start:start + len(chunk)] = probabilities[np.arange(len(chunk)), best]
+
+    def _transform(self, state, texts, context=None):
+        """Build the scaled sparse model input for a list of review texts"""
+
+        # Handcrafted and TF-IDF features depend on the text alone, repeated texts are featurized once
+        positions = {}
+        inverse = [positions.setdefault(text, len(positions)) for text in texts]
+        distinct = list(positions)
+        X_features = self.extract_features_batch(distinct)
+        X_tfidf = state.vectorizer.transform(distinct)
+        if len(distinct) < len(texts):
+            X_features = X_features[inverse]
+            X_tfidf = X_tfidf[inverse]
+        X_combined = self._combine_features(X_features, X_tfidf, context)
+
+        if not getattr(state.scaler, 'with_mean', False):
+            return state.scaler.transform(X_combined)
+
+        # Models saved before the sparse pipeline centre every column, which needs dense input
+        X_dense = X_combined.toarray()
+        columns = getattr(state.scaler, 'feature_names_in_', None)
+        if columns is not None:
+            X_dense = pd.DataFrame(X_dense, columns=columns)
+
+        return state.scaler.transform(X_dense)
+
+    def _combine_features(self, X_features, X_tfidf, X_context=None):
+        """Stack handcrafted features, context columns if any and TF-IDF output into one CSR matrix"""
+
+        blocks = [sparse.csr_matrix(X_features)]
+        if X_context is not None:
+            blocks.append(sparse.csr_matrix(X_context))
+        blocks.append(X_tfidf)
+        return sparse.hstack(blocks, format='csr')
 
     def save_model(self):
-        """Save trained model to disk"""
-        os.makedirs('models', exist_ok=True)
-        joblib.dump(self.model, 'models/fake_detector_model.pkl')
-        joblib.dump(self.vectorizer, 'models/fake_detector_vectorizer.pkl')
-        joblib.dump(self.scaler, 'models/fake_detector_scaler.pkl')
-        print("✓ Model saved to models/")
+        """Save trained model to disk as a new bundle, returns its version"""
+        state = self._state
+        version = save_bundle(state.model, state.vectorizer, state.scaler, self.model_dir,
+                              feature_names=state.feature_names)
+        print(f"✓ Model saved to {self.model_dir} as bundle {version}")
+        return version
 
     def load_model(self):
-        """Load trained model from disk"""
+        """Load trained model from disk, preferring the current model bundle"""
         try:
-            self.model = joblib.load('models/fake_detector_model.pkl')
-            self.vectorizer = joblib.load('models/fake_detector_vectorizer.pkl')
-            self.scaler = joblib.load('models/fake_detector_scaler.pkl')
-            self.is_trained = True
-            print("✓ Model loaded from models/")
+            bundle = ModelBundle.current(self.model_dir)
+        except Exception as e:
+            logger.warning("Could not open model bundle: %s", e)
+            bundle = None
+
+        if bundle is not None:
+            # Only the manifest is read here, arrays are memory-mapped on first prediction
+            with stage_timer('detector.load_model'):
+                self._swap_state(self._bundle_state(bundle))
+            print(f"✓ Model bundle {bundle.version} loaded from {self.model_dir}")
             return True
-        except:
+
+        return self._load_legacy_model()
+
+    @staticmethod
+    def _bundle_state(bundle):
+        return ModelState(bundle.model, bundle.model, bundle.vectorizer, bundle.scaler,
+                          bundle.version, bundle.manifest.get('feature_names'))
+
+    def _load_legacy_model(self):
+        """Load the three pickles older versions saved, and convert them to a bundle"""
+        import joblib
+
+        try:
+            model_path = os.path.join(self.model_dir, 'fake_detector_model.pkl')
+            model = joblib.load(model_path)
+            vectorizer = joblib.load(os.path.join(self.model_dir, 'fake_detector_vectorizer.pkl'))
+            scaler = joblib.load(os.path.join(self.model_dir, 'fake_detector_scaler.pkl'))
+        except Exception:
             return False
 
+        try:
+            with model_dir_lock(self.model_dir):
+                # Another worker may have converted the pickles while this one waited
+                bundle = ModelBundle.current(self.model_dir)
+                if bundle is None:
+                    version = save_bundle(model, vectorizer, scaler, self.model_dir)
+                    print(f"✓ Model saved to {self.model_dir} as bundle {version}")
+        except Exception as e:
+            logger.warning("Could not convert legacy model to a bundle: %s", e)
+            bundle = None
+            version = str(os.stat(model_path).st_mtime_ns)
+
+        if bundle is not None:
+            self._swap_state(self._bundle_state(bundle))
+            print(f"✓ Model bundle {bundle.version} loaded from {self.model_dir}")
+            return True
+
+        self._swap_state(ModelState(model, compile_model(model), vectorizer, scaler, version, None))
+        print(f"✓ Model loaded from {self.model_dir}")
+        return True
+
+    def reload_model(self):
+        """Swap in the bundle CURRENT points at if it differs from the loaded one.
+
+        The new bundle is opened and its arrays are read before the swap, so requests
+        keep scoring on the old model until the new one is fully usable. Returns the
+        new version, or None when the loaded model is already current.
+        """
+        with self._reload_lock:
+            version = read_current_version(self.model_dir)
+            if version is None:
+                raise FileNotFoundError(f"No model bundle in {self.model_dir}")
+            if version == self.model_version:
+                return None
+
+            with stage_timer('detector.reload_model'):
+                bundle = ModelBundle(os.path.join(self.model_dir, 'bundles', version))
+                bundle.warm()
+                self._swap_state(self._bundle_state(bundle))
+            self.load_error = None
+            print(f"✓ Model bundle {version} swapped in")
+            return version
+
+    def watch_model_dir(self, interval=MODEL_WATCH_INTERVAL):
+        """Reload whenever CURRENT changes, polled on a daemon thread until stop_watching"""
+
+        def watch():
+            while not self._watch_stop.wait(interval):
+                try:
+                    if read_current_version(self.model_dir) not in (None, self.model_version):
+                        self.reload_model()
+                except Exception:
+                    logger.exception("Model reload failed")
+
+        self._watch_stop.clear()
+        thread = threading.Thread(target=watch, name='fake-detector-watch', daemon=True)
+        thread.start()
+        return thread
+
+    def stop_watching(self):
+        self._watch_stop.set()
+
     def load_or_train_model(self):
         """Load existing model or train new one"""
-        if self.load_model():
-            return
+        try:
+            self._load_or_train_model()
+        except Exception as e:
+            self.load_error = str(e)
+            logger.exception("Error loading fake review model")
+        finally:
+            self.load_finished.set()
+
+    def _load_or_train_model(self):
+        with self._reload_lock:
+            if self.load_model():
+                return
 
         # Train new model if dataset exists
-        if os.path.exists('product_reviews_dataset.csv'):
-            df = pd.read_csv('product_reviews_dataset.csv')
-            self.train_model(df)
-        else:
+        try:
+            store = ReviewStore.open('product_reviews_dataset.csv')
+        except FileNotFoundError:
             print("⚠ No dataset found. Model will be trained when data is available.")
+            return
+
+        columns = ['review_text', 'is_fake'] + (HISTORY_COLUMNS if self.reviewer_index is not None else [])
+        self.train_model(store.to_frame(columns))
 
 if __name__ == "__main__":
     detector = FakeReviewDetector()
@@ -178,4 +616,8 @@ if __name__ == "__main__":
         print(f"\nReview: {review}")
         print(f"Prediction: {'FAKE' if is_fake else 'GENUINE'}")
         print(f"Confidence: {confidence:.2%}")
-        print(f"Features: {features}")
\ No newline at end of file
+        print(f"Features: {features}")
+
+    predictions, confidences = detector.predict_batch(test_reviews)
+    print(f"\nBatch predictions: {predictions.tolist()}")
+    print(f"Batch confidences: {[round(float(c), 4) for c in confidences]}")
\ No newline at end of file
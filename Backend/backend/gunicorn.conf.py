@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Pre-forked worker processes. The app is not preloaded in the master, each worker runs
+# create_app itself so its SQLite connection and background threads belong to it. The
+# columnar store and the model bundle are memory-mapped, so workers share their pages.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+preload_app = False
+
+# Threaded workers keep a slow batch request from blocking the dashboard. There are more
+# threads than admission slots (MAX_IN_FLIGHT) so waiting and 429 replies still have a thread.
+worker_class = 'gthread'
+threads = int(os.environ.get('WORKER_THREADS', 16))
+worker_connections = 64
+
+# Model training on a cold start happens in the background, so workers boot quickly
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,319 @@
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+
+# Batches of at least this many rows find their leaves through bitmasks, smaller ones walk
+# the trees level by level, which has less fixed cost per call
+LEAF_MASK_MIN_ROWS = 64
+
+# Rows scored together on the bitmask path, keeps each split's comparisons in cache
+LEAF_MASK_CHUNK_ROWS = 512
+
+class TreeEnsembleEngine:
+    """Binary gradient-boosted trees evaluated from contiguous node arrays.
+
+    Small batches walk every tree at once, one level per step. Larger ones evaluate
+    each split once per row and AND together bitmasks of the leaves the failed splits
+    rule out, the first leaf left standing in a tree is the one the row reaches. Both
+    skip the per-level node gathers that dominate large batches. Inputs are cast to the
+    dtype the sklearn model splits on and leaf contributions are added tree by tree,
+    the same way sklearn does it, so probabilities match bit for bit.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, learning_rate, init_raw,
+                 classes, input_dtype=np.float32):
+        self.classes_ = np.asarray(classes)
+        self.learning_rate = float(learning_rate)
+        self.init_raw = float(init_raw)
+        self.input_dtype = np.dtype(input_dtype)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.n_trees = len(self.roots)
+
+        left = np.asarray(left, dtype=np.intp)
+        right = np.asarray(right, dtype=np.intp)
+        is_leaf = left == -1
+        nodes = np.arange(len(left), dtype=np.intp)
+
+        # Only the columns some split reads are densified, split features index into them
+        feature = np.asarray(feature, dtype=np.intp)
+        self.used_features = np.unique(feature[~is_leaf]) if not is_leaf.all() else np.zeros(1, dtype=np.intp)
+
+        # Leaves point back at themselves, extra steps past a shallow tree's depth are no-ops
+        self.feature = np.where(is_leaf, 0, np.searchsorted(self.used_features, feature)).astype(np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.where(is_leaf, nodes, left)
+        self.right = np.where(is_leaf, nodes, right)
+        self.contribution = self.learning_rate * np.asarray(value, dtype=np.float64)
+        self.max_depth = _max_depth(left, right, self.roots)
+        self._leaf_masks = _leaf_mask_tables(self.feature, self.threshold, left, right, self.roots, self.contribution)
+
+    @classmethod
+    def from_arrays(cls, arrays, config):
+        """Engine over arrays laid out by export_trees, e.g. a memory-mapped model bundle"""
+        return cls(
+            arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+            arrays['value'], arrays['roots'], config['learning_rate'], config['init_raw'],
+            config['classes'], config['input_dtype']
+        )
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted (Hist)GradientBoostingClassifier"""
+        config, arrays = export_trees(model)
+        return cls.from_arrays(arrays, config)
+
+    def _used_columns(self, X):
+        """Dense array of the columns the trees split on, sparse input stays sparse until then"""
+        return X[:, self.used_features].toarray() if sparse.issparse(X) else np.asarray(X)[:, self.used_features]
+
+    def raw_predict(self, X):
+        if X.shape[0] >= LEAF_MASK_MIN_ROWS and self._leaf_masks is not None:
+            return self._raw_predict_masks(X)
+        return self._raw_predict_walk(X)
+
+    def _raw_predict_masks(self, X):
+        positions, slots, leaf_offsets, leaf_values, full = self._leaf_masks
+        X = self._used_columns(X)
+        # One row per feature, so each split compares a contiguous run of values
+        columns = np.ascontiguousarray(X.astype(self.input_dtype, copy=False).T)
+        raw = np.empty(X.shape[0], dtype=np.float64)
+
+        for start in range(0, X.shape[0], LEAF_MASK_CHUNK_ROWS):
+            chunk = columns[:, start:start + LEAF_MASK_CHUNK_ROWS]
+            n_rows = chunk.shape[1]
+
+            # Trees are ordered by split count, slot k holds the k-th split of the first n trees
+            alive = np.full((self.n_trees, n_rows), full)
+            for n_trees, feature, threshold, mask in slots:
+                alive[:n_trees] &= np.where(chunk[feature] <= threshold, full, mask)
+
+            # The lowest set bit is the leaf reached, frexp gives its position exactly
+            lowest = alive & (~alive + alive.dtype.type(1))
+            _, exponent = np.frexp(lowest.astype(np.float64))
+            values = leaf_values[leaf_offsets + exponent - 1]
+
+            # Added in the model's tree order, like the level walk
+            total = np.full(n_rows, self.init_raw)
+            for position in positions:
+                total += values[position]
+            raw[start:start + n_rows] = total
+
+        return raw
+
+    def _raw_predict_walk(self, X):
+        X = np.ascontiguousarray(self._used_columns(X), dtype=self.input_dtype)
+        n_rows, n_features = X.shape
+
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            go_left = flat[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        # cumsum adds strictly left to right, matching sklearn's per-tree accumulation
+        totals = np.empty((n_rows, self.n_trees + 1), dtype=np.float64)
+        totals[:, 0] = self.init_raw
+        totals[:, 1:] = self.contribution[node]
+        return np.cumsum(totals, axis=1)[:, -1]
+
+    def predict_proba(self, X):
+        proba = np.ones((X.shape[0], 2), dtype=np.float64)
+        proba[:, 1] = expit(self.raw_predict(X))
+        proba[:, 0] -= proba[:, 1]
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+def _max_depth(left, right, roots):
+    """Number of split levels of the deepest tree"""
+    depth = 0
+    frontier = roots
+    while True:
+        frontier = frontier[left[frontier] != -1]
+        if not len(frontier):
+            return depth
+        frontier = np.concatenate([left[frontier], right[frontier]])
+        depth += 1
+
+def _leaf_mask_tables(feature, threshold, left, right, roots, contribution):
+    """Split and leaf tables of the bitmask path, None when a tree has more than 64 leaves.
+
+    Leaves are numbered left to right within their tree. A split's mask clears the bits
+    of the leaves under its left child, which a row going right cannot reach.
+    """
+
+    tree_splits, tree_leaves = [], []
+    for root in roots.tolist():
+        splits, leaves = [], []
+        stack = [(root, None)]
+        while stack:
+            node, first = stack.pop()
+            if first is None:
+                if left[node] == -1:
+                    leaves.append(node)
+                else:
+                    # Comes back once the left subtree's leaves are numbered
+                    stack.append((node, len(leaves)))
+                    stack.append((int(left[node]), None))
+            else:
+                splits.append((node, first, len(leaves)))
+                stack.append((int(right[node]), None))
+        if len(leaves) > 64:
+            return None
+        tree_splits.append(splits)
+        tree_leaves.append(leaves)
+
+    dtype = np.uint32 if max(map(len, tree_leaves)) <= 32 else np.uint64
+    full = (1 << (8 * np.dtype(dtype).itemsize)) - 1
+    order = np.argsort([-len(splits) for splits in tree_splits], kind='stable')
+
+    slots = []
+    for k in range(max(map(len, tree_splits))):
+        splits = [tree_splits[tree][k] for tree in order if len(tree_splits[tree]) > k]
+        nodes = np.array([node for node, _, _ in splits], dtype=np.intp)
+        masks = [full & ~(((1 << (stop - first)) - 1) << first) for _, first, stop in splits]
+        slots.append((len(splits), feature[nodes], threshold[nodes][:, None], np.array(masks, dtype=dtype)[:, None]))
+
+    leaf_counts = np.array([len(tree_leaves[tree]) for tree in order])
+    leaf_offsets = np.concatenate([[0], np.cumsum(leaf_counts)[:-1]]).astype(np.intp)[:, None]
+    leaf_values = contribution[np.concatenate([tree_leaves[tree] for tree in order]).astype(np.intp)]
+    # Row of each tree in the reordered tables, in the model's tree order
+    positions = np.argsort(order).tolist()
+    return positions, slots, leaf_offsets, leaf_values, dtype(full)
+
+def export_trees(model):
+    """Flatten a fitted binary gradient boosting model into contiguous node arrays"""
+
+    if hasattr(model, '_predictors'):
+        return _export_hist_trees(model)
+
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("Only binary gradient boosting models can be compiled")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset).astype(np.int32))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        offset += tree.node_count
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int64)
+    }
+
+    init_input = np.zeros((1, model.n_features_in_), dtype=np.float32)
+    config = {
+        'type': 'gradient_boosting',
+        'classes': model.classes_.tolist(),
+        'learning_rate': float(model.learning_rate),
+        'init_raw': float(model._raw_predict_init(init_input)[0, 0]),
+        # sklearn evaluates gradient boosting splits on float32 inputs
+        'input_dtype': 'float32',
+        'n_features': int(model.n_features_in_),
+        'n_trees': len(roots)
+    }
+
+    return config, arrays
+
+def _export_hist_trees(model):
+    """Flatten a fitted binary HistGradientBoostingClassifier, whose leaf values already include the learning rate"""
+
+    if model.n_trees_per_iteration_ != 1:
+        raise ValueError("Only binary gradient boosting models can be compiled")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("Categorical splits cannot be compiled")
+        # Review features are never missing, so the missing-value direction is not needed
+        is_leaf = nodes['is_leaf'].astype(bool)
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, nodes['feature_idx']).astype(np.int32))
+        thresholds.append(nodes['num_threshold'].astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, nodes['left'].astype(np.int64) + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, nodes['right'].astype(np.int64) + offset).astype(np.int32))
+        values.append(nodes['value'].astype(np.float64))
+        offset += len(nodes)
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int64)
+    }
+
+    config = {
+        'type': 'hist_gradient_boosting',
+        'classes': model.classes_.tolist(),
+        'learning_rate': 1.0,
+        'init_raw': float(np.ravel(model._baseline_prediction)[0]),
+        # Histogram models split on the raw float64 values
+        'input_dtype': 'float64',
+        'n_features': int(model.n_features_in_),
+        'n_trees': len(roots)
+    }
+
+    return config, arrays
+
+def compile_model(model):
+    """Engine for a fitted sklearn model when it is a supported ensemble, else the model itself"""
+    try:
+        return TreeEnsembleEngine.from_sklearn(model)
+    except (AttributeError, ValueError):
+        return model
+
+def verify_parity(model, engine, X):
+    """True when the engine reproduces model.predict_proba exactly on X"""
+    return np.array_equal(model.predict_proba(X), engine.predict_proba(X))
+
+if __name__ == "__main__":
+    import os
+    import time
+    import joblib
+    from fake_review_detector import FakeReviewDetector, ModelState
+    from model_bundle import DEFAULT_MODEL_DIR
+    from review_store import ReviewStore
+
+    # Score the legacy pickles directly so the benchmark does not write a bundle
+    detector = FakeReviewDetector(auto_load=False)
+    model = joblib.load(os.path.join(DEFAULT_MODEL_DIR, 'fake_detector_model.pkl'))
+    vectorizer = joblib.load(os.path.join(DEFAULT_MODEL_DIR, 'fake_detector_vectorizer.pkl'))
+    scaler = joblib.load(os.path.join(DEFAULT_MODEL_DIR, 'fake_detector_scaler.pkl'))
+
+    engine = TreeEnsembleEngine.from_sklearn(model)
+    state = ModelState(model, engine, vectorizer, scaler, None, None)
+    texts = ReviewStore.open('product_reviews_dataset.csv').to_frame(['review_text'])['review_text'].tolist()
+    X = detector._transform(state, texts)
+
+    print(f"Trees: {engine.n_trees}, nodes: {len(engine.threshold)}, max depth: {engine.max_depth}")
+    print(f"Parity on {X.shape[0]} reviews: {'exact' if verify_parity(model, engine, X) else 'MISMATCH'}")
+
+    def per_call_us(func, rows, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(rows)
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    single = X[:1]
+    print(f"Single row  sklearn: {per_call_us(model.predict_proba, single, 200):8.1f} us  "
+          f"engine: {per_call_us(engine.predict_proba, single, 200):8.1f} us")
+    print(f"Full batch  sklearn: {per_call_us(model.predict_proba, X, 5) / 1000:8.1f} ms  "
+          f"engine: {per_call_us(engine.predict_proba, X, 5) / 1000:8.1f} ms")
@@ -0,0 +1,225 @@
+from collections import deque
+from contextlib import contextmanager
+import threading
+import bisect
+import time
+import sys
+import os
+import numpy as np
+
+class LatencyTracker:
+    """Keeps the most recent request latencies and reports percentiles in milliseconds"""
+
+    def __init__(self, window=10000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def percentiles(self, quantiles=(50, 99)):
+        with self._lock:
+            samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+            count = self._count
+
+        result = {'count': count}
+        for q in quantiles:
+            result[f'p{q}_ms'] = round(float(np.percentile(samples, q)) * 1000, 3) if len(samples) else None
+        return result
+
+# Upper bounds in seconds of the latency histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds between stack samples of a profiled request, the interpreter switches threads every 5ms
+PROFILE_INTERVAL = 0.005
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_string(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count per label values, rendered in the Prometheus text format"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labels, values, count) for values, count in sorted(self._values.items())]
+
+class Histogram:
+    """Cumulative latency buckets, sum and count per label values, in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        # Buckets are stored non-cumulative and summed when rendered, so an observation is one increment
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += seconds
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the wall time of the with block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self):
+        with self._lock:
+            series = sorted((values, list(counts), total) for values, (counts, total) in self._series.items())
+
+        samples = []
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((self.name + '_bucket', self.labels, values, cumulative, (('le', _format_value(bound)),)))
+            samples.append((self.name + '_sum', self.labels, values, total))
+            samples.append((self.name + '_count', self.labels, values, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """Counters, histograms and scrape-time collectors of one process, rendered for Prometheus"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """Register a function called on every scrape, returning (name, kind, help, labels, samples) tuples.
+
+        samples is a list of (label values, value) pairs, for state that is cheaper to read when
+        scraped than to track, like cache and admission statistics.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+
+        families = [(m.name, m.kind, m.help_text, m.samples()) for m in metrics]
+        for collect in collectors:
+            for name, kind, help_text, labels, samples in collect():
+                families.append((name, kind, help_text, [(name, labels, values, value) for values, value in samples]))
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample in samples:
+                sample_name, labels, values, value = sample[:4]
+                extra = sample[4] if len(sample) > 4 else ()
+                lines.append(f'{sample_name}{_label_string(labels, values, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry, every worker process serves its own
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'review_stage_duration_seconds', 'Wall time of each processing stage', ('stage',)
+)
+
+def stage_timer(stage):
+    """Record the wall time of a processing stage in STAGE_SECONDS, as a with block or a decorator"""
+    return STAGE_SECONDS.time(stage)
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval while it runs a request.
+
+    The result is a count per collapsed stack ("outer;inner;innermost"), the input format
+    of flame graph tools. Sampling runs on its own thread, so only profiled requests pay for it.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Collapsed stacks, most sampled first"""
+        return '\n'.join(f"{stack} {count}" for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
@@ -0,0 +1,320 @@
+import numpy as np
+from scipy import sparse
+import contextlib
+import threading
+import math
+import json
+import time
+import uuid
+import re
+import os
+from inference_engine import TreeEnsembleEngine, export_trees
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock, conversions are then not coordinated
+    fcntl = None
+
+BUNDLE_FORMAT = 1
+
+# Default location of model artifacts, independent of the process working directory
+DEFAULT_MODEL_DIR = os.environ.get(
+    'FAKE_DETECTOR_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+)
+
+def _load_array(path):
+    """Memory-map an array so every worker process shares the same pages"""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Zero-length arrays cannot be memory-mapped
+        return np.load(path)
+
+class BundleVectorizer:
+    """TF-IDF transform computed from the bundled vocabulary and idf weights.
+
+    Mirrors sklearn's TfidfVectorizer.transform for the word analyzer, including the
+    order of the floating point operations, so it produces the same matrix.
+    """
+
+    def __init__(self, bundle, config):
+        self._bundle = bundle
+        self.lowercase = config['lowercase']
+        self.ngram_range = tuple(config['ngram_range'])
+        self.norm = config['norm']
+        self.sublinear_tf = config['sublinear_tf']
+        self.binary = config['binary']
+        self.use_idf = config['use_idf']
+        self.descending_norm = config.get('norm_order') == 'descending'
+        self._token_pattern = re.compile(config['token_pattern'])
+        self._vocabulary = None
+        self._idf = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._vocabulary is None:
+                with open(os.path.join(self._bundle.path, 'vocabulary.json')) as f:
+                    terms = json.load(f)
+                if self.use_idf:
+                    self._idf = np.asarray(_load_array(os.path.join(self._bundle.path, 'idf.npy'))).tolist()
+                self._vocabulary = {term: i for i, term in enumerate(terms)}
+        return self._vocabulary, self._idf
+
+    def _analyze(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_pattern.findall(text)
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n + 1, len(tokens) + 1)):
+            for i in range(len(tokens) - n + 1):
+                terms.append(' '.join(tokens[i:i + n]))
+        return terms
+
+    def transform(self, texts):
+        vocabulary, idf = self._load()
+
+        indptr = [0]
+        indices = []
+        data = []
+
+        for text in texts:
+            counts = {}
+            for term in self._analyze(text):
+                column = vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+
+            columns = sorted(counts)
+            values = [1.0 if self.binary else float(counts[c]) for c in columns]
+            if self.sublinear_tf:
+                values = [math.log(v) + 1 for v in values]
+            if idf is not None:
+                values = [v * idf[c] for v, c in zip(values, columns)]
+
+            # Accumulate the norm in the same column order sklearn did when exported
+            ordered = reversed(values) if self.descending_norm else values
+            if self.norm == 'l2':
+                total = 0.0
+                for v in ordered:
+                    total += v * v
+                if total != 0.0:
+                    total = math.sqrt(total)
+                    values = [v / total for v in values]
+            elif self.norm == 'l1':
+                total = 0.0
+                for v in ordered:
+                    total += abs(v)
+                if total != 0.0:
+                    values = [v / total for v in values]
+
+            indices.extend(columns)
+            data.extend(values)
+            indptr.append(len(indices))
+
+        return sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(indptr) - 1, self._bundle.manifest['vectorizer']['n_features'])
+        )
+
+class BundleScaler:
+    """StandardScaler.transform from the bundled mean and scale vectors"""
+
+    def __init__(self, bundle, config):
+        self._bundle = bundle
+        self.with_mean = config['with_mean']
+        self._mean = None
+        self._scale = None
+
+    def _load(self):
+        if self._scale is None:
+            if self.with_mean:
+                self._mean = _load_array(os.path.join(self._bundle.path, 'scaler_mean.npy'))
+            self._scale = _load_array(os.path.join(self._bundle.path, 'scaler_scale.npy'))
+        return self._mean, self._scale
+
+    def transform(self, X):
+        mean, scale = self._load()
+
+        if sparse.issparse(X):
+            if self.with_mean:
+                raise ValueError("Cannot center sparse matrices")
+            X = X.tocsr(copy=True)
+            X.data *= (1 / scale).take(X.indices, mode='clip')
+            return X
+
+        X = np.array(X, dtype=np.float64)
+        if self.with_mean:
+            X -= mean
+        X /= scale
+        return X
+
+class BundleEnsemble:
+    """Gradient-boosted trees from the bundled node arrays, scored by TreeEnsembleEngine"""
+
+    def __init__(self, bundle, config):
+        self._bundle = bundle
+        self._config = config
+        self.classes_ = np.asarray(config['classes'])
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._engine is None:
+                arrays = {
+                    name: _load_array(os.path.join(self._bundle.path, f'tree_{name}.npy'))
+                    for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+                }
+                self._engine = TreeEnsembleEngine.from_arrays(arrays, self._config)
+        return self._engine
+
+    def raw_predict(self, X):
+        return self._load().raw_predict(X)
+
+    def predict_proba(self, X):
+        return self._load().predict_proba(X)
+
+    def predict(self, X):
+        return self._load().predict(X)
+
+class ModelBundle:
+    """A versioned model directory whose arrays are memory-mapped on first use"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported model bundle format in {path}")
+
+        self.version = self.manifest['version']
+        self.vectorizer = BundleVectorizer(self, self.manifest['vectorizer'])
+        self.scaler = BundleScaler(self, self.manifest['scaler'])
+        self.model = BundleEnsemble(self, self.manifest['model'])
+
+    def warm(self):
+        """Read every array now instead of on the first prediction"""
+        self.vectorizer._load()
+        self.scaler._load()
+        self.model._load()
+        return self
+
+    @classmethod
+    def current(cls, model_dir=DEFAULT_MODEL_DIR):
+        """Open the bundle the CURRENT pointer names, or None if there is none"""
+        version = read_current_version(model_dir)
+        if version is None:
+            return None
+        return cls(os.path.join(model_dir, 'bundles', version))
+
+@contextlib.contextmanager
+def model_dir_lock(model_dir=DEFAULT_MODEL_DIR):
+    """Serialize legacy model conversions across worker processes"""
+    bundles_dir = os.path.join(model_dir, 'bundles')
+    os.makedirs(bundles_dir, exist_ok=True)
+    with open(os.path.join(bundles_dir, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def read_current_version(model_dir=DEFAULT_MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _export_vectorizer(vectorizer):
+    """Vocabulary, idf weights and analyzer settings of a fitted TfidfVectorizer"""
+
+    supported = (
+        vectorizer.analyzer == 'word' and vectorizer.preprocessor is None and
+        vectorizer.tokenizer is None and vectorizer.stop_words is None and
+        vectorizer.strip_accents is None and vectorizer.input == 'content'
+    )
+    if not supported:
+        raise ValueError("Only plain word TF-IDF vectorizers can be bundled")
+
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+
+    # Some sklearn versions apply idf through a sparse product that leaves each row's
+    # columns in descending order, and the row norm is summed in that order
+    probe = vectorizer.transform([' '.join(terms[:16])])
+    descending = probe.nnz > 1 and probe.indices[0] > probe.indices[-1]
+
+    config = {
+        'norm_order': 'descending' if descending else 'ascending',
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(vectorizer.ngram_range),
+        'norm': vectorizer.norm,
+        'use_idf': vectorizer.use_idf,
+        'sublinear_tf': vectorizer.sublinear_tf,
+        'binary': vectorizer.binary,
+        'n_features': len(terms)
+    }
+    idf = np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else None
+
+    return config, terms, idf
+
+def write_current_version(model_dir, version):
+    """Point CURRENT at a bundle, replacing the file atomically"""
+    tmp_path = os.path.join(model_dir, f'.CURRENT.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, 'CURRENT'))
+
+def save_bundle(model, vectorizer, scaler, model_dir=DEFAULT_MODEL_DIR, feature_names=None):
+    """Export fitted sklearn components as a new bundle and make it current, returns its version"""
+
+    vectorizer_config, terms, idf = _export_vectorizer(vectorizer)
+    model_config, tree_arrays = export_trees(model)
+
+    version = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    bundles_dir = os.path.join(model_dir, 'bundles')
+    tmp_path = os.path.join(bundles_dir, f'.{version}.tmp')
+    os.makedirs(tmp_path, exist_ok=True)
+
+    with open(os.path.join(tmp_path, 'vocabulary.json'), 'w') as f:
+        json.dump(terms, f)
+    if idf is not None:
+        np.save(os.path.join(tmp_path, 'idf.npy'), idf)
+
+    with_mean = bool(scaler.with_mean)
+    if with_mean:
+        np.save(os.path.join(tmp_path, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(os.path.join(tmp_path, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+
+    for name, array in tree_arrays.items():
+        np.save(os.path.join(tmp_path, f'tree_{name}.npy'), array)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'feature_names': feature_names,
+        'vectorizer': vectorizer_config,
+        'scaler': {'with_mean': with_mean},
+        'model': model_config
+    }
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # The bundle only becomes visible once it is complete
+    os.rename(tmp_path, os.path.join(bundles_dir, version))
+    write_current_version(model_dir, version)
+
+    return version
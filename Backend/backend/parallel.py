@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+import threading
+import atexit
+import os
+
+# Reviews handed to a worker process per task when running in parallel mode
+PARALLEL_CHUNK_SIZE = 5000
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def resolve_n_jobs(n_jobs):
+    """Turn an n_jobs setting into a worker count (None or 1 means sequential, -1 all cores)"""
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+def get_executor(n_jobs):
+    """Process pool shared by every analyzer using the same worker count"""
+    workers = resolve_n_jobs(n_jobs)
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            _executors[workers] = executor
+        return executor
+
+def shard(items, chunk_size):
+    """Split a list into consecutive chunks, order is preserved"""
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+
+def should_parallelize(n_jobs, chunk_size, n_items):
+    """Only shard when more than one worker is configured and there is more than one chunk"""
+    return resolve_n_jobs(n_jobs) > 1 and n_items > chunk_size
+
+def parallel_map(func, items, n_jobs, chunk_size):
+    """Run func over consecutive shards of items in the pool, results come back in shard order"""
+    executor = get_executor(n_jobs)
+    return list(executor.map(func, shard(list(items), chunk_size)))
+
+@atexit.register
+def shutdown():
+    """Stop all worker pools"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
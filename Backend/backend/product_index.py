@@ -0,0 +1,127 @@
+import pandas as pd
+import threading
+
+class ProductIndex:
+    """Per-product review aggregates, built once and updated as reviews arrive"""
+
+    FIELDS = (
+        'total_reviews', 'fake_reviews', 'rating_sum', 'rating_count',
+        'positive_count', 'negative_count', 'neutral_count'
+    )
+
+    def __init__(self):
+        self.products = {}
+        self.totals = self._empty_entry()
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index from a reviews DataFrame"""
+
+        index = cls()
+        index.add_reviews(df)
+        return index
+
+    def _empty_entry(self):
+        entry = {field: 0 for field in self.FIELDS}
+        entry['rating_sum'] = 0.0
+        entry['version'] = 0
+        return entry
+
+    def add_reviews(self, df):
+        """Fold a batch of reviews into the aggregates, returns the products touched"""
+
+        if df is None or df.empty or 'product_name' not in df.columns:
+            return []
+
+        grouped = self._group(df)
+
+        with self._lock:
+            self.version += 1
+            for product_name, row in grouped.iterrows():
+                entry = self.products.get(product_name)
+                if entry is None:
+                    entry = self._empty_entry()
+                    self.products[product_name] = entry
+
+                for field in self.FIELDS:
+                    value = row[field]
+                    entry[field] += value
+                    self.totals[field] += value
+                entry['version'] = self.version
+
+            self.totals['version'] = self.version
+
+        return grouped.index.tolist()
+
+    def _group(self, df):
+        """Reduce a batch to one row of aggregates per product"""
+
+        work = pd.DataFrame({'product_name': df['product_name'].values})
+        work['is_fake'] = df['is_fake'].values if 'is_fake' in df.columns else 0
+        work['rating'] = df['rating'].values if 'rating' in df.columns else float('nan')
+
+        sentiment = df['sentiment'].values if 'sentiment' in df.columns else None
+        for label in ('positive', 'negative', 'neutral'):
+            work[label] = (sentiment == label) if sentiment is not None else False
+
+        grouped = work.groupby('product_name', sort=False, observed=True).agg(
+            total_reviews=('product_name', 'size'),
+            fake_reviews=('is_fake', 'sum'),
+            rating_sum=('rating', 'sum'),
+            rating_count=('rating', 'count'),
+            positive_count=('positive', 'sum'),
+            negative_count=('negative', 'sum'),
+            neutral_count=('neutral', 'sum')
+        )
+
+        grouped = grouped.astype({field: 'int64' for field in self.FIELDS if field != 'rating_sum'})
+        grouped['rating_sum'] = grouped['rating_sum'].astype('float64')
+
+        return grouped
+
+    def get(self, product_name):
+        """Return a copy of one product's aggregates, or None if unknown"""
+
+        with self._lock:
+            entry = self.products.get(product_name)
+            return self._to_python(entry) if entry is not None else None
+
+    def get_totals(self):
+        """Return a copy of the aggregates across all products"""
+
+        with self._lock:
+            return self._to_python(self.totals)
+
+    def product_names(self):
+        """Product names in the order they were first seen"""
+
+        with self._lock:
+            return list(self.products.keys())
+
+    def __len__(self):
+        return len(self.products)
+
+    def _to_python(self, entry):
+        result = {field: int(entry[field]) for field in self.FIELDS}
+        result['rating_sum'] = float(entry['rating_sum'])
+        result['version'] = entry['version']
+        return result
+
+    @staticmethod
+    def summarize(entry):
+        """Derive the counts and ratios served by the API from an aggregate entry"""
+
+        total = entry['total_reviews']
+        fake = entry['fake_reviews']
+        return {
+            'total_reviews': total,
+            'fake_reviews': fake,
+            'genuine_reviews': total - fake,
+            'fake_percentage': round((fake / total * 100), 2) if total > 0 else 0,
+            'avg_rating': entry['rating_sum'] / entry['rating_count'] if entry['rating_count'] > 0 else 0,
+            'positive_count': entry['positive_count'],
+            'negative_count': entry['negative_count'],
+            'neutral_count': entry['neutral_count']
+        }
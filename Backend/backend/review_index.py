@@ -0,0 +1,149 @@
+import numpy as np
+import threading
+
+# Columns with a posting list of row numbers per distinct value
+POSTING_COLUMNS = ['product_name', 'category', 'is_fake', 'verified_purchase', 'rating']
+
+# Columns kept as dense arrays for range filters, with their stored dtype
+RANGE_COLUMNS = {'rating': 'int8', 'review_date': 'datetime64[D]'}
+
+class _Blocks:
+    """An array grown by appending blocks, concatenated lazily when read"""
+
+    def __init__(self, dtype=np.int64):
+        self._parts = []
+        self._rows = np.zeros(0, dtype=dtype)
+
+    def append(self, rows):
+        self._parts.append(rows)
+
+    def rows(self):
+        if self._parts:
+            self._rows = np.concatenate([self._rows] + self._parts)
+            self._parts = []
+        return self._rows
+
+class ReviewIndex:
+    """Posting lists over the review store, so listing queries touch only matching rows.
+
+    Rows are only ever appended to the store, so row numbers are stable and double as
+    pagination cursors.
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self._postings = {name: {} for name in POSTING_COLUMNS}
+        self._ranges = {name: _Blocks(dtype) for name, dtype in RANGE_COLUMNS.items()}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        index.add_rows(store, 0, len(store))
+        return index
+
+    def add_rows(self, store, start, stop):
+        """Index store rows [start, stop), which must directly follow the indexed ones"""
+
+        if start != self.n_rows:
+            raise ValueError(f"Rows must be indexed in order, expected {self.n_rows} got {start}")
+        if stop <= start:
+            return
+
+        rows = np.arange(start, stop, dtype=np.int64)
+        frame = store.to_frame(POSTING_COLUMNS + ['review_date'], rows=rows)
+
+        with self._lock:
+            for name in POSTING_COLUMNS:
+                column = frame[name]
+                if column.dtype.name == 'category':
+                    codes = column.cat.codes.to_numpy()
+                    keys = list(column.cat.categories)
+                else:
+                    codes = column.to_numpy()
+                    keys = None
+
+                order = np.argsort(codes, kind='stable')
+                values, first = np.unique(codes[order], return_index=True)
+                for value, group in zip(values.tolist(), np.split(rows[order], first[1:])):
+                    if keys is not None:
+                        if value < 0:
+                            continue
+                        value = keys[value]
+                    self._postings[name].setdefault(value, _Blocks()).append(group)
+
+            for name, dtype in RANGE_COLUMNS.items():
+                self._ranges[name].append(frame[name].to_numpy().astype(dtype))
+            self.n_rows = stop
+
+    def values(self, name):
+        """Distinct values of a posting column"""
+        with self._lock:
+            return list(self._postings[name])
+
+    def iter_rows(self, equals=None, ranges=None, after=-1, block_size=1024):
+        """Yield ascending arrays of matching row numbers greater than after.
+
+        equals maps posting columns to a required value, ranges maps range columns
+        to inclusive (low, high) bounds where either side may be None.
+        """
+
+        with self._lock:
+            n_rows = self.n_rows
+            lists = []
+            for name, value in (equals or {}).items():
+                postings = self._postings[name].get(value)
+                if postings is None:
+                    return
+                lists.append(postings.rows())
+            columns = {name: self._ranges[name].rows() for name in (ranges or {})}
+
+        # Walk the shortest posting list, or every row when nothing is filtered by value
+        lists.sort(key=len)
+        if lists:
+            driver = lists[0]
+            position = int(np.searchsorted(driver, after, side='right'))
+            total = len(driver)
+        else:
+            driver = None
+            position = after + 1
+            total = n_rows
+
+        while position < total:
+            stop = min(position + block_size, total)
+            if driver is None:
+                rows = np.arange(position, stop, dtype=np.int64)
+            else:
+                rows = driver[position:stop]
+            position = stop
+
+            for other in lists[1:]:
+                hits = np.searchsorted(other, rows)
+                hits[hits == len(other)] = 0
+                rows = rows[other[hits] == rows] if len(other) else rows[:0]
+
+            for name, (low, high) in (ranges or {}).items():
+                values = columns[name][rows]
+                keep = np.ones(len(rows), dtype=bool)
+                if low is not None:
+                    keep &= values >= low
+                if high is not None:
+                    keep &= values <= high
+                rows = rows[keep]
+
+            if len(rows):
+                yield rows
+
+    def query(self, equals=None, ranges=None, after=-1, limit=100):
+        """Up to limit matching row numbers after the cursor, and whether more remain"""
+
+        found = []
+        count = 0
+        for rows in self.iter_rows(equals, ranges, after, block_size=max(limit, 256)):
+            found.append(rows)
+            count += len(rows)
+            if count > limit:
+                break
+
+        rows = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+        return rows[:limit], len(rows) > limit
@@ -0,0 +1,593 @@
+import pandas as pd
+import numpy as np
+import contextlib
+import threading
+import shutil
+import json
+import uuid
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock, conversions are then not coordinated
+    fcntl = None
+
+STORE_FORMAT = 1
+
+# Ingested segments smaller than this are merged once COMPACT_SEGMENTS of them have piled up
+# at the end of the store, which keeps the segment count (and per-segment work) bounded
+COMPACT_ROWS = 100000
+COMPACT_SEGMENTS = 16
+
+# On-disk layout per column: numeric columns are plain arrays, strings are a
+# UTF-8 byte buffer plus row offsets, categories are int32 codes plus a value list
+COLUMN_TYPES = {
+    'review_id': 'string',
+    'product_name': 'category',
+    'category': 'category',
+    'reviewer_id': 'int64',
+    'rating': 'int8',
+    'review_text': 'string',
+    'sentiment': 'category',
+    'is_fake': 'int8',
+    'verified_purchase': 'int8',
+    'helpful_votes': 'int32',
+    'review_length': 'int32',
+    'review_date': 'datetime64[D]',
+    'exclamation_count': 'int32',
+    'capital_ratio': 'float64'
+}
+
+def default_store_dir(csv_path):
+    """Directory the columnar copy of a CSV lives in, next to the CSV itself"""
+    root, _ = os.path.splitext(os.path.abspath(csv_path))
+    return root + '.store'
+
+@contextlib.contextmanager
+def _store_lock(store_dir):
+    """Serialize conversions and manifest updates across worker processes"""
+    os.makedirs(os.path.dirname(store_dir) or '.', exist_ok=True)
+    with open(store_dir + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_manifest(store_dir):
+    path = os.path.join(store_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(store_dir, manifest):
+    """Replace the manifest atomically so readers never see a partial file"""
+    path = os.path.join(store_dir, 'manifest.json')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'path': os.path.basename(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _encode_strings(values, n_rows):
+    """Pack strings into one UTF-8 buffer with an offsets array"""
+    if values is None:
+        return np.zeros(0, dtype=np.uint8), np.zeros(n_rows + 1, dtype=np.int64)
+
+    encoded = [text.encode('utf-8') for text in values.fillna('').astype(str)]
+    offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=n_rows), out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    return data, offsets
+
+def encode_frame(df):
+    """Convert a reviews DataFrame into store column arrays and category lists"""
+
+    n_rows = len(df)
+    arrays = {}
+    categories = {}
+
+    for name, kind in COLUMN_TYPES.items():
+        values = df[name] if name in df.columns else None
+
+        if kind == 'string':
+            arrays[f'{name}.data'], arrays[f'{name}.offsets'] = _encode_strings(values, n_rows)
+        elif kind == 'category':
+            if values is None:
+                codes, uniques = np.full(n_rows, -1), []
+            else:
+                codes, uniques = pd.factorize(values.astype(object))
+            arrays[f'{name}.codes'] = np.asarray(codes, dtype=np.int32)
+            categories[name] = [str(value) for value in uniques]
+        elif kind == 'datetime64[D]':
+            if values is None:
+                arrays[name] = np.full(n_rows, np.datetime64('NaT'), dtype=kind)
+            else:
+                arrays[name] = pd.to_datetime(values, errors='coerce').to_numpy().astype(kind)
+        else:
+            if values is None:
+                arrays[name] = np.zeros(n_rows, dtype=kind)
+            else:
+                arrays[name] = pd.to_numeric(values, errors='coerce').fillna(0).to_numpy().astype(kind)
+
+    return arrays, categories
+
+class _Segment:
+    """A contiguous block of rows, either memory-mapped from disk or held in memory"""
+
+    def __init__(self, name, n_rows, categories, arrays=None, path=None):
+        self.name = name
+        self.n_rows = n_rows
+        self.categories = categories
+        self.path = path
+        self._arrays = arrays or {}
+
+    @classmethod
+    def load(cls, store_dir, name):
+        path = os.path.join(store_dir, name)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(name, meta['rows'], meta['categories'], path=path)
+
+    def save(self, store_dir):
+        """Write the segment under a temporary name and rename it into place"""
+        tmp_path = os.path.join(store_dir, f'.{self.name}.tmp')
+        os.makedirs(tmp_path, exist_ok=True)
+        for key, array in self._arrays.items():
+            np.save(os.path.join(tmp_path, f'{key}.npy'), array)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'rows': self.n_rows, 'categories': self.categories}, f)
+        path = os.path.join(store_dir, self.name)
+        os.rename(tmp_path, path)
+        self.path = path
+
+    def array(self, key):
+        array = self._arrays.get(key)
+        if array is None:
+            file_path = os.path.join(self.path, f'{key}.npy')
+            try:
+                array = np.load(file_path, mmap_mode='r')
+            except ValueError:
+                # Zero-length arrays cannot be memory-mapped
+                array = np.load(file_path)
+            self._arrays[key] = array
+        return array
+
+    @classmethod
+    def merge(cls, name, segments):
+        """One in-memory segment holding the rows of segments, in order"""
+
+        arrays, categories = {}, {}
+        n_rows = sum(segment.n_rows for segment in segments)
+        for column, kind in COLUMN_TYPES.items():
+            if kind == 'string':
+                datas = [segment.array(f'{column}.data') for segment in segments]
+                offsets = np.zeros(n_rows + 1, dtype=np.int64)
+                position, base = 0, 0
+                for segment, data in zip(segments, datas):
+                    segment_offsets = segment.array(f'{column}.offsets')
+                    offsets[position + 1:position + segment.n_rows + 1] = segment_offsets[1:] + base
+                    position += segment.n_rows
+                    base += int(segment_offsets[-1])
+                arrays[f'{column}.data'] = np.concatenate(datas) if datas else np.zeros(0, dtype=np.uint8)
+                arrays[f'{column}.offsets'] = offsets
+            elif kind == 'category':
+                # Values keep the order they first appear in, codes are mapped onto the merged list
+                values, lookup, parts = [], {}, []
+                for segment in segments:
+                    remap = np.empty(len(segment.categories[column]) + 1, dtype=np.int32)
+                    for i, value in enumerate(segment.categories[column]):
+                        remap[i] = lookup.setdefault(value, len(values))
+                        if remap[i] == len(values):
+                            values.append(value)
+                    remap[-1] = -1
+                    parts.append(remap[segment.array(f'{column}.codes')])
+                arrays[f'{column}.codes'] = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+                categories[column] = values
+            else:
+                arrays[column] = np.concatenate([segment.array(column) for segment in segments])
+
+        return cls(name, n_rows, categories, arrays=arrays)
+
+    def strings(self, name, rows):
+        data = self.array(f'{name}.data')
+        offsets = self.array(f'{name}.offsets')
+        buffer = memoryview(data) if len(data) else b''
+        return [str(buffer[offsets[i]:offsets[i + 1]], 'utf-8') for i in rows]
+
+class ReviewStore:
+    """Columnar review storage shared by all workers through memory-mapped files"""
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir
+        self.segments = []
+        self.version = 0
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._categories = {}
+        self._category_lookup = {}
+        self._remaps = {}
+        self._lock = threading.RLock()
+
+        if store_dir is not None:
+            self.refresh()
+
+    @classmethod
+    def open(cls, csv_path, store_dir=None):
+        """Open the store for a CSV, converting it first if the copy is missing or stale"""
+
+        store_dir = store_dir or default_store_dir(csv_path)
+
+        if os.path.exists(csv_path):
+            with _store_lock(store_dir):
+                if cls.is_stale(csv_path, store_dir):
+                    cls.convert(csv_path, store_dir)
+        elif _read_manifest(store_dir) is None:
+            raise FileNotFoundError(csv_path)
+
+        return cls(store_dir)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an in-memory store, used for sample data and tests"""
+        store = cls()
+        store.append(df)
+        return store
+
+    @staticmethod
+    def is_stale(csv_path, store_dir):
+        manifest = _read_manifest(store_dir)
+        if manifest is None or manifest.get('format') != STORE_FORMAT:
+            return True
+        return manifest.get('source') != _source_signature(csv_path)
+
+    @staticmethod
+    def convert(csv_path, store_dir):
+        """Parse the CSV once into a new base segment, keeping previously ingested segments"""
+
+        print(f"Converting {csv_path} to columnar store...")
+
+        os.makedirs(store_dir, exist_ok=True)
+        df = pd.read_csv(csv_path)
+        arrays, categories = encode_frame(df)
+
+        segment = _Segment(f'seg-base-{uuid.uuid4().hex[:12]}', len(df), categories, arrays=arrays)
+        segment.save(store_dir)
+
+        old_manifest = _read_manifest(store_dir) or {}
+        old_segments = old_manifest.get('segments', [])
+        manifest = {
+            'format': STORE_FORMAT,
+            'source': _source_signature(csv_path),
+            'segments': [{'name': segment.name, 'origin': 'csv'}] +
+                        [s for s in old_segments if s['origin'] == 'ingest']
+        }
+        _write_manifest(store_dir, manifest)
+
+        # Workers still mapping the old base keep their pages until they reload
+        for old in old_segments:
+            if old['origin'] == 'csv':
+                shutil.rmtree(os.path.join(store_dir, old['name']), ignore_errors=True)
+        for name in old_manifest.get('retired', []):
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+        print(f"✓ Columnar store written: {len(df)} reviews")
+
+    def refresh(self):
+        """Pick up segments written by other workers.
+
+        Returns the (start, stop) row ranges that became visible, or None when the
+        store had to be reopened from scratch and row numbers may have changed.
+        """
+
+        if self.store_dir is None:
+            return []
+
+        manifest = _read_manifest(self.store_dir)
+        if manifest is None:
+            return []
+
+        names = [s['name'] for s in manifest['segments']]
+
+        with self._lock:
+            ranges = self._follow_compactions(manifest['segments'])
+            known = [segment.name for segment in self.segments]
+            if names[:len(known)] != known:
+                self._reset()
+                for name in names:
+                    self._add_segment(_Segment.load(self.store_dir, name))
+                return None
+
+            for name in names[len(known):]:
+                ranges.append(self._add_segment(_Segment.load(self.store_dir, name)))
+            return ranges
+
+    def _follow_compactions(self, entries):
+        """Swap in segments another worker compacted from ones this store has loaded.
+
+        Row numbers do not change, so nothing built on them has to be rebuilt. A compaction
+        may also cover segments this store has not loaded yet, returns the row ranges those
+        add.
+        """
+
+        ranges = []
+        for entry in entries:
+            replaced = entry.get('replaces')
+            loaded = [segment.name for segment in self.segments]
+            if not replaced or replaced[0] not in loaded:
+                continue
+            first = loaded.index(replaced[0])
+            count = min(len(replaced), len(loaded) - first)
+            if loaded[first:first + count] != replaced[:count]:
+                continue
+
+            stop = len(self)
+            self._replace_segments(first, count, _Segment.load(self.store_dir, entry['name']))
+            if len(self) > stop:
+                ranges.append((stop, len(self)))
+        return ranges
+
+    def _replace_segments(self, first, count, segment):
+        """Put segment in place of count segments starting at first, which hold the same rows"""
+
+        old = self.segments[first:first + count]
+        self._register_categories(segment)
+        self.segments = self.segments[:first] + [segment] + self.segments[first + count:]
+        self._starts = np.concatenate([[0], np.cumsum([s.n_rows for s in self.segments])]).astype(np.int64)
+        for retired in old:
+            for name in retired.categories:
+                self._remaps.pop((retired.name, name), None)
+        self.version += 1
+
+    def compact(self):
+        """Merge the run of small segments at the end of the store into one.
+
+        Returns the number of segments merged, 0 when there was nothing to do. The merged
+        segment is built and written without holding the store lock, then swapped in for
+        the segments it replaces in one step. Row numbers do not change. Replaced segment
+        files are deleted at the next compaction, so workers that have not refreshed yet
+        can still read them.
+        """
+
+        with self._lock:
+            run = self._compaction_run()
+        if len(run) < 2:
+            return 0
+
+        merged = _Segment.merge(f'seg-{uuid.uuid4().hex[:12]}', run)
+        names = [segment.name for segment in run]
+        retired = []
+        if self.store_dir is not None:
+            merged.save(self.store_dir)
+
+        with self._lock:
+            current = [segment.name for segment in self.segments]
+            first = current.index(names[0]) if names[0] in current else -1
+            if first < 0 or current[first:first + len(names)] != names:
+                # The store was reopened or compacted while merging
+                if merged.path is not None:
+                    shutil.rmtree(merged.path, ignore_errors=True)
+                return 0
+
+            if self.store_dir is not None:
+                with _store_lock(self.store_dir):
+                    manifest = _read_manifest(self.store_dir)
+                    entries = manifest['segments']
+                    listed = [entry['name'] for entry in entries]
+                    start = listed.index(names[0]) if names[0] in listed else -1
+                    if start < 0 or listed[start:start + len(names)] != names:
+                        shutil.rmtree(merged.path, ignore_errors=True)
+                        return 0
+
+                    # Only the latest compaction is described, older ones have been followed by now
+                    for entry in entries:
+                        entry.pop('replaces', None)
+                    entries[start:start + len(names)] = [{'name': merged.name, 'origin': 'ingest', 'replaces': names}]
+                    retired = manifest.get('retired', [])
+                    manifest['retired'] = names
+                    _write_manifest(self.store_dir, manifest)
+                # Served memory-mapped like every other segment on disk
+                merged = _Segment.load(self.store_dir, merged.name)
+
+            self._replace_segments(first, len(names), merged)
+
+        for name in retired:
+            shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+        return len(names)
+
+    def _compaction_run(self):
+        """The small ingested segments at the end of the store, oldest first"""
+        run = []
+        for segment in reversed(self.segments):
+            if segment.n_rows >= COMPACT_ROWS or segment.name.startswith('seg-base-'):
+                break
+            run.append(segment)
+        return run[::-1]
+
+    def _reset(self):
+        self.segments = []
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._categories = {}
+        self._category_lookup = {}
+        self._remaps = {}
+        self.version += 1
+
+    def _add_segment(self, segment):
+        """Register a segment and extend the global category lists, returns its row range"""
+
+        start = len(self)
+        self.segments.append(segment)
+        self._starts = np.append(self._starts, start + segment.n_rows)
+        self._register_categories(segment)
+
+        self.version += 1
+        return start, start + segment.n_rows
+
+    def _register_categories(self, segment):
+        """Extend the global category lists with a segment's values and record its code remaps"""
+
+        for name, values in segment.categories.items():
+            lookup = self._category_lookup.setdefault(name, {})
+            global_values = self._categories.setdefault(name, [])
+            remap = np.empty(len(values) + 1, dtype=np.int32)
+            for i, value in enumerate(values):
+                code = lookup.get(value)
+                if code is None:
+                    code = len(global_values)
+                    lookup[value] = code
+                    global_values.append(value)
+                remap[i] = code
+            # Missing values keep code -1, which indexes the trailing slot
+            remap[-1] = -1
+            self._remaps[(segment.name, name)] = remap
+
+    def append(self, df):
+        """Add reviews to the store, persisting them as a new segment when disk-backed.
+
+        Returns the row ranges that became visible (other workers' segments included),
+        or None when the store was reopened and row numbers may have changed.
+        """
+
+        arrays, categories = encode_frame(df)
+        segment = _Segment(f'seg-{uuid.uuid4().hex[:12]}', len(df), categories, arrays=arrays)
+
+        with self._lock:
+            if self.store_dir is None:
+                ranges = [self._add_segment(segment)]
+            else:
+                with _store_lock(self.store_dir):
+                    segment.save(self.store_dir)
+                    manifest = _read_manifest(self.store_dir)
+                    manifest['segments'].append({'name': segment.name, 'origin': 'ingest'})
+                    _write_manifest(self.store_dir, manifest)
+                ranges = self.refresh()
+
+            compact = len(self._compaction_run()) >= COMPACT_SEGMENTS
+
+        # Compaction keeps row numbers, so the ranges stay valid
+        if compact:
+            self.compact()
+        return ranges
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def categories(self, name):
+        """Global category values for a categorical column, codes index into this list"""
+        with self._lock:
+            return list(self._categories.get(name, []))
+
+    def column(self, name, rows=None):
+        """Numeric values or global category codes for a column, for the given row numbers (all rows by default)"""
+
+        kind = COLUMN_TYPES[name]
+        if kind == 'string':
+            raise ValueError(f"{name} is a string column, use strings()")
+
+        with self._lock:
+            segments = list(self.segments)
+            starts = self._starts
+
+        if rows is None:
+            parts = [self._segment_values(segment, name, kind) for segment in segments]
+            if not parts:
+                return np.zeros(0, dtype=np.int32 if kind == 'category' else kind)
+            if len(parts) == 1:
+                # A single memory-mapped segment is returned without copying
+                return parts[0]
+            return np.concatenate(parts)
+
+        # Only the requested rows are read from each segment they fall in
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.empty(len(rows), dtype=np.int32 if kind == 'category' else kind)
+        for segment, positions, local_rows in self._locate(segments, starts, rows):
+            values[positions] = self._segment_values(segment, name, kind, local_rows)
+        return values
+
+    def _segment_values(self, segment, name, kind, local_rows=None):
+        """A segment's values of a non-string column, category codes mapped to global ones"""
+
+        if kind != 'category':
+            array = segment.array(name)
+            return array if local_rows is None else array[local_rows]
+
+        codes = segment.array(f'{name}.codes')
+        if local_rows is not None:
+            codes = codes[local_rows]
+        remap = self._remaps[(segment.name, name)]
+        if np.array_equal(remap[:-1], np.arange(len(remap) - 1)):
+            return codes
+        return remap[codes]
+
+    @staticmethod
+    def _locate(segments, starts, rows):
+        """Group row numbers by segment, yields (segment, positions in rows, rows within the segment)"""
+
+        if not len(rows):
+            return
+        owners = np.searchsorted(starts, rows, side='right') - 1
+        if (owners[0] == owners).all():
+            # All rows in one segment, the common case for a range or a single ingest chunk
+            segment_index = int(owners[0])
+            yield segments[segment_index], slice(None), rows - starts[segment_index]
+            return
+
+        order = np.argsort(owners, kind='stable')
+        sorted_owners = owners[order]
+        bounds = np.flatnonzero(np.diff(sorted_owners)) + 1
+        for first, positions in zip(np.concatenate([[0], bounds]).tolist(), np.split(order, bounds)):
+            segment_index = int(sorted_owners[first])
+            yield segments[segment_index], positions, rows[positions] - starts[segment_index]
+
+    def strings(self, name, rows=None):
+        """Decode a string column for the given row numbers (all rows by default)"""
+
+        if COLUMN_TYPES[name] != 'string':
+            raise ValueError(f"{name} is not a string column")
+
+        with self._lock:
+            segments = list(self.segments)
+            starts = self._starts
+
+        if rows is None:
+            values = []
+            for segment in segments:
+                values.extend(segment.strings(name, range(segment.n_rows)))
+            return values
+
+        rows = np.asarray(rows, dtype=np.int64)
+        values = [None] * len(rows)
+        for segment, positions, local_rows in self._locate(segments, starts, rows):
+            decoded = segment.strings(name, local_rows)
+            if isinstance(positions, slice):
+                values = decoded
+            else:
+                for position, value in zip(positions.tolist(), decoded):
+                    values[position] = value
+        return values
+
+    def to_frame(self, columns=None, rows=None):
+        """Materialize selected columns (and optionally rows) as a DataFrame"""
+
+        columns = columns or list(COLUMN_TYPES)
+        data = {}
+
+        for name in columns:
+            kind = COLUMN_TYPES[name]
+            if kind == 'string':
+                data[name] = self.strings(name, rows)
+                continue
+
+            values = self.column(name, rows)
+            if kind == 'category':
+                data[name] = pd.Categorical.from_codes(values, categories=self.categories(name))
+            else:
+                data[name] = np.asarray(values)
+
+        return pd.DataFrame(data, columns=columns)
@@ -1,48 +1,341 @@
 import pandas as pd
 import numpy as np
 from collections import Counter
+from functools import partial
+from operator import itemgetter
+import heapq
 import re
+from scipy import sparse
+from parallel import PARALLEL_CHUNK_SIZE, parallel_map, should_parallelize
+from metrics import stage_timer
 
-class ReviewSummarizer:
-    def __init__(self):
-        pass
+PHRASE_STOPWORDS = {'is', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'}
 
-    def extract_key_phrases(self, reviews, max_phrases=10):
+# Words that put a review on the pros or the cons side of a summary
+POLARITY_POSITIVE_WORDS = {'great', 'excellent', 'good', 'love', 'best', 'perfect', 'amazing'}
+POLARITY_NEGATIVE_WORDS = {'bad', 'poor', 'terrible', 'worst', 'awful', 'disappointed'}
+
+# Candidate phrases tracked while counting, bounds memory regardless of review volume
+PHRASE_CANDIDATES = 5000
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|[\r\n]+')
+SENTENCE_TOKENS = re.compile(r'\b\w+\b')
+
+# Sentences shorter or longer than this are not offered as highlights
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 150
+
+# Distinct sentences ranked per call, the most repeated ones are kept when there are more
+MAX_RANKED_SENTENCES = 2000
 
-        all_text = ' '.join(reviews).lower()
+# TextRank damping, similarities below the floor are dropped so the graph stays sparse,
+# and highlights more similar than REDUNDANCY_THRESHOLD to one already picked are skipped
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_MAX_ITERATIONS = 100
+TEXTRANK_TOLERANCE = 1e-8
+SIMILARITY_FLOOR = 0.1
+REDUNDANCY_THRESHOLD = 0.7
 
-        words = re.findall(r'\b\w+\b', all_text)
+# Sentence graphs up to this size are ranked as dense arrays, and TF-IDF matrices up to this many
+# cells are built dense, sparse overhead dominates below them
+DENSE_GRAPH_SENTENCES = 1000
+DENSE_VECTOR_CELLS = 1000000
 
-        bigrams = [' '.join(words[i:i+2]) for i in range(len(words)-1)]
-        trigrams = [' '.join(words[i:i+3]) for i in range(len(words)-2)]
+class TopPhraseCounter:
+    """Bounded heavy-hitter counter, prunes to the top candidates whenever it doubles in size"""
 
+    def __init__(self, capacity=PHRASE_CANDIDATES):
+        self.capacity = capacity
+        self.counts = {}
 
-        phrase_counts = Counter(bigrams + trigrams)
+    def update(self, phrases):
+        counts = self.counts
+        for phrase in phrases:
+            counts[phrase] = counts.get(phrase, 0) + 1
+        if len(counts) > 2 * self.capacity:
+            self._prune()
 
-        stopwords = {'is', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'}
-        filtered_phrases = {phrase: count for phrase, count in phrase_counts.items() 
-                          if not any(word in stopwords for word in phrase.split())}
+    def _prune(self):
+        keep = {phrase for phrase, _ in heapq.nlargest(self.capacity, self.counts.items(), key=itemgetter(1))}
+        # Rebuild in first-seen order so ties keep resolving the same way
+        self.counts = {phrase: count for phrase, count in self.counts.items() if phrase in keep}
 
-        top_phrases = sorted(filtered_phrases.items(), key=lambda x: x[1], reverse=True)[:max_phrases]
+    def items(self):
+        return self.counts.items()
+
+def _split_polarity_shard(summarizer, reviews):
+    """Worker side of generate_summary's positive/negative split for one shard"""
+    return summarizer._split_polarity(reviews)
+
+class ReviewSummarizer:
+    def __init__(self, n_jobs=1, chunk_size=PARALLEL_CHUNK_SIZE):
+        # n_jobs > 1 (or -1 for all cores) shards large review lists across a process pool
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
+    def extract_key_phrases(self, reviews, max_phrases=10):
+        """Most frequent stopword-free bigrams and trigrams, counted review by review"""
+        return self.key_phrases_from_ngrams(
+            (self.review_ngrams(SENTENCE_TOKENS.findall(review.lower())) for review in reviews), max_phrases
+        )
+
+    @staticmethod
+    def review_ngrams(words):
+        """Stopword-free bigrams and trigrams of one review's lowercased tokens"""
+
+        usable = [word not in PHRASE_STOPWORDS for word in words]
+
+        bigrams = [
+            words[i] + ' ' + words[i + 1]
+            for i in range(len(words) - 1)
+            if usable[i] and usable[i + 1]
+        ]
+        trigrams = [
+            words[i] + ' ' + words[i + 1] + ' ' + words[i + 2]
+            for i in range(len(words) - 2)
+            if usable[i] and usable[i + 1] and usable[i + 2]
+        ]
+
+        return bigrams, trigrams
+
+    @stage_timer('summarizer.key_phrases')
+    def key_phrases_from_ngrams(self, review_ngrams, max_phrases=10):
+        """extract_key_phrases over the review_ngrams of each review"""
+
+        capacity = max(PHRASE_CANDIDATES, max_phrases)
+        bigram_counter = TopPhraseCounter(capacity)
+        trigram_counter = TopPhraseCounter(capacity)
+
+        for bigrams, trigrams in review_ngrams:
+            bigram_counter.update(bigrams)
+            trigram_counter.update(trigrams)
+
+        # Bigrams before trigrams so equal counts rank the same way as a full sort would
+        candidates = list(bigram_counter.items()) + list(trigram_counter.items())
+        top_phrases = heapq.nlargest(max_phrases, candidates, key=itemgetter(1))
 
         return [phrase for phrase, count in top_phrases]
 
+    def rank_sentences(self, reviews, max_sentences=5, keep=None):
+        """Most central sentences of reviews, TextRank over a sparse TF-IDF similarity graph.
+
+        Repeated sentences are ranked once but weighted by how often they occur, and
+        ties keep first-seen order, so the same reviews always give the same result.
+        keep optionally filters which sentences may be returned, all of them still vote.
+        """
+        return self.rank_sentence_counts(self.count_sentences(reviews), max_sentences, keep)
+
+    @staticmethod
+    def split_sentences(review):
+        """Highlight candidates of a review as (sentence, key) pairs, the key is its lowercased tokens"""
+
+        pairs = []
+        for sentence in SENTENCE_SPLIT.split(review):
+            sentence = sentence.strip()
+            if MIN_SENTENCE_CHARS < len(sentence) < MAX_SENTENCE_CHARS:
+                pairs.append((sentence, ' '.join(SENTENCE_TOKENS.findall(sentence.lower()))))
+        return pairs
+
+    @staticmethod
+    def split_sentences_from_words(review, words, bounds):
+        """split_sentences of a review already tokenized as a whole.
+
+        words are the review's lowercased tokens and words[bounds[k]:bounds[k + 1]] those of
+        its k-th SENTENCE_SPLIT piece, so no sentence is tokenized again.
+        """
+
+        pairs = []
+        for k, sentence in enumerate(SENTENCE_SPLIT.split(review)):
+            sentence = sentence.strip()
+            if MIN_SENTENCE_CHARS < len(sentence) < MAX_SENTENCE_CHARS:
+                pairs.append((sentence, ' '.join(words[bounds[k]:bounds[k + 1]])))
+        return pairs
+
+    def count_sentences(self, reviews):
+        return self.count_sentence_pairs(pair for review in reviews for pair in self.split_sentences(review))
+
+    @staticmethod
+    def count_sentence_pairs(pairs):
+        """key -> [first sentence seen with that key, occurrences], in first-seen order"""
+
+        counts = {}
+        for sentence, key in pairs:
+            entry = counts.get(key)
+            if entry is None:
+                counts[key] = [sentence, 1]
+            else:
+                entry[1] += 1
+        return counts
+
+    @stage_timer('summarizer.textrank')
+    def rank_sentence_counts(self, counts, max_sentences=5, keep=None):
+        """rank_sentences over sentences already counted by count_sentence_pairs"""
+
+        if not counts:
+            return []
+
+        # sorted is stable, so equally frequent sentences stay in first-seen order
+        candidates = sorted(counts.items(), key=lambda item: -item[1][1])[:MAX_RANKED_SENTENCES]
+        sentences = [sentence for _, (sentence, _) in candidates]
+        weights = np.array([count for _, (_, count) in candidates], dtype=np.float64)
+
+        similarity = self._similarity_graph(self._sentence_vectors([key for key, _ in candidates]))
+        scores = self._textrank(similarity, weights)
+
+        selected = []
+        for i in np.lexsort((np.arange(len(scores)), -scores)):
+            if keep is not None and not keep(sentences[i]):
+                continue
+            if selected:
+                row = similarity[i].toarray().ravel() if sparse.issparse(similarity) else similarity[i]
+                if row[selected].max() >= REDUNDANCY_THRESHOLD:
+                    continue
+            selected.append(i)
+            if len(selected) == max_sentences:
+                break
+
+        return [sentences[i] for i in selected]
+
+    @staticmethod
+    def _sentence_vectors(sentences):
+        """l2-normalized TF-IDF rows, one per (already tokenized) sentence, as an array when small"""
+
+        vocabulary = {}
+        indices, indptr = [], [0]
+        for sentence in sentences:
+            for word in sentence.split():
+                if word not in PHRASE_STOPWORDS:
+                    indices.append(vocabulary.setdefault(word, len(vocabulary)))
+            indptr.append(len(indices))
+
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(sentences), max(len(vocabulary), 1))
+        )
+        counts.sum_duplicates()
+
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+
+        if counts.shape[0] * counts.shape[1] <= DENSE_VECTOR_CELLS:
+            X = counts.toarray() * idf
+            norms = np.sqrt((X * X).sum(axis=1))
+            norms[norms == 0] = 1
+            return X / norms[:, None]
+
+        X = counts @ sparse.diags(idf)
+
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ X)
+
+    @staticmethod
+    def _similarity_graph(X):
+        """Cosine similarities between sentences without self-loops or weak edges, dense when small"""
+
+        similarity = X @ X.T
+        if not sparse.issparse(similarity) or similarity.shape[0] <= DENSE_GRAPH_SENTENCES:
+            similarity = similarity.toarray() if sparse.issparse(similarity) else similarity
+            np.fill_diagonal(similarity, 0)
+            similarity[similarity < SIMILARITY_FLOOR] = 0
+            return similarity
+
+        similarity = similarity.tocsr()
+        similarity.setdiag(0)
+        similarity.data[similarity.data < SIMILARITY_FLOOR] = 0
+        similarity.eliminate_zeros()
+        return similarity
+
+    @staticmethod
+    def _textrank(similarity, weights):
+        """PageRank over sentence similarities, a sentence seen k times votes k times"""
+
+        # Column j holds the votes sentence j casts, normalized to sum to one
+        if sparse.issparse(similarity):
+            votes = similarity @ sparse.diags(weights)
+            out_weight = np.asarray(votes.sum(axis=0)).ravel()
+        else:
+            votes = similarity * weights
+            out_weight = votes.sum(axis=0)
+        dangling = out_weight == 0
+        out_weight[dangling] = 1
+        if sparse.issparse(votes):
+            transition = (votes @ sparse.diags(1 / out_weight)).tocsr()
+        else:
+            transition = votes / out_weight
+
+        prior = weights / weights.sum()
+        scores = prior
+        for _ in range(TEXTRANK_MAX_ITERATIONS):
+            updated = (TEXTRANK_DAMPING * (transition @ scores + scores[dangling].sum() * prior)
+                       + (1 - TEXTRANK_DAMPING) * prior)
+            converged = np.abs(updated - scores).sum() < TEXTRANK_TOLERANCE
+            scores = updated
+            if converged:
+                break
+
+        return scores
+
+    @stage_timer('summarizer.generate_summary')
     def generate_summary(self, reviews, sentiment_results):
 
         if not reviews:
-            return {
-                'summary_text': 'No reviews available for this product.',
-                'key_points': [],
-                'pros': [],
-                'cons': [],
-                'overall_rating': 0
-            }
+            return self._empty_summary()
+
+        if should_parallelize(self.n_jobs, self.chunk_size, len(reviews)):
+            partials = parallel_map(partial(_split_polarity_shard, self), reviews, self.n_jobs, self.chunk_size)
+        else:
+            partials = [self._split_polarity(reviews)]
+
+        positive_reviews = [r for shard_positive, _ in partials for r in shard_positive]
+        negative_reviews = [r for _, shard_negative in partials for r in shard_negative]
+
+        return self._compose_summary(
+            sentiment_results, len(reviews), self.count_sentences(reviews),
+            self.count_sentences(positive_reviews), self.count_sentences(negative_reviews)
+        )
+
+    @stage_timer('summarizer.summarize_split')
+    def summarize_split(self, words, sentences, sentiment_results):
+        """generate_summary over reviews already split into lowercased words and sentence pairs.
+
+        words[i] is review i's lowercase().split() and sentences[i] its split_sentences pairs.
+        """
+
+        if not words:
+            return self._empty_summary()
+
+        all_pairs, positive_pairs, negative_pairs = [], [], []
+        for review_words, pairs in zip(words, sentences):
+            all_pairs.extend(pairs)
+            if self._has_positive_words(review_words):
+                positive_pairs.extend(pairs)
+            if self._has_negative_words(review_words):
+                negative_pairs.extend(pairs)
+
+        return self._compose_summary(
+            sentiment_results, len(words), self.count_sentence_pairs(all_pairs),
+            self.count_sentence_pairs(positive_pairs), self.count_sentence_pairs(negative_pairs)
+        )
+
+    @staticmethod
+    def _empty_summary():
+        return {
+            'summary_text': 'No reviews available for this product.',
+            'key_points': [],
+            'pros': [],
+            'cons': [],
+            'overall_rating': 0
+        }
+
+    def _compose_summary(self, sentiment_results, n_reviews, all_counts, positive_counts, negative_counts):
+        """Summary dict from the sentiment results and the counted sentences of each review group"""
 
         overall_sentiment = sentiment_results.get('overall_sentiment', 'neutral')
         avg_score = sentiment_results.get('avg_score', 0)
         positive_count = sentiment_results.get('positive_count', 0)
         negative_count = sentiment_results.get('negative_count', 0)
-        total_reviews = sentiment_results.get('total_reviews', len(reviews))
+        total_reviews = sentiment_results.get('total_reviews', n_reviews)
 
         summary_parts = []
 
@@ -58,13 +351,14 @@ class ReviewSummarizer:
             neg_percent = (negative_count / total_reviews * 100)
             summary_parts.append(f"{pos_percent:.0f}% of customers were satisfied, while {neg_percent:.0f}% reported issues.")
 
-        summary_text = ' '.join(summary_parts)
+        representative = self.rank_sentence_counts(all_counts, max_sentences=2)
+        if representative:
+            summary_parts.append("Reviewers most often say: " + ' '.join(f'"{s}"' for s in representative))
 
-        positive_reviews = [r for r in reviews if self._is_positive(r)]
-        negative_reviews = [r for r in reviews if self._is_negative(r)]
+        summary_text = ' '.join(summary_parts)
 
-        pros = self._extract_highlights(positive_reviews, sentiment='positive')
-        cons = self._extract_highlights(negative_reviews, sentiment='negative')
+        pros = self._highlights(positive_counts, sentiment='positive')
+        cons = self._highlights(negative_counts, sentiment='negative')
 
         key_points = []
         aspect_analysis = sentiment_results.get('aspect_analysis', {})
@@ -87,36 +381,43 @@ class ReviewSummarizer:
             'negative_percentage': (negative_count / total_reviews * 100) if total_reviews > 0 else 0
         }
 
+    def _split_polarity(self, reviews):
+        """Positive and negative reviews, each in their original order"""
+        positive_reviews = [r for r in reviews if self._is_positive(r)]
+        negative_reviews = [r for r in reviews if self._is_negative(r)]
+        return positive_reviews, negative_reviews
+
     def _is_positive(self, review):
         """Quick check if review is positive"""
-        positive_words = {'great', 'excellent', 'good', 'love', 'best', 'perfect', 'amazing'}
-        words = set(review.lower().split())
-        return len(words & positive_words) > 0
+        return self._has_positive_words(review.lower().split())
 
     def _is_negative(self, review):
         """Quick check if review is negative"""
-        negative_words = {'bad', 'poor', 'terrible', 'worst', 'awful', 'disappointed'}
-        words = set(review.lower().split())
-        return len(words & negative_words) > 0
+        return self._has_negative_words(review.lower().split())
 
-    def _extract_highlights(self, reviews, sentiment='positive'):
-        """Extract key highlights from reviews"""
+    @staticmethod
+    def _has_positive_words(words):
+        return not POLARITY_POSITIVE_WORDS.isdisjoint(words)
 
-        if not reviews:
-            return []
+    @staticmethod
+    def _has_negative_words(words):
+        return not POLARITY_NEGATIVE_WORDS.isdisjoint(words)
 
-        highlights = []
+    def _extract_highlights(self, reviews, sentiment='positive'):
+        """Extract key highlights from reviews, the most central sentences across all of them"""
+        return self._highlights(self.count_sentences(reviews), sentiment)
 
-        for review in reviews[:10]:  # Analyze top 10 reviews
-            sentences = [s.strip() for s in review.split('.') if len(s.strip()) > 15]
+    def _highlights(self, counts, sentiment='positive'):
+        if not counts:
+            return []
 
-            for sentence in sentences:
-                # Clean and add
-                if sentence and len(sentence) > 20 and len(sentence) < 150:
-                    highlights.append(sentence)
+        # Mixed reviews land on both sides, their sentences of the other polarity are left out
+        if sentiment == 'positive':
+            keep = lambda sentence: not self._is_negative(sentence)
+        else:
+            keep = lambda sentence: not self._is_positive(sentence)
 
-        unique_highlights = list(set(highlights))
-        return unique_highlights[:5]
+        return self.rank_sentence_counts(counts, max_sentences=5, keep=keep)
 
     def _calculate_overall_rating(self, avg_score):
 
@@ -0,0 +1,263 @@
+import pandas as pd
+import numpy as np
+import threading
+
+# Behavioral features derived from a reviewer's history, in the column order the detector uses
+BEHAVIOR_FEATURE_NAMES = [
+    'reviewer_review_count', 'reviewer_burstiness', 'reviewer_rating_variance', 'reviewer_unverified_share'
+]
+
+# reviewer_id the store fills in when a review has none, never aggregated
+ANONYMOUS_REVIEWER = 0
+
+# verified_purchase of reviews that do not say, the same when scoring a review and when storing it
+DEFAULT_VERIFIED_PURCHASE = 0
+
+# Columns of a reviews DataFrame that behavioral features are computed from
+HISTORY_COLUMNS = ['reviewer_id', 'rating', 'verified_purchase', 'review_date']
+
+# Columns of the running aggregates, first and last day are NaN until a dated review arrives
+_COUNT, _RATING_SUM, _RATING_SQ_SUM, _UNVERIFIED, _FIRST_DAY, _LAST_DAY = range(6)
+
+# Review days are packed under the reviewer slot into one sortable key, offset so they stay non-negative
+_DAY_MIN = -(1 << 31)
+
+def _history_keys(slots, days):
+    return (slots.astype(np.int64) << 32) | (days.astype(np.int64) - _DAY_MIN)
+
+class ReviewerIndex:
+    """Running per-reviewer aggregates, so behavioral features are one lookup per review"""
+
+    def __init__(self):
+        self._slots = {}
+        self._stats = np.zeros((0, 6), dtype=np.float64)
+        # Each dated review as (slots, days, aggregate rows) chunks for features_as_of,
+        # sorted lazily into _sorted on the first lookup after reviews are added
+        self._dated = []
+        self._sorted = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index from a reviews DataFrame"""
+
+        index = cls()
+        index.add_reviews(df)
+        return index
+
+    def add_reviews(self, df):
+        """Fold a batch of reviews into the per-reviewer aggregates"""
+
+        if df is None or df.empty or 'reviewer_id' not in df.columns:
+            return
+
+        work = self._columns(
+            df['reviewer_id'].to_numpy(),
+            df['rating'].to_numpy() if 'rating' in df.columns else None,
+            df['verified_purchase'].to_numpy() if 'verified_purchase' in df.columns else None,
+            df['review_date'] if 'review_date' in df.columns else None
+        )
+        work = work[work['reviewer_id'] != ANONYMOUS_REVIEWER]
+        if work.empty:
+            return
+
+        grouped = work.groupby('reviewer_id', sort=False).agg(
+            count=('rating', 'size'),
+            rating_sum=('rating', 'sum'),
+            rating_sq_sum=('rating_sq', 'sum'),
+            unverified=('unverified', 'sum'),
+            first_day=('day', 'min'),
+            last_day=('day', 'max')
+        )
+
+        dated = work[work['day'].notna()]
+        with self._lock:
+            slots = np.fromiter(
+                (self._slot(reviewer_id) for reviewer_id in grouped.index.tolist()),
+                dtype=np.int64, count=len(grouped)
+            )
+            self._grow()
+
+            if len(dated):
+                dated_slots = slots[grouped.index.get_indexer(dated['reviewer_id'])]
+                values = np.column_stack([
+                    np.ones(len(dated)), dated['rating'].to_numpy(), dated['rating_sq'].to_numpy(),
+                    dated['unverified'].to_numpy()
+                ])
+                self._dated.append((dated_slots, dated['day'].to_numpy(), values))
+                self._sorted = None
+
+            values = grouped.to_numpy(dtype=np.float64)
+            self._stats[slots, :_FIRST_DAY] += values[:, :_FIRST_DAY]
+            self._stats[slots, _FIRST_DAY] = np.fmin(self._stats[slots, _FIRST_DAY], values[:, _FIRST_DAY])
+            self._stats[slots, _LAST_DAY] = np.fmax(self._stats[slots, _LAST_DAY], values[:, _LAST_DAY])
+
+    @staticmethod
+    def _columns(reviewer_ids, ratings, verified, dates):
+        n_rows = len(reviewer_ids)
+        ratings = np.zeros(n_rows) if ratings is None else np.asarray(ratings, dtype=np.float64)
+        verified = np.ones(n_rows) if verified is None else np.asarray(verified, dtype=np.float64)
+        if dates is None:
+            days = np.full(n_rows, np.nan)
+        else:
+            days = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy().astype('datetime64[D]')
+            days = np.where(np.isnat(days), np.nan, days.astype(np.int64).astype(np.float64))
+
+        return pd.DataFrame({
+            'reviewer_id': np.asarray(reviewer_ids, dtype=np.int64),
+            'rating': ratings,
+            'rating_sq': ratings * ratings,
+            'unverified': 1.0 - verified,
+            'day': days
+        })
+
+    def _slot(self, reviewer_id):
+        slot = self._slots.get(reviewer_id)
+        if slot is None:
+            slot = len(self._slots)
+            self._slots[reviewer_id] = slot
+        return slot
+
+    def _grow(self):
+        """Make room for every assigned slot, doubling so appends stay amortized O(1)"""
+        if len(self._slots) > len(self._stats):
+            grown = np.zeros((max(len(self._slots), 2 * len(self._stats)), 6), dtype=np.float64)
+            grown[:, _FIRST_DAY:] = np.nan
+            grown[:len(self._stats)] = self._stats
+            self._stats = grown
+
+    def _history(self, reviewer_ids):
+        """Aggregate rows for reviewer_ids, zeros (and NaN days) for unknown reviewers"""
+        with self._lock:
+            slots = np.fromiter(
+                (self._slots.get(reviewer_id, -1) for reviewer_id in np.asarray(reviewer_ids).tolist()),
+                dtype=np.int64, count=len(reviewer_ids)
+            )
+            history = np.zeros((len(slots), 6), dtype=np.float64)
+            history[:, _FIRST_DAY:] = np.nan
+            known = slots >= 0
+            history[known] = self._stats[slots[known]]
+        return history
+
+    @staticmethod
+    def _features(stats):
+        count = stats[:, _COUNT]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            span = np.nan_to_num(stats[:, _LAST_DAY] - stats[:, _FIRST_DAY])
+            mean = np.where(count > 0, stats[:, _RATING_SUM] / count, 0.0)
+            variance = np.where(count > 0, stats[:, _RATING_SQ_SUM] / count - mean * mean, 0.0)
+            unverified_share = np.where(count > 0, stats[:, _UNVERIFIED] / count, 0.0)
+        burstiness = count / (span + 1)
+        return np.column_stack([count, burstiness, np.maximum(variance, 0.0), unverified_share])
+
+    def features(self, reviewer_ids):
+        """Behavioral features of reviewers' indexed history as an (n, 4) array"""
+        return self._features(self._history(reviewer_ids))
+
+    def features_with(self, reviewer_ids, ratings=None, verified=None, dates=None):
+        """Behavioral features as they will be once each given review is added to its reviewer's history.
+
+        Used at scoring time, so a new review is described the same way the reviews
+        the model was trained on were.
+        """
+
+        return self._features(self._with_reviews(
+            self._history(reviewer_ids), self._columns(reviewer_ids, ratings, verified, dates)
+        ))
+
+    @classmethod
+    def anonymous_features(cls, n_rows):
+        """Behavioral features of reviews with no reviewer details, as features_with describes them once stored"""
+        stats = np.zeros((n_rows, 6), dtype=np.float64)
+        stats[:, _FIRST_DAY:] = np.nan
+        work = cls._columns(np.full(n_rows, ANONYMOUS_REVIEWER), None, np.full(n_rows, DEFAULT_VERIFIED_PURCHASE), None)
+        return cls._features(cls._with_reviews(stats, work))
+
+    def features_as_of(self, reviewer_ids, ratings=None, verified=None, dates=None):
+        """Behavioral features of each given review as they were when it was written.
+
+        A review's history is its reviewer's indexed reviews dated strictly before it, plus the
+        review itself, the way features_with described it on arrival. Training and rescoring
+        stored reviews both use this, so no review is described by reviews written after it.
+        Undated and anonymous reviews count as a first review and are in no one's history.
+        """
+
+        work = self._columns(reviewer_ids, ratings, verified, dates)
+        day = work['day'].to_numpy()
+        stats = np.zeros((len(work), 6), dtype=np.float64)
+        stats[:, _FIRST_DAY:] = np.nan
+
+        with self._lock:
+            slots = np.fromiter(
+                (self._slots.get(reviewer_id, -1) for reviewer_id in work['reviewer_id'].tolist()),
+                dtype=np.int64, count=len(work)
+            )
+            keys, history_days, running = self._dated_history()
+
+        query = np.flatnonzero((slots >= 0) & ~np.isnan(day) & (work['reviewer_id'].to_numpy() != ANONYMOUS_REVIEWER))
+        if len(query) and len(keys):
+            # Same-day reviews are not history for each other, the search stops at the review's own day
+            first = np.searchsorted(keys, _history_keys(slots[query], np.full(len(query), _DAY_MIN)))
+            stop = np.searchsorted(keys, _history_keys(slots[query], day[query]))
+            stats[query, :_FIRST_DAY] = running[stop] - running[first]
+            earlier = stop > first
+            stats[query[earlier], _FIRST_DAY] = history_days[first[earlier]]
+            stats[query[earlier], _LAST_DAY] = history_days[stop[earlier] - 1]
+
+        return self._features(self._with_reviews(stats, work))
+
+    def _dated_history(self):
+        """Dated reviews sorted by (slot, day) with running sums of their aggregates, call with _lock held"""
+
+        if self._sorted is None:
+            slots = np.concatenate([chunk[0] for chunk in self._dated]) if self._dated else np.zeros(0, dtype=np.int64)
+            days = np.concatenate([chunk[1] for chunk in self._dated]) if self._dated else np.zeros(0)
+            values = np.vstack([chunk[2] for chunk in self._dated]) if self._dated else np.zeros((0, 4))
+            self._dated = [(slots, days, values)]
+
+            keys = _history_keys(slots, days)
+            order = np.argsort(keys, kind='stable')
+            running = np.zeros((len(order) + 1, 4), dtype=np.float64)
+            np.cumsum(values[order], axis=0, out=running[1:])
+            self._sorted = (keys[order], days[order], running)
+        return self._sorted
+
+    @staticmethod
+    def _with_reviews(stats, work):
+        """History aggregates with each review of work added to its own row"""
+
+        stats[:, _COUNT] += 1
+        stats[:, _RATING_SUM] += work['rating'].to_numpy()
+        stats[:, _RATING_SQ_SUM] += work['rating_sq'].to_numpy()
+        stats[:, _UNVERIFIED] += work['unverified'].to_numpy()
+        days = work['day'].to_numpy()
+        stats[:, _FIRST_DAY] = np.fmin(stats[:, _FIRST_DAY], days)
+        stats[:, _LAST_DAY] = np.fmax(stats[:, _LAST_DAY], days)
+
+        # Reviews without a reviewer are described as a first review
+        anonymous = work['reviewer_id'].to_numpy() == ANONYMOUS_REVIEWER
+        stats[anonymous, :_UNVERIFIED] = np.column_stack([
+            np.ones(anonymous.sum()), work['rating'].to_numpy()[anonymous], work['rating_sq'].to_numpy()[anonymous]
+        ])
+        stats[anonymous, _UNVERIFIED] = work['unverified'].to_numpy()[anonymous]
+        stats[anonymous, _FIRST_DAY] = stats[anonymous, _LAST_DAY] = days[anonymous]
+
+        return stats
+
+    def get(self, reviewer_id):
+        """Aggregates and features of one reviewer, or None if unknown"""
+
+        with self._lock:
+            slot = self._slots.get(reviewer_id)
+            if slot is None:
+                return None
+            stats = self._stats[slot].copy()
+
+        first_day, last_day = stats[_FIRST_DAY], stats[_LAST_DAY]
+        result = dict(zip(BEHAVIOR_FEATURE_NAMES, self._features(stats[None, :])[0].tolist()))
+        result['first_review'] = str(np.datetime64(int(first_day), 'D')) if not np.isnan(first_day) else None
+        result['last_review'] = str(np.datetime64(int(last_day), 'D')) if not np.isnan(last_day) else None
+        return result
+
+    def __len__(self):
+        return len(self._slots)
@@ -1,10 +1,34 @@
 import pandas as pd
 import numpy as np
 from collections import Counter
+from functools import partial
 import re
+from parallel import PARALLEL_CHUNK_SIZE, parallel_map, should_parallelize
+from metrics import stage_timer
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+
+# Bit flags stored per token in the compiled lexicon
+POSITIVE_FLAG = 1
+NEGATIVE_FLAG = 2
+
+# Distinct sentences whose lexicon stats are memoized per analyzer
+SENTENCE_CACHE_SIZE = 100000
+
+def _analyze_shard(analyzer, reviews):
+    """Worker side of analyze_reviews for one shard of reviews"""
+    return analyzer._collect_review_stats(reviews)
+
+def _pros_cons_shard(analyzer, reviews):
+    """Worker side of extract_pros_cons for one shard of reviews"""
+    return analyzer._collect_pros_cons(reviews)
 
 class SentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, n_jobs=1, chunk_size=PARALLEL_CHUNK_SIZE):
+        # n_jobs > 1 (or -1 for all cores) shards large review lists across a process pool
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
         self.positive_words = {
             'excellent', 'great', 'good', 'amazing', 'perfect', 'love', 'best',
             'fantastic', 'wonderful', 'awesome', 'satisfied', 'happy', 'recommend',
@@ -26,92 +50,200 @@ class SentimentAnalyzer:
             'service': ['service', 'support', 'customer', 'response', 'seller']
         }
 
-    def calculate_sentiment_score(self, text):
-        """Calculate sentiment score from -1 (negative) to +1 (positive)"""
+        self.compile_lexicon()
+
+    def __getstate__(self):
+        # Workers get a fresh memo instead of a copy of this process's one
+        state = self.__dict__.copy()
+        state['_sentence_cache'] = {}
+        return state
+
+    def compile_lexicon(self):
+        """Precompile the word lists into lookup tables, call again after editing them"""
+
+        self._sentence_cache = {}
+        self._token_flags = {}
+        for word in self.positive_words:
+            self._token_flags[word] = self._token_flags.get(word, 0) | POSITIVE_FLAG
+        for word in self.negative_words:
+            self._token_flags[word] = self._token_flags.get(word, 0) | NEGATIVE_FLAG
+
+        # Aspects match keywords as substrings, a lookahead finds every occurrence in one scan
+        self._aspect_names = list(self.aspects.keys())
+        keywords = sorted({k for words in self.aspects.values() for k in words}, key=len, reverse=True)
+        self._aspect_pattern = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))')
+
+        # A match also implies every keyword it contains, so map it to all of their aspects
+        self._keyword_aspects = {}
+        for keyword in keywords:
+            mask = 0
+            for bit, aspect in enumerate(self._aspect_names):
+                if any(k in keyword for k in self.aspects[aspect]):
+                    mask |= 1 << bit
+            self._keyword_aspects[keyword] = mask
+
+    def _sentence_stats(self, sentence):
+        """Positive, negative and total token counts plus aspect mask for one sentence"""
+
+        stats = self._sentence_cache.get(sentence)
+        if stats is not None:
+            return stats
+
+        lowered = sentence.lower()
+        words = TOKEN_PATTERN.findall(lowered)
+
+        token_flags = self._token_flags
+        matched = [token_flags[word] for word in words if word in token_flags]
+        positive_count = sum(1 for flags in matched if flags & POSITIVE_FLAG)
+        negative_count = sum(1 for flags in matched if flags & NEGATIVE_FLAG)
+
+        aspect_mask = 0
+        for match in self._aspect_pattern.finditer(lowered):
+            aspect_mask |= self._keyword_aspects[match.group(1)]
+
+        stats = (positive_count, negative_count, len(words), aspect_mask)
+
+        # Reviews repeat the same sentences heavily, a bounded memo skips re-scanning them
+        if len(self._sentence_cache) >= SENTENCE_CACHE_SIZE:
+            self._sentence_cache.clear()
+        self._sentence_cache[sentence] = stats
+
+        return stats
+
+    def word_stats(self, word):
+        """Positive count, negative count and aspect mask of one lowercased token.
+
+        Aspect keywords are whole words or parts of one, never spanning two tokens, so the
+        _sentence_stats of a clause are its tokens' word_stats added up, with the masks OR-ed.
+        """
+
+        flags = self._token_flags.get(word, 0)
+        aspect_mask = 0
+        for match in self._aspect_pattern.finditer(word):
+            aspect_mask |= self._keyword_aspects[match.group(1)]
+        return flags & POSITIVE_FLAG, (flags & NEGATIVE_FLAG) >> 1, aspect_mask
+
+    @staticmethod
+    def _score(positive_count, negative_count, total_words):
+        score = (positive_count - negative_count) / (total_words if total_words else 1)
+        return min(max(score, -1.0), 1.0)
+
+    @staticmethod
+    def _label(score):
+        if score > 0.1:
+            return 'positive'
+        elif score < -0.1:
+            return 'negative'
+        else:
+            return 'neutral'
 
-        words = re.findall(r'\b\w+\b', text.lower())
+    def clause_stats(self, text):
+        """A review's split('.') clauses and the memoized _sentence_stats of each"""
+        clauses = text.split('.')
+        return clauses, [self._sentence_stats(clause) for clause in clauses]
 
-        positive_count = sum(1 for word in words if word in self.positive_words)
-        negative_count = sum(1 for word in words if word in self.negative_words)
+    def analyze_text(self, text):
+        """Score, classify and collect aspect sentiment for a review in one pass"""
+        return self.analyze_clause_stats(self.clause_stats(text)[1])
 
-        total_words = len(words) if words else 1
+    def analyze_clause_stats(self, stats):
+        """analyze_text of a review from the _sentence_stats of its clauses"""
 
-        score = (positive_count - negative_count) / total_words
+        positive_total = 0
+        negative_total = 0
+        words_total = 0
+        aspect_counts = {}
 
-        return np.clip(score, -1, 1)
+        for positive_count, negative_count, word_count, aspect_mask in stats:
+            positive_total += positive_count
+            negative_total += negative_count
+            words_total += word_count
 
-    def classify_sentiment(self, text):
-        """Classify sentiment as positive, negative, or neutral"""
+            bit = 0
+            while aspect_mask:
+                if aspect_mask & 1:
+                    counts = aspect_counts.setdefault(bit, [0, 0, 0])
+                    counts[0] += positive_count
+                    counts[1] += negative_count
+                    counts[2] += word_count
+                aspect_mask >>= 1
+                bit += 1
 
-        score = self.calculate_sentiment_score(text)
+        score = self._score(positive_total, negative_total, words_total)
 
-        if score > 0.1:
-            return 'positive'
-        elif score < -0.1:
-            return 'negative'
-        else:
-            return 'neutral'
+        aspect_sentiments = {}
+        for bit in sorted(aspect_counts):
+            aspect_score = self._score(*aspect_counts[bit])
+            aspect_sentiments[self._aspect_names[bit]] = {
+                'sentiment': self._label(aspect_score),
+                'score': float(aspect_score),
+                'mentioned': True
+            }
 
-    def aspect_based_sentiment(self, text):
-        """Extract sentiment for different product aspects"""
+        return score, self._label(score), aspect_sentiments
 
-        text_lower = text.lower()
-        aspect_sentiments = {}
+    def calculate_sentiment_score(self, text):
+        """Calculate sentiment score from -1 (negative) to +1 (positive)"""
 
-        for aspect, keywords in self.aspects.items():
+        positive_count, negative_count, total_words, _ = self._sentence_stats(text)
 
-            mentioned = any(keyword in text_lower for keyword in keywords)
+        return self._score(positive_count, negative_count, total_words)
 
-            if mentioned:
-                
-                sentences = text.split('.')
-                aspect_sentences = [s for s in sentences 
-                                  if any(k in s.lower() for k in keywords)]
+    def classify_sentiment(self, text):
+        """Classify sentiment as positive, negative, or neutral"""
 
-                if aspect_sentences:
-                    aspect_text = ' '.join(aspect_sentences)
-                    sentiment = self.classify_sentiment(aspect_text)
-                    score = self.calculate_sentiment_score(aspect_text)
+        return self._label(self.calculate_sentiment_score(text))
 
-                    aspect_sentiments[aspect] = {
-                        'sentiment': sentiment,
-                        'score': float(score),
-                        'mentioned': True
-                    }
+    def aspect_based_sentiment(self, text):
+        """Extract sentiment for different product aspects"""
 
-        return aspect_sentiments
+        return self.analyze_text(text)[2]
 
+    @stage_timer('sentiment.analyze_reviews')
     def analyze_reviews(self, reviews):
 
 
         if not reviews:
-            return {
-                'overall_sentiment': 'neutral',
-                'positive_count': 0,
-                'negative_count': 0,
-                'neutral_count': 0,
-                'avg_score': 0.0,
-                'aspect_analysis': {}
-            }
+            return self._empty_results()
 
-        sentiments = []
-        scores = []
-        all_aspect_sentiments = {}
+        if should_parallelize(self.n_jobs, self.chunk_size, len(reviews)):
+            partials = parallel_map(partial(_analyze_shard, self), reviews, self.n_jobs, self.chunk_size)
+        else:
+            partials = [self._collect_review_stats(reviews)]
 
-        for review in reviews:
-            sentiment = self.classify_sentiment(review)
-            score = self.calculate_sentiment_score(review)
+        return self._merge_results(partials, len(reviews))
 
-            sentiments.append(sentiment)
-            scores.append(score)
+    def analyze_reviews_from_analyses(self, analyses):
+        """analyze_reviews over the analyze_text (or analyze_clause_stats) result of each review"""
 
-            aspects = self.aspect_based_sentiment(review)
-            for aspect, data in aspects.items():
-                if aspect not in all_aspect_sentiments:
-                    all_aspect_sentiments[aspect] = []
-                all_aspect_sentiments[aspect].append(data['score'])
+        if not analyses:
+            return self._empty_results()
 
-        sentiment_counts = Counter(sentiments)
+        return self._merge_results([self._collect_analyses(analyses)], len(analyses))
+
+    @staticmethod
+    def _empty_results():
+        return {
+            'overall_sentiment': 'neutral',
+            'positive_count': 0,
+            'negative_count': 0,
+            'neutral_count': 0,
+            'avg_score': 0.0,
+            'aspect_analysis': {}
+        }
+
+    def _merge_results(self, partials, n_reviews):
+        """Overall results from the per-shard output of _collect_analyses"""
+
+        # Merging shards in order keeps scores and aspect lists identical to a sequential run
+        sentiment_counts = Counter()
+        scores = []
+        all_aspect_sentiments = {}
+        for shard_counts, shard_scores, shard_aspects in partials:
+            sentiment_counts.update(shard_counts)
+            scores.extend(shard_scores)
+            for aspect, scores_list in shard_aspects.items():
+                all_aspect_sentiments.setdefault(aspect, []).extend(scores_list)
 
         aspect_summary = {}
         for aspect, scores_list in all_aspect_sentiments.items():
@@ -144,36 +276,90 @@ class SentimentAnalyzer:
             'neutral_count': sentiment_counts.get('neutral', 0),
             'avg_score': float(avg_score),
             'aspect_analysis': aspect_summary,
-            'total_reviews': len(reviews)
+            'total_reviews': n_reviews
         }
 
+    def _collect_review_stats(self, reviews):
+        """Sentiment counts, per-review scores and aspect score lists for a list of reviews"""
+        return self._collect_analyses(self.analyze_text(review) for review in reviews)
+
+    def _collect_analyses(self, analyses):
+        """_collect_review_stats over analyze_text results"""
+
+        sentiments = []
+        scores = []
+        all_aspect_sentiments = {}
+
+        for score, sentiment, aspects in analyses:
+
+            sentiments.append(sentiment)
+            scores.append(score)
+
+            for aspect, data in aspects.items():
+                if aspect not in all_aspect_sentiments:
+                    all_aspect_sentiments[aspect] = []
+                all_aspect_sentiments[aspect].append(data['score'])
+
+        return Counter(sentiments), scores, all_aspect_sentiments
+
+    @stage_timer('sentiment.pros_cons')
     def extract_pros_cons(self, reviews):
         """Extract key pros and cons from reviews"""
 
+        if should_parallelize(self.n_jobs, self.chunk_size, len(reviews)):
+            partials = parallel_map(partial(_pros_cons_shard, self), reviews, self.n_jobs, self.chunk_size)
+        else:
+            partials = [self._collect_pros_cons(reviews)]
+
+        pros = [pro for shard_pros, _ in partials for pro in shard_pros]
+        cons = [con for _, shard_cons in partials for con in shard_cons]
+
+        return {
+            'pros': pros[:5] if pros else ['Generally positive feedback'],
+            'cons': cons[:5] if cons else ['No major issues reported']
+        }
+
+    def pros_cons_from_stats(self, review_clauses, review_stats):
+        """extract_pros_cons over reviews already split into clauses with their clause stats"""
+
+        pros, cons = self._collect_clause_pros_cons(zip(review_clauses, review_stats))
+        return {
+            'pros': pros[:5] if pros else ['Generally positive feedback'],
+            'cons': cons[:5] if cons else ['No major issues reported']
+        }
+
+    def _collect_pros_cons(self, reviews, limit=5):
+        """First pros and cons sentences in review order, stopping once both reach limit"""
+
+        return self._collect_clause_pros_cons(map(self.clause_stats, reviews), limit)
+
+    def _collect_clause_pros_cons(self, split_reviews, limit=5):
+        """_collect_pros_cons over (clauses, clause stats) pairs, consumed only as far as needed"""
+
         pros = []
         cons = []
 
-        for review in reviews:
-            sentiment = self.classify_sentiment(review)
+        for sentences, stats in split_reviews:
+            if len(pros) >= limit and len(cons) >= limit:
+                break
 
-            sentences = review.split('.')
+            sentiment = self._label(self._score(
+                sum(s[0] for s in stats), sum(s[1] for s in stats), sum(s[2] for s in stats)
+            ))
 
-            for sentence in sentences:
+            for sentence, (positive_count, negative_count, word_count, _) in zip(sentences, stats):
                 sentence = sentence.strip()
                 if len(sentence) < 10:
                     continue
 
-                sent_sentiment = self.classify_sentiment(sentence)
+                sent_sentiment = self._label(self._score(positive_count, negative_count, word_count))
 
                 if sent_sentiment == 'positive' and sentiment == 'positive':
                     pros.append(sentence)
                 elif sent_sentiment == 'negative' and sentiment == 'negative':
                     cons.append(sentence)
 
-        return {
-            'pros': pros[:5] if pros else ['Generally positive feedback'],
-            'cons': cons[:5] if cons else ['No major issues reported']
-        }
+        return pros[:limit], cons[:limit]
 
 if __name__ == "__main__":
     analyzer = SentimentAnalyzer()
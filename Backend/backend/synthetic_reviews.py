@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+import datetime
+
+# Columns of product_reviews_dataset.csv, in its order
+COLUMNS = [
+    'review_id', 'product_name', 'category', 'reviewer_id', 'rating', 'review_text', 'sentiment',
+    'is_fake', 'verified_purchase', 'helpful_votes', 'review_length', 'review_date',
+    'exclamation_count', 'capital_ratio'
+]
+
+PRODUCTS = [
+    'Electronics - Headphones', 'Electronics - Smartphone', 'Electronics - Camera', 'Electronics - Laptop',
+    'Electronics - Tablet', 'Clothing - T-Shirt', 'Clothing - Dress', 'Clothing - Jacket', 'Clothing - Jeans',
+    'Clothing - Shoes', 'Home - Mixer', 'Home - Lamp', 'Home - Curtain', 'Home - Bed', 'Home - Vacuum',
+    'Books - Fiction Novel', 'Books - Comic', 'Books - Cookbook', 'Books - Textbook', 'Books - Biography',
+    'Sports - Dumbbells', 'Sports - Running Shoes', 'Sports - Yoga Mat', 'Sports - Tennis Racket',
+    'Sports - Bicycle'
+]
+
+# Review templates per (is_fake, sentiment) group, the bundled dataset is built from the same ones
+TEMPLATES = {
+    (0, 'negative'): [
+        "Does not work as advertised. Very frustrating purchase.",
+        "Expected better quality. Cheap material. Not recommended.",
+        "Not as described. Quality is poor. Disappointed with purchase.",
+        "Product broke after 2 weeks. Waste of money. Don't buy.",
+        "Terrible experience. Product arrived damaged. Poor packaging.",
+        "Very low quality. Not worth the price at all."
+    ],
+    (0, 'positive'): [
+        "Amazing product! Fast delivery and great customer service.",
+        "Best purchase I made this year. Quality is outstanding!",
+        "Excellent purchase. Works perfectly as described. Highly recommend!",
+        "Great product! Really satisfied with the quality. Worth the money.",
+        "Love it! Exactly what I was looking for. Perfect!",
+        "Superb quality and value for money. Totally satisfied.",
+        "Very good quality. Exceeded my expectations. Will buy again."
+    ],
+    (1, 'negative'): [
+        "Complete waste! Garbage! Fake! Lies!",
+        "Terrible! Horrible! Awful! Stay away! Warning!",
+        "Worst experience! Never again! Disaster! Scam!",
+        "Worst product ever! Don't buy! Scam! Fraud!"
+    ],
+    (1, 'positive'): [
+        "Amazing product amazing quality amazing price amazing everything!!!",
+        "Best product ever!!! Amazing!!! 5 stars!!!",
+        "Best seller! Top quality! Must have! Recommended!",
+        "Excellent excellent excellent! Perfect perfect perfect!",
+        "Great Great Great! Buy it now! You won't regret!",
+        "Perfect! Perfect! Perfect! Must buy! Great deal!",
+        "Wow! Incredible! Super! Fantastic! Excellent!"
+    ]
+}
+
+# Sentences appended to a share of reviews
+TAILS = ["Fast shipping.", "Good delivery.", "Nice packaging.", "Quick response.", "Thanks seller.", "Would recommend."]
+
+# Rates and distributions measured on the bundled dataset
+FAKE_RATE = 0.287
+POSITIVE_RATE = {0: 0.66, 1: 0.70}
+TAIL_RATE = 0.3
+VERIFIED_RATE = {0: 0.76, 1: 0.35}
+MAX_HELPFUL_VOTES = {0: 50, 1: 5}
+# P(rating = 1..5) per (is_fake, sentiment) group
+RATING_PROBABILITIES = {
+    (0, 'negative'): [0.25, 0.47, 0.28, 0.0, 0.0],
+    (0, 'positive'): [0.0, 0.0, 0.24, 0.50, 0.26],
+    (1, 'negative'): [0.68, 0.32, 0.0, 0.0, 0.0],
+    (1, 'positive'): [0.0, 0.0, 0.0, 0.26, 0.74]
+}
+FIRST_REVIEW_DATE = datetime.date(2024, 10, 29)
+REVIEW_DAYS = 365
+FIRST_REVIEWER_ID = 1001
+# Reviewer ids drawn per review, the bundled dataset draws 5,000 reviews from 9,000 ids
+REVIEWER_IDS_PER_REVIEW = 1.8
+
+GROUPS = list(TEMPLATES)
+
+def product_names(n_products=len(PRODUCTS)):
+    """The bundled dataset's products, then numbered variants of them once those run out"""
+    return [
+        PRODUCTS[i % len(PRODUCTS)] + (f" {i // len(PRODUCTS) + 1}" if i >= len(PRODUCTS) else '')
+        for i in range(n_products)
+    ]
+
+def iter_review_chunks(n_rows, seed=42, chunk_size=100000, n_products=len(PRODUCTS), fake_rate=FAKE_RATE,
+                       unique_share=0.0):
+    """Seeded synthetic reviews following the bundled dataset's schema, as DataFrames of chunk_size rows.
+
+    The bundled dataset only holds 168 distinct texts. unique_share is the share of reviews
+    that get a sentence no other review has, for exercising paths that depend on distinct text.
+    The same arguments always give the same rows.
+    """
+
+    rng = np.random.default_rng(seed)
+    products = np.array(product_names(n_products), dtype=object)
+    categories = np.array([name.split(' - ')[0] for name in products], dtype=object)
+    n_reviewer_ids = max(int(n_rows * REVIEWER_IDS_PER_REVIEW), 9000)
+    first_day = np.datetime64(FIRST_REVIEW_DATE, 'D')
+
+    # Every template with and without each tail, so derived columns are computed once per text
+    bodies, body_groups = [], []
+    for group_number, group in enumerate(GROUPS):
+        for template in TEMPLATES[group]:
+            for tail in [None] + TAILS:
+                bodies.append(template if tail is None else f"{template} {tail}")
+                body_groups.append(group_number)
+    bodies = np.array(bodies, dtype=object)
+    body_groups = np.array(body_groups)
+    untailed = np.arange(len(bodies)) % (len(TAILS) + 1) == 0
+    group_templates = [np.flatnonzero(untailed & (body_groups == g)) for g in range(len(GROUPS))]
+    rating_cdf = np.cumsum([RATING_PROBABILITIES[group] for group in GROUPS], axis=1)
+    rating_cdf[:, -1] = 1.0
+
+    for start in range(0, n_rows, chunk_size):
+        n = min(chunk_size, n_rows - start)
+
+        is_fake = (rng.random(n) < fake_rate).astype(np.int64)
+        positive = rng.random(n) < np.where(is_fake == 1, POSITIVE_RATE[1], POSITIVE_RATE[0])
+        group = is_fake * 2 + positive
+
+        body = np.empty(n, dtype=np.int64)
+        for g, templates in enumerate(group_templates):
+            rows = np.flatnonzero(group == g)
+            body[rows] = templates[rng.integers(0, len(templates), len(rows))]
+        # Each template body is followed by its tailed variants
+        tailed = rng.random(n) < TAIL_RATE
+        body[tailed] += 1 + rng.integers(0, len(TAILS), tailed.sum())
+
+        texts = bodies[body]
+        unique = np.flatnonzero(rng.random(n) < unique_share)
+        if len(unique):
+            days_used = rng.integers(1, 400, len(unique))
+            texts[unique] = [
+                f"{text} Order {start + i + 1} used for {days} days."
+                for text, i, days in zip(texts[unique], unique.tolist(), days_used.tolist())
+            ]
+        text_series = pd.Series(texts, dtype=object)
+
+        product = rng.integers(0, len(products), n)
+        rating = 1 + (rng.random(n)[:, None] >= rating_cdf[group]).sum(axis=1)
+        verified = rng.random(n) < np.where(is_fake == 1, VERIFIED_RATE[1], VERIFIED_RATE[0])
+        helpful = rng.integers(0, np.where(is_fake == 1, MAX_HELPFUL_VOTES[1], MAX_HELPFUL_VOTES[0]) + 1)
+        dates = first_day + rng.integers(0, REVIEW_DAYS, n)
+
+        yield pd.DataFrame({
+            'review_id': [f"REV_{i:05d}" for i in range(start + 1, start + n + 1)],
+            'product_name': products[product],
+            'category': categories[product],
+            'reviewer_id': FIRST_REVIEWER_ID + rng.integers(0, n_reviewer_ids, n),
+            'rating': rating,
+            'review_text': texts,
+            'sentiment': np.where(positive, 'positive', 'negative'),
+            'is_fake': is_fake,
+            'verified_purchase': verified.astype(np.int64),
+            'helpful_votes': helpful,
+            'review_length': text_series.str.split().str.len().to_numpy(),
+            'review_date': np.datetime_as_string(dates, unit='D'),
+            'exclamation_count': text_series.str.count('!').to_numpy(),
+            'capital_ratio': (text_series.str.count('[A-Z]') / text_series.str.len()).to_numpy()
+        }, columns=COLUMNS)
+
+def generate_reviews(n_rows, seed=42, **options):
+    """All rows of iter_review_chunks as one DataFrame"""
+
+    chunks = list(iter_review_chunks(n_rows, seed, **options))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=COLUMNS)
+
+def write_reviews_csv(path, n_rows, seed=42, **options):
+    """Write a synthetic dataset to a CSV chunk by chunk, so any size fits in memory"""
+
+    with open(path, 'w', newline='') as f:
+        for number, chunk in enumerate(iter_review_chunks(n_rows, seed, **options)):
+            chunk.to_csv(f, header=number == 0, index=False)
+    return path
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Write a synthetic review dataset in the bundled CSV's schema")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=len(PRODUCTS))
+    parser.add_argument('--fake-rate', type=float, default=FAKE_RATE)
+    parser.add_argument('--unique-share', type=float, default=0.0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_reviews_csv(
+        args.path, args.rows, args.seed, n_products=args.products, fake_rate=args.fake_rate,
+        unique_share=args.unique_share
+    )
+    print(f"✓ Wrote {args.rows} reviews to {args.path} in {time.perf_counter() - start:.1f}s")
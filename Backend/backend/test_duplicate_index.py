@@ -0,0 +1,39 @@
+import pandas as pd
+from duplicate_index import DuplicateIndex
+from review_store import ReviewStore
+
+TEXTS = [
+    "This blender is the best purchase I have made all year, five stars",
+    "This blender is the best purchase I have made all year, five stars!",
+    "Stopped working after two weeks, the motor burned out",
+    "this blender is the best purchase i have made all year - five stars",
+    "Stopped working after two weeks, the motor burned out.",
+    "Arrived quickly and the lid fits well"
+]
+
+def test_cluster_summaries_match_their_member_rows():
+    frame = pd.DataFrame({
+        'review_text': TEXTS,
+        'product_name': ['Blender', 'Mixer', 'Blender', None, 'Blender', 'Mixer'],
+        'reviewer_id': [7, 0, 7, 9, 3, 4],
+        'is_fake': [1, 1, 0, 0, 0, 0]
+    })
+    store = ReviewStore.from_frame(frame)
+    index = DuplicateIndex()
+    # Added in two steps, so clusters grow across calls
+    index.add_rows(store, 0, 3)
+    index.add_rows(store, 3, len(TEXTS))
+
+    clusters = index.largest_clusters(sample_size=2)
+    assert [cluster['size'] for cluster in clusters] == [3, 2]
+
+    blender = clusters[0]
+    assert blender['sample_rows'] == [0, 1]
+    assert (blender['fake_reviews'], blender['products'], blender['reviewers']) == (2, 2, 2)
+
+    motor = clusters[1]
+    assert motor['sample_rows'] == [2, 4]
+    assert (motor['fake_reviews'], motor['products'], motor['reviewers']) == (0, 1, 2)
+
+    assert index.cluster_of(TEXTS[0], sample_size=5)[0] == {**blender, 'sample_rows': [0, 1, 3]}
+    assert index.cluster_of(TEXTS[5])[0]['size'] == 1
@@ -0,0 +1,25 @@
+import os
+import pandas as pd
+import pytest
+import fake_review_detector
+from fake_review_detector import FakeReviewDetector
+from model_bundle import read_current_version
+
+def training_frame(n_rows=40):
+    texts = [f"Review number {i} of this blender, {'AMAZING BEST EVER!!!' if i % 2 else 'works fine for soup'}"
+             for i in range(n_rows)]
+    return pd.DataFrame({'review_text': texts, 'is_fake': [i % 2 for i in range(n_rows)]})
+
+def test_hist_refuses_training_sets_too_large_to_densify(tmp_path, monkeypatch):
+    monkeypatch.setattr(fake_review_detector, 'HIST_MAX_DENSE_CELLS', 100)
+    detector = FakeReviewDetector(auto_load=False, model_dir=str(tmp_path), learner='hist')
+
+    with pytest.raises(ValueError, match='HIST_MAX_DENSE_CELLS'):
+        detector.train_model(training_frame())
+    assert read_current_version(str(tmp_path)) is None
+
+def test_hist_trains_within_the_dense_limit(tmp_path):
+    detector = FakeReviewDetector(auto_load=False, model_dir=str(tmp_path), learner='hist')
+
+    detector.train_model(training_frame())
+    assert os.path.isdir(os.path.join(str(tmp_path), 'bundles', read_current_version(str(tmp_path))))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import StandardScaler
+from inference_engine import LEAF_MASK_MIN_ROWS, TreeEnsembleEngine, verify_parity
+from model_bundle import ModelBundle, save_bundle
+
+# Models the detector can train, plus deeper trees than a 64-bit leaf mask holds,
+# which always take the level walk
+MODELS = {
+    'gradient_boosting': lambda: GradientBoostingClassifier(n_estimators=60, max_depth=5, random_state=42),
+    'gradient_boosting_depth_6': lambda: GradientBoostingClassifier(n_estimators=20, max_depth=6, random_state=42),
+    'gradient_boosting_depth_8': lambda: GradientBoostingClassifier(n_estimators=10, max_depth=8, random_state=42),
+    'hist': lambda: HistGradientBoostingClassifier(max_iter=60, max_depth=5, random_state=42)
+}
+
+# Batch sizes on both sides of the switch between the level walk and the leaf masks
+BATCH_SIZES = [1, LEAF_MASK_MIN_ROWS - 1, LEAF_MASK_MIN_ROWS, 1500]
+
+def make_data(n_rows=3000, n_features=24, seed=0):
+    """Mostly-zero features like the scaled TF-IDF columns, with a label that depends on a few of them"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features)) * (rng.random((n_rows, n_features)) < 0.4)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] - 0.5 * X[:, 3] + rng.normal(scale=0.3, size=n_rows) > 0).astype(int)
+    return X, y
+
+@pytest.fixture(scope='module')
+def data():
+    return make_data()
+
+@pytest.fixture(scope='module', params=list(MODELS))
+def model(request, data):
+    X, y = data
+    return MODELS[request.param]().fit(X[:2000], y[:2000])
+
+@pytest.mark.parametrize('n_rows', BATCH_SIZES)
+def test_engine_matches_sklearn(model, data, n_rows):
+    X = data[0][2000:2000 + n_rows]
+    assert verify_parity(model, TreeEnsembleEngine.from_sklearn(model), X)
+
+def test_walk_and_leaf_masks_agree(model, data):
+    engine = TreeEnsembleEngine.from_sklearn(model)
+    if engine._leaf_masks is None:
+        pytest.skip("trees too deep for leaf masks")
+    X = data[0][2000:]
+    assert np.array_equal(engine._raw_predict_walk(X), engine._raw_predict_masks(X))
+
+def test_sparse_input_matches_dense(model, data):
+    engine = TreeEnsembleEngine.from_sklearn(model)
+    X = data[0][2000:]
+    assert np.array_equal(engine.predict_proba(sparse.csr_matrix(X)), model.predict_proba(X))
+
+def test_bundle_engine_matches_sklearn(model, data, tmp_path):
+    # Bundles carry no sklearn model, their engine is built from the memory-mapped node arrays
+    X = data[0][2000:]
+    vectorizer = TfidfVectorizer().fit(["great product", "terrible product"])
+    scaler = StandardScaler(with_mean=False).fit(X)
+    save_bundle(model, vectorizer, scaler, str(tmp_path))
+
+    bundle = ModelBundle.current(str(tmp_path))
+    for n_rows in BATCH_SIZES:
+        assert np.array_equal(bundle.model.predict_proba(X[:n_rows]), model.predict_proba(X[:n_rows]))
+
+def test_wide_sparse_input_densifies_only_split_columns(data):
+    # A large TF-IDF vocabulary, most of whose columns no split ever reads
+    X, y = data
+    wide = sparse.hstack([sparse.csr_matrix(X), sparse.random(len(X), 20000, density=0.001, random_state=0)]).tocsr()
+    model = GradientBoostingClassifier(n_estimators=20, max_depth=5, random_state=42).fit(wide[:2000], y[:2000])
+    engine = TreeEnsembleEngine.from_sklearn(model)
+    assert len(engine.used_features) < 1000
+    for n_rows in BATCH_SIZES:
+        assert np.array_equal(engine.predict_proba(wide[2000:2000 + n_rows]), model.predict_proba(wide[2000:2000 + n_rows]))
@@ -0,0 +1,33 @@
+import pytest
+from review_pipeline import ReviewPipeline
+from sentiment_analyzer import TOKEN_PATTERN
+
+# Clause and sentence breaks, aspect keywords inside longer words, and case mappings that
+# depend on context or change length
+TEXTS = [
+    "Great product! Really satisfied with the quality. Worth the money.",
+    "Terrible!! Horrible... awful?  Stay away.\nBroke after a week.\r\n\r\nCustomer service never replied",
+    "Rebuild costly, cheap material.Price was fine. Delivered late!",
+    "ΟΔΟΣ. Σ σ ς İstanbul KELVIN K. _under_score 42 items.",
+    "",
+    "...",
+    "no punctuation at all just words great poor"
+]
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_record_matches_each_component(text):
+    pipeline = ReviewPipeline()
+    record = pipeline.build_record(text)
+    sentiment, summarizer = pipeline.sentiment_analyzer, pipeline.summarizer
+
+    assert (record.clauses, record.clause_stats) == sentiment.clause_stats(text)
+    assert record.analysis == sentiment.analyze_text(text)
+    assert record.ngrams == summarizer.review_ngrams(TOKEN_PATTERN.findall(text.lower()))
+    assert record.sentences == summarizer.split_sentences(text)
+    assert record.words == text.lower().split()
+
+def test_summarize_matches_the_analyze_summary():
+    is_fake = [i % 3 == 1 for i in range(len(TEXTS))]
+    pipeline = ReviewPipeline()
+
+    assert pipeline.summarize(TEXTS, is_fake) == pipeline.analyze(TEXTS, is_fake)['summary']
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+import app
+from reviewer_index import ReviewerIndex
+
+@pytest.fixture(autouse=True)
+def reviewer_index(monkeypatch):
+    # Reviewer 1001 already has history, anonymous reviews never do
+    monkeypatch.setattr(app, 'reviewer_index', ReviewerIndex.from_frame(pd.DataFrame({
+        'reviewer_id': [1001, 1001], 'rating': [5, 2], 'verified_purchase': [1, 0],
+        'review_date': ['2024-12-01', '2024-12-20']
+    })))
+
+def detect_fake_behavior(body):
+    """Behavior row /api/detect-fake scores a request body with"""
+    return app.reviewer_behavior(app.reviewer_frame(body))[0]
+
+def ingest_behavior(record):
+    """Behavior row an NDJSON ingest scores a record with"""
+    return app.reviewer_behavior(pd.DataFrame.from_records([record]))[0]
+
+@pytest.mark.parametrize('details', [
+    {},
+    {'verified_purchase': 1},
+    {'reviewer_id': 1001, 'verified_purchase': 0, 'review_date': '2025-01-02'},
+    {'reviewer_id': 1001, 'verified_purchase': 1, 'review_date': '2025-01-02'}
+])
+def test_detect_fake_and_ingest_describe_a_review_alike(details):
+    body = {'review_text': "Great product!", 'rating': 5, **details}
+    assert np.array_equal(detect_fake_behavior(body), ingest_behavior(body))
+
+def test_batch_scoring_default_matches_an_anonymous_ingest():
+    # /api/detect-fake/batch carries no reviewer details, the detector fills in anonymous_features
+    record = {'review_text': "Great product!", 'rating': 5}
+    assert np.array_equal(ReviewerIndex.anonymous_features(1)[0], ingest_behavior(record))
+
+def test_features_as_of_counts_only_earlier_reviews():
+    index = ReviewerIndex.from_frame(pd.DataFrame({
+        'reviewer_id': [7, 7, 7, 7, 8], 'rating': [5, 1, 5, 3, 4], 'verified_purchase': [1, 0, 1, 1, 1],
+        'review_date': ['2025-01-01', '2025-01-03', '2025-01-03', '2025-01-10', '2025-01-02']
+    }))
+    features = index.features_as_of([7, 7, 7, 8], [5, 1, 3, 4], [1, 0, 1, 1],
+                                    ['2025-01-01', '2025-01-03', '2025-01-10', '2025-01-02'])
+    # A first review has no history, same-day reviews are not history for each other
+    assert features[:, 0].tolist() == [1.0, 2.0, 4.0, 1.0]
+    assert features[2, 3] == 0.25
@@ -0,0 +1,137 @@
+import pandas as pd
+import numpy as np
+import threading
+
+class TrendIndex:
+    """Per-product review aggregates bucketed by review_date, kept for days and weeks.
+
+    Buckets are keyed by their first day (days since 1970-01-01, weeks start on Monday)
+    and updated as reviews arrive, so range queries only read the buckets they cover.
+    """
+
+    FIELDS = (
+        'total_reviews', 'fake_reviews', 'rating_sum', 'rating_count',
+        'positive_count', 'negative_count', 'neutral_count'
+    )
+
+    GRANULARITIES = ('day', 'week')
+
+    def __init__(self):
+        # granularity -> product name (None for all products) -> bucket start -> FIELDS values
+        self.series = {granularity: {} for granularity in self.GRANULARITIES}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index from a reviews DataFrame"""
+
+        index = cls()
+        index.add_reviews(df)
+        return index
+
+    @staticmethod
+    def bucket_start(days, granularity):
+        """First day of the bucket each day falls in, 1970-01-01 was a Thursday"""
+        if granularity == 'week':
+            return days - (days + 3) % 7
+        return days
+
+    def add_reviews(self, df):
+        """Fold a batch of reviews into the buckets, reviews without a date are skipped"""
+
+        if df is None or df.empty or 'product_name' not in df.columns or 'review_date' not in df.columns:
+            return
+
+        days = pd.to_datetime(df['review_date'], errors='coerce').to_numpy().astype('datetime64[D]')
+        dated = ~np.isnat(days)
+        if not dated.any():
+            return
+
+        work = pd.DataFrame({'product_name': df['product_name'].astype(object).to_numpy()[dated]})
+        work['is_fake'] = df['is_fake'].to_numpy()[dated] if 'is_fake' in df.columns else 0
+        work['rating'] = df['rating'].to_numpy()[dated] if 'rating' in df.columns else float('nan')
+
+        sentiment = df['sentiment'].to_numpy()[dated] if 'sentiment' in df.columns else None
+        for label in ('positive', 'negative', 'neutral'):
+            work[label] = (sentiment == label) if sentiment is not None else False
+
+        days = days[dated].astype(np.int64)
+
+        with self._lock:
+            for granularity in self.GRANULARITIES:
+                work['bucket'] = self.bucket_start(days, granularity)
+                grouped = work.groupby(['product_name', 'bucket'], sort=False).agg(
+                    total_reviews=('is_fake', 'size'),
+                    fake_reviews=('is_fake', 'sum'),
+                    rating_sum=('rating', 'sum'),
+                    rating_count=('rating', 'count'),
+                    positive_count=('positive', 'sum'),
+                    negative_count=('negative', 'sum'),
+                    neutral_count=('neutral', 'sum')
+                )
+
+                products = self.series[granularity]
+                overall = products.setdefault(None, {})
+                for (product_name, bucket), values in zip(grouped.index, grouped.to_numpy(dtype=np.float64)):
+                    buckets = products.setdefault(product_name, {})
+                    for target in (buckets, overall):
+                        current = target.get(bucket)
+                        if current is None:
+                            target[bucket] = values.copy()
+                        else:
+                            current += values
+
+    def __contains__(self, product_name):
+        return product_name in self.series['day']
+
+    def _buckets_in_range(self, buckets, granularity, start, end):
+        low = self.bucket_start(start, granularity) if start is not None else None
+        return sorted(
+            (bucket, values) for bucket, values in buckets.items()
+            if (low is None or bucket >= low) and (end is None or bucket <= end)
+        )
+
+    def get_series(self, product_name=None, granularity='day', start=None, end=None):
+        """Buckets of one product (every product when None) overlapping [start, end].
+
+        start and end are day numbers, either may be None for an open range.
+        """
+
+        with self._lock:
+            buckets = self.series[granularity].get(product_name, {})
+            selected = self._buckets_in_range(buckets, granularity, start, end)
+            return [self._to_python(bucket, values) for bucket, values in selected]
+
+    def find_bursts(self, granularity='day', start=None, end=None, min_reviews=5, min_fake_rate=0.5, limit=20):
+        """Product buckets with the most fake reviews, where the fake share is at least min_fake_rate"""
+
+        bursts = []
+        with self._lock:
+            for product_name, buckets in self.series[granularity].items():
+                if product_name is None:
+                    continue
+                for bucket, values in self._buckets_in_range(buckets, granularity, start, end):
+                    total, fake = values[0], values[1]
+                    if total >= min_reviews and fake / total >= min_fake_rate:
+                        bursts.append((fake, fake / total, product_name, bucket, values))
+
+        bursts.sort(key=lambda burst: (-burst[0], -burst[1], burst[2], burst[3]))
+        return [
+            dict(self._to_python(bucket, values), product_name=product_name)
+            for _, _, product_name, bucket, values in bursts[:limit]
+        ]
+
+    def _to_python(self, bucket, values):
+        entry = dict(zip(self.FIELDS, values.tolist()))
+        total = int(entry['total_reviews'])
+        fake = int(entry['fake_reviews'])
+        return {
+            'period': str(np.datetime64(int(bucket), 'D')),
+            'total_reviews': total,
+            'fake_reviews': fake,
+            'fake_rate': round(fake / total, 4) if total > 0 else 0,
+            'avg_rating': round(entry['rating_sum'] / entry['rating_count'], 3) if entry['rating_count'] > 0 else 0,
+            'positive_count': int(entry['positive_count']),
+            'negative_count': int(entry['negative_count']),
+            'neutral_count': int(entry['neutral_count'])
+        }